@@ -2,32 +2,36 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 import time
 from datetime import datetime, timedelta
 import os
-import json
+import queue
+import threading
+import traceback
+from PIL import Image, ImageTk
+
+from logwatch_aggregates import day_key
+from logwatch_charts import COLORS, DEFAULT_PERIOD, PERIODS
+from logwatch_engine import LogWatchEngine, format_time, parse_time
+from logwatch_export import FORMATS, ExportCancelled, default_extension
+from logwatch_history import VirtualTable
+from logwatch_oplog import describe
+from logwatch_perf import BUCKETS_MS, LAG, PerfMonitor
+from logwatch_range import DateRangePicker
+from logwatch_writer import BackgroundWriter
+from logwatch_storage import COLUMNS, STORAGE_ENGINES
+from logwatch_table import session_ids
 
 # --- НАСТРОЙКИ UI ---
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("dark-blue")
 
-COLORS = {
-    "bg": "#1a1a1a",
-    "card": "#2b2b2b",
-    "accent": "#1f6aa5",
-    "success": "#2cc985",
-    "warning": "#e2b63e",
-    "danger": "#ff5f5f"
-}
-
-FILE_DB = "logwatch_db.json"
-FILE_SETTINGS = "logwatch_settings.json"
-
 
 class LogWatchPro(ctk.CTk):
+    # Как часто проверять ошибки фоновой записи (одно чтение атрибута)
+    WRITER_CHECK_MS = 2000
+
     def __init__(self):
         super().__init__()
 
@@ -41,14 +45,43 @@ class LogWatchPro(ctk.CTk):
         self.accumulated_time = 0
         self.current_date = datetime.now().strftime("%Y-%m-%d")
 
-        # Загрузка данных
-        self.db = self.load_data()
-        self.settings = self.load_settings()
+        # Планировщик дашборда: dirty-флаги вместо пересчёта на каждом тике
+        self._tick_job = None
+        self._timer_text = None
+        self._stats_dirty = True
+        self._stats_key = None
+        self._stats_base = {}
+        self._streak = 0
+        self._stat_texts = {}
+
+        # Загрузка данных: вся логика данных — в LogWatchEngine, здесь только UI
+        self.writer = BackgroundWriter()
+        self.engine = LogWatchEngine(writer=self.writer)
+        self.settings = self.engine.settings
+        self.storage = self.engine.storage
+        self.stats = self.engine.stats
+        self.history_index = self.engine.history_index
+        self.after(self.WRITER_CHECK_MS, self.check_writer)
+        self.recent = self.engine.recent
+        self.search = self.engine.search
+        self.data_loaded = False
+
+        # Инструментовка горячих путей: выключена, пока не задан LOGWATCH_PERF=1 или не открыта панель
+        self.perf = PerfMonitor()
+        self.perf_window = None
+        self._perf_job = None
+        self._tick_due = None
+        if os.environ.get("LOGWATCH_PERF") == "1":
+            self.enable_perf()
 
         # Горячие клавиши
         self.bind("<space>", lambda e: self.toggle_timer())
         self.bind("<Return>", lambda e: self.log_lap())
         self.bind("<Control-z>", lambda e: self.undo_last_log())
+        self.bind("<Control-y>", lambda e: self.redo_last_undo())
+        self.bind("<Control-P>", lambda e: self.open_perf_panel())  # Ctrl+Shift+P, скрытая панель
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.bind("<Map>", lambda e: self.wake_timer_loop() if e.widget is self else None)
 
         # --- UI LAYOUT ---
         self.grid_columnconfigure(1, weight=1)
@@ -63,53 +96,95 @@ class LogWatchPro(ctk.CTk):
         self.main_view = ctk.CTkFrame(self, corner_radius=0, fg_color="transparent")
         self.main_view.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
 
-        # Инициализация вкладок
+        # Вкладки строятся при первом открытии
         self.frames = {}
-        self.setup_dashboard()
-        self.setup_analytics()
-        self.setup_history()
-        self.setup_settings()
+        self.tab_builders = {
+            "Dashboard": self.setup_dashboard,
+            "Analytics": self.setup_analytics,
+            "History": self.setup_history,
+            "Settings": self.setup_settings,
+        }
 
         self.select_frame("Dashboard")
 
-        # Запуск таймера
-        self.update_timer_loop()
+        # Запуск таймера; история читается в фоне
+        self.refresh_recent_logs()
+        self.wake_timer_loop()
+        self.load_data()
 
     # --- DATA ENGINE ---
+    @property
+    def db(self):
+        return self.engine.db
+
     def load_data(self):
-        if os.path.exists(FILE_DB):
-            try:
-                df = pd.read_json(FILE_DB, orient='records')
-                if not df.empty:
-                    df['datetime'] = pd.to_datetime(df['datetime'])
-                    df['date_str'] = df['datetime'].dt.strftime('%Y-%m-%d')
-                    # Нормализация тэгов
-                    df['tag'] = df['tag'].str.title()
-                return df
-            except:
-                return pd.DataFrame(columns=["datetime", "date_str", "tag", "task", "duration", "note"])
-        return pd.DataFrame(columns=["datetime", "date_str", "tag", "task", "duration", "note"])
+        """Фоновая загрузка истории: окно и таймер работают сразу"""
+        self._load_result = queue.Queue()
+        self._loader = threading.Thread(target=self._load_worker, daemon=True)
+        self._loader.start()
+        self.after(50, self._poll_load)
 
-    def save_data(self):
-        self.db.to_json(FILE_DB, orient='records', date_format='iso')
+    def _load_worker(self):
+        try:
+            self.engine.load()
+            self._load_result.put(None)
+        except Exception as e:
+            self._load_result.put(e)
 
-    def load_settings(self):
-        default = {
-            "goals": {"daily": 6, "weekly": 35, "global": 1000},
-            "tags": ["Work", "Study", "Project", "Personal"],
-            "theme": "blue"
-        }
-        if os.path.exists(FILE_SETTINGS):
-            try:
-                with open(FILE_SETTINGS, 'r') as f:
-                    return json.load(f)
-            except:
-                return default
-        return default
+    def _poll_load(self):
+        if self.data_loaded:
+            return
+        try:
+            error = self._load_result.get_nowait()
+        except queue.Empty:
+            self.after(50, self._poll_load)
+            return
+        self.on_data_loaded(error)
+
+    def ensure_data(self):
+        """Дождаться загрузки истории — перед любым её изменением"""
+        if not self.data_loaded:
+            self._loader.join()
+            self._poll_load()
+
+    def on_data_loaded(self, error):
+        self.data_loaded = True
+        if error is not None:
+            # Не начинаем молча с пустой истории: нечитаемый файл откладывается в сторону
+            backup = self.engine.recover()
+            message = f"Could not read {self.storage.path}:\n{error}"
+            if backup:
+                message += f"\n\nThe file was moved to {backup}."
+            messagebox.showerror("Data Error", message)
+
+        self.mark_stats_dirty()
+        self.refresh_recent_logs()
+        # Реестр тэгов мог пополниться именами из истории; History обновится здесь же
+        self.update_tag_combos()
+        if self.tab_visible("Analytics"):
+            self.refresh_charts()
+
+    def save_data(self):
+        self.engine.save()
+
+    def on_close(self):
+        self._loader.join()
+        self.engine.close()
+        self.writer.close()
+        self.check_writer(reschedule=False)
+        self.destroy()
+
+    def check_writer(self, reschedule=True):
+        """Ошибки фоновой записи — пользователю (поток writer'а Tk не вызывает, поэтому опрос)"""
+        error = self.writer.take_error()
+        if error is not None:
+            messagebox.showerror("Save Error", f"Could not write LogWatch data:\n{error}\n\n"
+                                               "Recent changes may not be saved to disk. Check free space and permissions.")
+        if reschedule:
+            self.after(self.WRITER_CHECK_MS, self.check_writer)
 
     def save_settings(self):
-        with open(FILE_SETTINGS, 'w') as f:
-            json.dump(self.settings, f, indent=2)
+        self.engine.save_settings()
 
     # --- UI SETUP ---
     def setup_sidebar(self):
@@ -143,17 +218,25 @@ class LogWatchPro(ctk.CTk):
         self.lbl_weekly_prog.pack()
 
     def select_frame(self, name):
+        if name not in self.frames:
+            self.tab_builders[name]()
         for frame in self.frames.values():
             frame.pack_forget()
         self.frames[name].pack(fill="both", expand=True)
 
-        if name == "Analytics":
+        if name == "Dashboard":
+            self.wake_timer_loop()
+        elif name == "Analytics":
             self.refresh_charts()
         elif name == "History":
             self.refresh_table()
         elif name == "Settings":
             self.refresh_settings_ui()
 
+    def tab_visible(self, name):
+        frame = self.frames.get(name)
+        return frame is not None and frame.winfo_ismapped()
+
     # --- DASHBOARD ---
     def setup_dashboard(self):
         frame = ctk.CTkScrollableFrame(self.main_view, fg_color="transparent")
@@ -187,6 +270,11 @@ class LogWatchPro(ctk.CTk):
                       fg_color=COLORS["danger"],
                       command=self.undo_last_log).pack(side="left", padx=10)
 
+        ctk.CTkButton(ctrl_frame, text="REDO (Ctrl+Y)", width=140, height=50,
+                      font=("Arial", 14, "bold"),
+                      fg_color=COLORS["card"],
+                      command=self.redo_last_undo).pack(side="left", padx=10)
+
         # Stats Row
         stats_row = ctk.CTkFrame(frame, fg_color="transparent")
         stats_row.pack(fill="x", pady=10)
@@ -223,10 +311,22 @@ class LogWatchPro(ctk.CTk):
 
         ctk.CTkLabel(recent_card, text="RECENT LOGS", font=("Arial", 14, "bold")).pack(pady=10)
 
-        # Простая таблица для последних 5 записей
+        # Простая таблица для последних 5 записей: пул строк создаётся один раз
         self.recent_logs_frame = ctk.CTkFrame(recent_card, fg_color="transparent")
         self.recent_logs_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
+        self.lbl_no_logs = ctk.CTkLabel(self.recent_logs_frame, text="No logs yet", text_color="gray")
+        self.recent_rows = []
+        for _ in range(self.recent.size):
+            log_frame = ctk.CTkFrame(self.recent_logs_frame, fg_color=COLORS["bg"])
+            lbl_info = ctk.CTkLabel(log_frame, text="", anchor="w")
+            lbl_info.pack(side="left", padx=10, pady=8, fill="x", expand=True)
+            lbl_dur = ctk.CTkLabel(log_frame, text="", font=("Roboto Mono", 12, "bold"),
+                                   text_color=COLORS["success"])
+            lbl_dur.pack(side="right", padx=10, pady=8)
+            self.recent_rows.append((log_frame, lbl_info, lbl_dur))
+        self._recent_shown = None
+
     def create_stat_box(self, parent, title, val, attr_name):
         box = ctk.CTkFrame(parent, fg_color=COLORS["card"])
         box.pack(side="left", fill="both", expand=True, padx=5)
@@ -236,166 +336,150 @@ class LogWatchPro(ctk.CTk):
         setattr(self, attr_name, lbl)
 
     def refresh_recent_logs(self):
-        """Обновление списка последних логов на Dashboard"""
-        for widget in self.recent_logs_frame.winfo_children():
-            widget.destroy()
-
-        if self.db.empty:
-            ctk.CTkLabel(self.recent_logs_frame, text="No logs yet",
-                         text_color="gray").pack(pady=20)
-            return
-
-        recent = self.db.sort_values('datetime', ascending=False).head(5)
-
-        for idx, row in recent.iterrows():
-            log_frame = ctk.CTkFrame(self.recent_logs_frame, fg_color=COLORS["bg"])
-            log_frame.pack(fill="x", pady=5, padx=10)
-
-            time_str = row['datetime'].strftime("%H:%M")
-            dur_str = self.format_time(row['duration'], short=True)
-
-            info_text = f"[{time_str}] {row['tag']} - {row['task'][:40]}{'...' if len(row['task']) > 40 else ''}"
-
-            ctk.CTkLabel(log_frame, text=info_text, anchor="w").pack(side="left", padx=10, pady=8, fill="x",
-                                                                     expand=True)
-            ctk.CTkLabel(log_frame, text=dur_str, font=("Roboto Mono", 12, "bold"),
-                         text_color=COLORS["success"]).pack(side="right", padx=10, pady=8)
+        """Обновление списка последних логов на Dashboard (только configure, без пересоздания)"""
+        items = list(self.recent.items)
+
+        # pack/pack_forget — только когда меняется число видимых строк
+        if len(items) != self._recent_shown:
+            self._recent_shown = len(items)
+            self.lbl_no_logs.pack_forget()
+            for log_frame, _, _ in self.recent_rows:
+                log_frame.pack_forget()
+            if not items:
+                self.lbl_no_logs.pack(pady=20)
+            for log_frame, _, _ in self.recent_rows[:len(items)]:
+                log_frame.pack(fill="x", pady=5, padx=10)
+
+        for (_, lbl_info, lbl_dur), (dt, tag, task, duration) in zip(self.recent_rows, items):
+            task = str(task)
+            info_text = f"[{dt.strftime('%H:%M')}] {tag} - {task[:40]}{'...' if len(task) > 40 else ''}"
+            lbl_info.configure(text=info_text)
+            lbl_dur.configure(text=self.format_time(duration, short=True))
 
     # --- ANALYTICS ---
     def setup_analytics(self):
         frame = ctk.CTkScrollableFrame(self.main_view, fg_color="transparent")
         self.frames["Analytics"] = frame
 
-        # Stats Cards
+        # Период диаграмм: готовый или свои даты (считается из роллапов, поэтому переключение дешёвое)
+        self.analytics_range = DateRangePicker(frame, presets=PERIODS, default=DEFAULT_PERIOD,
+                                               command=self.refresh_charts)
+        self.analytics_range.pack(anchor="e", pady=(0, 5))
+
+        # Stats Cards (создаются один раз, refresh меняет только текст)
         self.stats_frame = ctk.CTkFrame(frame, fg_color="transparent")
         self.stats_frame.pack(fill="x", pady=10)
 
+        self.analytics_cards = []
+        for title in ("TODAY", "THIS WEEK", "ALL TIME", "AVG/DAY"):
+            card = ctk.CTkFrame(self.stats_frame, fg_color=COLORS["card"])
+            card.pack(side="left", fill="both", expand=True, padx=5)
+            ctk.CTkLabel(card, text=title, text_color="gray", font=("Arial", 10)).pack(pady=(10, 0))
+            lbl_val = ctk.CTkLabel(card, text="-", font=("Roboto Mono", 24, "bold"))
+            lbl_val.pack(pady=5)
+            lbl_sub = ctk.CTkLabel(card, text="", text_color="gray", font=("Arial", 9))
+            lbl_sub.pack(pady=(0, 10))
+            self.analytics_cards.append((lbl_val, lbl_sub))
+
         # Chart Container
         self.chart_frame = ctk.CTkFrame(frame, fg_color=COLORS["card"])
         self.chart_frame.pack(fill="both", expand=True, pady=10)
 
+        self.lbl_no_data = ctk.CTkLabel(self.chart_frame, text="No data available yet.", font=("Arial", 16))
+        self.chart_image = tk.Label(self.chart_frame, bg=COLORS["card"], bd=0)
+        self.chart_image.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Рендер графиков — в отдельном потоке, результат забирается через after
+        self.analytics_figure = None
+        self._chart_requests = queue.Queue()
+        self._chart_results = queue.Queue()
+        self._chart_worker = None
+        self._charts_in_flight = False
+        self._charts_dirty = False
+
     def refresh_charts(self):
-        # Clear old widgets
-        for widget in self.stats_frame.winfo_children():
-            widget.destroy()
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
+        if not self.data_loaded:
+            # Графики построятся по окончании загрузки истории
+            return
+        if self._charts_in_flight:
+            # Перерисуем ещё раз, когда текущий рендер закончится
+            self._charts_dirty = True
+            return
 
-        if self.db.empty:
-            ctk.CTkLabel(self.chart_frame, text="No data available yet.",
-                         font=("Arial", 16)).pack(expand=True)
+        if self._chart_worker is None:
+            self._chart_worker = threading.Thread(target=self._chart_worker_loop, daemon=True)
+            self._chart_worker.start()
+
+        width = self.chart_frame.winfo_width()
+        self._chart_requests.put((self.settings["goals"]["daily"], self.analytics_range.label(),
+                                  *self.analytics_range.get(), width if width > 1 else None))
+        self._charts_in_flight = True
+        self.after(50, self._poll_charts)
+
+    def _chart_worker_loop(self):
+        """Фоновый поток: данные + Agg-рендер. Tk отсюда не вызывается."""
+        while True:
+            daily_goal, period, start, end, width = self._chart_requests.get()
+            try:
+                with self.perf.timed("chart:data"):
+                    data = self.engine.chart_data(period=period, start=start, end=end)
+                image = None
+                if data["count"]:
+                    if self.analytics_figure is None:
+                        # matplotlib загружается только при первом открытии Analytics
+                        from logwatch_figure import AnalyticsFigure
+                        self.analytics_figure = AnalyticsFigure(COLORS)
+                    with self.perf.timed("chart:render"):
+                        self.analytics_figure.update(data, daily_goal)
+                        image = self.analytics_figure.render(width)
+                self._chart_results.put((data, image))
+            except Exception:
+                traceback.print_exc()
+                self._chart_results.put((None, None))
+
+    def _poll_charts(self):
+        try:
+            data, image = self._chart_results.get_nowait()
+        except queue.Empty:
+            self.after(50, self._poll_charts)
             return
 
-        # === STAT CARDS ===
-        today = pd.Timestamp.now().normalize()
-        yesterday = today - pd.Timedelta(days=1)
-        week_start = today - pd.Timedelta(days=today.weekday())
+        self._charts_in_flight = False
+        if data is not None:
+            self.show_charts(data, image)
+        if self._charts_dirty:
+            self._charts_dirty = False
+            self.refresh_charts()
 
-        today_hours = self.db[self.db['date_str'] == today.strftime('%Y-%m-%d')]['duration'].sum() / 3600
-        yesterday_hours = self.db[self.db['date_str'] == yesterday.strftime('%Y-%m-%d')]['duration'].sum() / 3600
-        week_hours = self.db[self.db['datetime'] >= week_start]['duration'].sum() / 3600
-        total_hours = self.db['duration'].sum() / 3600
+    def show_charts(self, data, image):
+        if not data["count"]:
+            self.chart_image.pack_forget()
+            self.lbl_no_data.pack(expand=True, pady=40)
+            return
+        self.lbl_no_data.pack_forget()
+        self.chart_image.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # === STAT CARDS ===
+        today_hours = data["today_total"] / 3600
+        yesterday_hours = data["yesterday_total"] / 3600
+        week_hours = data["week_total"] / 3600
+        total_hours = data["total"] / 3600
 
         cards_data = [
-            ("TODAY", f"{today_hours:.1f}h", f"{'↑' if today_hours > yesterday_hours else '↓'} vs yesterday"),
-            ("THIS WEEK", f"{week_hours:.1f}h", f"Avg: {week_hours / 7:.1f}h/day"),
-            ("ALL TIME", f"{total_hours:.1f}h", f"{len(self.db)} sessions"),
-            ("AVG/DAY", f"{total_hours / max(len(self.db['date_str'].unique()), 1):.1f}h", "Overall")
+            (f"{today_hours:.1f}h", f"{'↑' if today_hours > yesterday_hours else '↓'} vs yesterday"),
+            (f"{week_hours:.1f}h", f"Avg: {week_hours / 7:.1f}h/day"),
+            (f"{total_hours:.1f}h", f"{data['count']} sessions"),
+            (f"{total_hours / max(data['n_days'], 1):.1f}h", "Overall")
         ]
+        for (lbl_val, lbl_sub), (val, subtitle) in zip(self.analytics_cards, cards_data):
+            lbl_val.configure(text=val)
+            lbl_sub.configure(text=subtitle)
 
-        for title, val, subtitle in cards_data:
-            card = ctk.CTkFrame(self.stats_frame, fg_color=COLORS["card"])
-            card.pack(side="left", fill="both", expand=True, padx=5)
-            ctk.CTkLabel(card, text=title, text_color="gray", font=("Arial", 10)).pack(pady=(10, 0))
-            ctk.CTkLabel(card, text=val, font=("Roboto Mono", 24, "bold")).pack(pady=5)
-            ctk.CTkLabel(card, text=subtitle, text_color="gray", font=("Arial", 9)).pack(pady=(0, 10))
-
-        # === CHARTS ===
-        fig = plt.figure(figsize=(14, 10), facecolor=COLORS["card"])
-        gs = fig.add_gridspec(3, 2, hspace=0.3, wspace=0.3)
-
-        # 1. Last 14 days bar chart
-        ax1 = fig.add_subplot(gs[0, :])
-        start_date = today - pd.Timedelta(days=13)
-        date_range = pd.date_range(start=start_date, end=today, freq='D')
-        daily_data = []
-
-        for date in date_range:
-            day_str = date.strftime('%Y-%m-%d')
-            hours = self.db[self.db['date_str'] == day_str]['duration'].sum() / 3600
-            daily_data.append(hours)
-
-        bars = ax1.bar(range(len(date_range)), daily_data, color=COLORS["success"], alpha=0.8)
-        ax1.axhline(y=self.settings["goals"]["daily"], color=COLORS["warning"],
-                    linestyle='--', label='Daily Goal')
-        ax1.set_title("Last 14 Days (Hours)", color="white", fontsize=14, pad=10)
-        ax1.set_xticks(range(len(date_range)))
-        ax1.set_xticklabels([d.strftime('%m/%d') for d in date_range], rotation=45)
-        ax1.tick_params(colors="white")
-        ax1.set_facecolor(COLORS["card"])
-        ax1.legend(facecolor=COLORS["card"], edgecolor="white", labelcolor="white")
-        for spine in ax1.spines.values():
-            spine.set_edgecolor('#444')
-
-        # 2. Tag distribution pie
-        ax2 = fig.add_subplot(gs[1, 0])
-        tag_sum = self.db.groupby('tag')['duration'].sum()
-        if not tag_sum.empty:
-            wedges, texts, autotexts = ax2.pie(tag_sum.values, labels=tag_sum.index,
-                                               autopct='%1.1f%%', startangle=90,
-                                               textprops={'color': "white", 'fontsize': 10})
-            ax2.set_title("Time by Tag (All Time)", color="white", fontsize=12, pad=10)
-
-        # 3. Heatmap - hours by weekday
-        ax3 = fig.add_subplot(gs[1, 1])
-        self.db['weekday'] = self.db['datetime'].dt.dayofweek
-        self.db['hour'] = self.db['datetime'].dt.hour
-
-        heatmap_data = np.zeros((7, 24))
-        for _, row in self.db.iterrows():
-            heatmap_data[row['weekday'], row['hour']] += row['duration'] / 3600
-
-        im = ax3.imshow(heatmap_data, cmap='YlGn', aspect='auto', interpolation='nearest')
-        ax3.set_yticks(range(7))
-        ax3.set_yticklabels(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
-        ax3.set_xticks(range(0, 24, 3))
-        ax3.set_xticklabels(range(0, 24, 3))
-        ax3.set_title("Activity Heatmap (Hour x Weekday)", color="white", fontsize=12, pad=10)
-        ax3.tick_params(colors="white")
-        ax3.set_facecolor(COLORS["card"])
-        plt.colorbar(im, ax=ax3, label='Hours')
-
-        # 4. Tag trends over last 4 weeks
-        ax4 = fig.add_subplot(gs[2, :])
-        weeks_back = 4
-        week_starts = [today - pd.Timedelta(weeks=i) for i in range(weeks_back, -1, -1)]
-
-        top_tags = tag_sum.nlargest(5).index
-        for tag in top_tags:
-            weekly_hours = []
-            for i in range(len(week_starts) - 1):
-                mask = (self.db['datetime'] >= week_starts[i]) & \
-                       (self.db['datetime'] < week_starts[i + 1]) & \
-                       (self.db['tag'] == tag)
-                hours = self.db[mask]['duration'].sum() / 3600
-                weekly_hours.append(hours)
-
-            ax4.plot(range(len(weekly_hours)), weekly_hours, marker='o', label=tag, linewidth=2)
-
-        ax4.set_title("Tag Trends (Last 4 Weeks)", color="white", fontsize=14, pad=10)
-        ax4.set_xticks(range(weeks_back))
-        ax4.set_xticklabels([f"Week {i + 1}" for i in range(weeks_back)])
-        ax4.tick_params(colors="white")
-        ax4.set_facecolor(COLORS["card"])
-        ax4.legend(facecolor=COLORS["card"], edgecolor="white", labelcolor="white")
-        ax4.grid(alpha=0.2)
-        for spine in ax4.spines.values():
-            spine.set_edgecolor('#444')
-
-        # Embed in Tkinter
-        canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+        # === CHARTS === (готовый RGBA-буфер из фонового потока)
+        width, height, buf = image
+        photo = ImageTk.PhotoImage(Image.frombuffer("RGBA", (width, height), buf, "raw", "RGBA", 0, 1))
+        self.chart_image.configure(image=photo)
+        self.chart_image.image = photo
 
     # --- HISTORY ---
     def setup_history(self):
@@ -412,10 +496,27 @@ class LogWatchPro(ctk.CTk):
         self.filter_combo.set("All")
         self.filter_combo.pack(side="left", padx=5)
 
-        ctk.CTkButton(filter_frame, text="Export CSV",
-                      command=self.export_csv).pack(side="right", padx=5)
+        self.entry_search = ctk.CTkEntry(filter_frame, placeholder_text="Search task / note...", width=250)
+        self.entry_search.pack(side="left", padx=15)
+        self.entry_search.bind("<KeyRelease>", lambda e: self.schedule_search())
+        self._search_job = None
+
+        ctk.CTkButton(filter_frame, text="Export...",
+                      command=self.export_data).pack(side="right", padx=5)
+        self.export_window = None
         ctk.CTkButton(filter_frame, text="Clear Filters",
                       command=self.clear_filters).pack(side="right", padx=5)
+        ctk.CTkButton(filter_frame, text="Delete", width=80, fg_color=COLORS["danger"],
+                      command=self.delete_selected).pack(side="right", padx=5)
+        ctk.CTkButton(filter_frame, text="Edit...", width=80,
+                      command=self.edit_selected).pack(side="right", padx=5)
+
+        # Диапазон дат: двоичный поиск по отсортированному индексу (срез без копии)
+        range_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        range_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(range_frame, text="Date range:").pack(side="left", padx=5)
+        self.history_range = DateRangePicker(range_frame, command=self.refresh_table)
+        self.history_range.pack(side="left")
 
         # Treeview
         style = ttk.Style()
@@ -425,44 +526,54 @@ class LogWatchPro(ctk.CTk):
         style.configure("Treeview.Heading", background="#1a1a1a", foreground="white", relief="flat")
         style.map("Treeview", background=[('selected', COLORS["accent"])])
 
-        columns = ("date", "time", "tag", "task", "duration", "note")
-        self.tree = ttk.Treeview(frame, columns=columns, show="headings", height=20)
-
-        for col, width in [("date", 100), ("time", 80), ("tag", 120),
-                           ("task", 350), ("duration", 100), ("note", 200)]:
-            self.tree.heading(col, text=col.title())
-            self.tree.column(col, width=width)
-
-        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-
-        self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-    def refresh_table(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-
-        if self.db.empty:
+        # Виртуальная таблица: в Treeview только видимые строки
+        self.history_table = VirtualTable(frame, [("date", 100), ("time", 80), ("tag", 120),
+                                                  ("task", 350), ("duration", 100), ("note", 200)],
+                                          fetch=self.history_rows)
+        self.tree = self.history_table.tree
+        self.history_table.pack()
+        self.tree.bind("<Delete>", lambda e: self.delete_selected())
+        self.tree.bind("<Double-1>", lambda e: self.edit_selected())
+        self.edit_window = None
+
+    def history_rows(self, positions):
+        rows = self.db.iloc[positions]
+        return list(zip(rows['datetime'].dt.strftime("%Y-%m-%d"), rows['datetime'].dt.strftime("%H:%M"),
+                        rows['tag'], rows['task'],
+                        [self.format_time(d) for d in rows['duration']], rows['note'].fillna('')))
+
+    def refresh_table(self, keep_offset=False):
+        if not self.data_loaded:
             return
-
-        # Apply filter
-        df_filtered = self.db.copy()
+        # Apply filter: диапазон дат и тэг — срез предсортированного индекса
         selected_tag = self.filter_combo.get()
-        if selected_tag != "All":
-            df_filtered = df_filtered[df_filtered['tag'] == selected_tag]
-
-        sorted_df = df_filtered.sort_values(by='datetime', ascending=False)
-
-        for index, row in sorted_df.iterrows():
-            time_str = row['datetime'].strftime("%H:%M")
-            dur_str = self.format_time(row['duration'])
-            note = row.get('note', '') or ''
-            self.tree.insert("", "end", values=(row['date_str'], time_str, row['tag'],
-                                                row['task'], dur_str, note))
+        positions = self.history_index.range(*self.history_range.get(),
+                                             tag=None if selected_tag == "All" else selected_tag)
+
+        # Full-text: id сессий из инвертированного индекса, без прохода по DataFrame
+        query = self.entry_search.get().strip()
+        if query:
+            self.search.ensure(self.db)
+            mask = np.zeros(len(self.db), dtype=bool)
+            mask[self.search.query(query)] = True
+            positions = positions[mask[positions]]
+
+        self.history_table.set_positions(positions, keep_offset=keep_offset)
+
+    def schedule_search(self):
+        # Debounce: поиск после паузы в наборе
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(150, self._run_search)
+
+    def _run_search(self):
+        self._search_job = None
+        self.refresh_table()
 
     def clear_filters(self):
         self.filter_combo.set("All")
+        self.history_range.set("All Time")
+        self.entry_search.delete(0, 'end')
         self.refresh_table()
 
     # --- SETTINGS ---
@@ -513,6 +624,19 @@ class LogWatchPro(ctk.CTk):
         self.tags_listbox_frame = ctk.CTkFrame(tags_card, fg_color=COLORS["bg"])
         self.tags_listbox_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
 
+        # Storage Section
+        storage_card = ctk.CTkFrame(frame, fg_color=COLORS["card"])
+        storage_card.pack(fill="x", pady=10, padx=10)
+
+        ctk.CTkLabel(storage_card, text="STORAGE", font=("Arial", 16, "bold")).pack(pady=10)
+        self.storage_menu = ctk.CTkOptionMenu(storage_card, values=list(STORAGE_ENGINES),
+                                              command=self.change_storage)
+        self.storage_menu.pack(pady=(0, 5))
+        ctk.CTkLabel(storage_card, text="Applied after restart", text_color="gray",
+                     font=("Arial", 10)).pack(pady=(0, 10))
+        ctk.CTkButton(storage_card, text="Import Legacy Files...",
+                      command=self.import_legacy).pack(pady=(0, 15))
+
         # Info
         info_card = ctk.CTkFrame(frame, fg_color=COLORS["card"])
         info_card.pack(fill="x", pady=10, padx=10)
@@ -522,7 +646,10 @@ class LogWatchPro(ctk.CTk):
         shortcuts = [
             ("Space", "Start/Pause timer"),
             ("Enter", "Log current session"),
-            ("Ctrl+Z", "Undo last log")
+            ("Ctrl+Z", "Undo last operation"),
+            ("Ctrl+Y", "Redo last undone operation"),
+            ("Del", "Delete selected sessions (History)"),
+            ("Ctrl+Shift+P", "Performance panel")
         ]
 
         for key, desc in shortcuts:
@@ -543,6 +670,8 @@ class LogWatchPro(ctk.CTk):
         self.entry_global_goal.delete(0, 'end')
         self.entry_global_goal.insert(0, str(self.settings["goals"]["global"]))
 
+        self.storage_menu.set(self.settings.get("storage", "json"))
+
         # Refresh tags list
         for widget in self.tags_listbox_frame.winfo_children():
             widget.destroy()
@@ -552,8 +681,16 @@ class LogWatchPro(ctk.CTk):
             tag_row.pack(fill="x", padx=5, pady=3)
 
             ctk.CTkLabel(tag_row, text=tag, font=("Arial", 12)).pack(side="left", padx=10, pady=5)
+            aliases = self.engine.tags.aliases.get(self.engine.tags.resolve(tag), [])
+            if aliases:
+                ctk.CTkLabel(tag_row, text="also: " + ", ".join(repr(a) for a in aliases),
+                             text_color="gray", font=("Arial", 10)).pack(side="left", padx=5)
             ctk.CTkButton(tag_row, text="Remove", command=lambda t=tag: self.remove_tag(t),
                           fg_color=COLORS["danger"], width=80).pack(side="right", padx=10, pady=5)
+            ctk.CTkButton(tag_row, text="Merge...", command=lambda t=tag: self.merge_tag(t),
+                          width=80).pack(side="right", padx=5, pady=5)
+            ctk.CTkButton(tag_row, text="Rename...", command=lambda t=tag: self.rename_tag(t),
+                          width=80).pack(side="right", padx=5, pady=5)
 
     def save_goals_settings(self):
         try:
@@ -562,53 +699,135 @@ class LogWatchPro(ctk.CTk):
             self.settings["goals"]["global"] = float(self.entry_global_goal.get())
             self.save_settings()
             messagebox.showinfo("Success", "Goals updated successfully!")
-            self.update_progress_bar()
+            self.mark_stats_dirty()
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for goals")
 
+    def change_storage(self, kind):
+        self.settings["storage"] = kind
+        self.save_settings()
+        messagebox.showinfo("Storage", f"Storage mode '{kind}' will be used after restart")
+
+    def import_legacy(self):
+        paths = filedialog.askopenfilenames(
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not paths:
+            return
+        self.ensure_data()
+        try:
+            report = self.engine.import_files(paths)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import", f"Import failed: {e}")
+            return
+
+        self.mark_stats_dirty()
+        self.refresh_recent_logs()
+        self.refresh_settings_ui()
+        self.update_tag_combos()
+        lines = [f"{os.path.basename(p)} ({r['format']}): {r['imported']} imported, {r['duplicates']} duplicates"
+                 for p, r in report.items()]
+        messagebox.showinfo("Import", "\n".join(lines))
+
     def add_tag(self):
-        new_tag = self.entry_new_tag.get().strip().title()  # Normalize to Title Case
-        if not new_tag:
+        name = self.entry_new_tag.get()
+        if not name.strip():
             messagebox.showwarning("Warning", "Tag name cannot be empty")
             return
 
-        if new_tag in self.settings["tags"]:
+        # Регистр и пробелы не различаются: 'riddim ' — это уже существующий 'Riddim'
+        self.ensure_data()
+        if not self.engine.add_tag(name):
             messagebox.showwarning("Warning", "Tag already exists")
             return
-
-        self.settings["tags"].append(new_tag)
-        self.save_settings()
+        new_tag = self.engine.tags.lookup(name)
         self.entry_new_tag.delete(0, 'end')
         self.refresh_settings_ui()
 
-        # Update combo boxes
-        self.combo_tag.configure(values=self.settings["tags"])
-        self.filter_combo.configure(values=["All"] + self.settings["tags"])
+        self.update_tag_combos()
 
         messagebox.showinfo("Success", f"Tag '{new_tag}' added!")
 
     def remove_tag(self, tag):
         if messagebox.askyesno("Confirm", f"Remove tag '{tag}'? (Existing logs will keep this tag)"):
-            self.settings["tags"].remove(tag)
-            self.save_settings()
+            self.ensure_data()
+            self.engine.hide_tag(tag)
             self.refresh_settings_ui()
-            self.combo_tag.configure(values=self.settings["tags"])
+            self.update_tag_combos()
+
+    def rename_tag(self, tag):
+        new_name = ctk.CTkInputDialog(title="Rename Tag", text=f"New name for '{tag}':").get_input()
+        if not new_name or not new_name.strip():
+            return
+        self.ensure_data()
+        try:
+            self.engine.rename_tag(tag, new_name)
+        except ValueError as e:
+            messagebox.showerror("Rename Tag", str(e).capitalize())
+            return
+        self.tags_changed()
+
+    def merge_tag(self, tag):
+        others = [t for t in self.settings["tags"] if t != tag]
+        if not others:
+            messagebox.showinfo("Merge Tag", "There is no other tag to merge into")
+            return
+        win = ctk.CTkToplevel(self)
+        win.title("Merge Tag")
+        win.geometry("360x170")
+        win.transient(self)
+        ctk.CTkLabel(win, text=f"Merge '{tag}' into:").pack(pady=(15, 5))
+        target = ctk.CTkComboBox(win, values=others, width=250)
+        target.set(others[0])
+        target.pack(pady=5)
+
+        def merge():
+            if not messagebox.askyesno("Confirm", f"All sessions of '{tag}' will become '{target.get()}'. "
+                                                  f"Continue?", parent=win):
+                return
+            self.ensure_data()
+            try:
+                self.engine.merge_tags([tag], target.get())
+            except ValueError as e:
+                messagebox.showerror("Merge Tag", str(e).capitalize(), parent=win)
+                return
+            win.destroy()
+            self.tags_changed()
+
+        ctk.CTkButton(win, text="Merge", command=merge).pack(pady=15)
+
+    def tags_changed(self):
+        """После rename/merge: имена тэгов сменились и в настройках, и в истории"""
+        if "History" in self.frames and self.filter_combo.get() not in ["All"] + self.settings["tags"]:
+            self.filter_combo.set("All")
+        self.refresh_settings_ui()
+        self.update_tag_combos()
+        self.data_changed()
+
+    def update_tag_combos(self):
+        self.combo_tag.configure(values=self.settings["tags"])
+        # History может быть ещё не построена — тогда возьмёт тэги при создании
+        if "History" in self.frames:
             self.filter_combo.configure(values=["All"] + self.settings["tags"])
+            if self.tab_visible("History"):
+                self.refresh_table()
 
     # --- LOGIC ---
     def toggle_timer(self):
         if not self.running:
             self.running = True
-            self.start_time = time.time()
+            self.start_time = time.monotonic()
             self.btn_start.configure(text="PAUSE (Space)", fg_color=COLORS["warning"], text_color="black")
         else:
             self.running = False
-            self.accumulated_time += time.time() - self.start_time
+            self.accumulated_time += time.monotonic() - self.start_time
             self.btn_start.configure(text="RESUME (Space)", fg_color=COLORS["success"], text_color="white")
+        self.wake_timer_loop()
 
     def get_current_duration(self):
+        # monotonic: перевод системных часов не влияет на таймер
         if self.running:
-            return self.accumulated_time + (time.time() - self.start_time)
+            return self.accumulated_time + (time.monotonic() - self.start_time)
         return self.accumulated_time
 
     def log_lap(self):
@@ -616,25 +835,20 @@ class LogWatchPro(ctk.CTk):
         if duration < 1:
             messagebox.showwarning("Warning", "Timer must run for at least 1 second")
             return
+        self.ensure_data()
 
-        tag = self.combo_tag.get().strip().title()  # Normalize case
+        tag = self.combo_tag.get()
         task = self.entry_task.get().strip() or "Unnamed Task"
         note = self.entry_note.get().strip()
 
-        # Add to DataFrame
-        new_row = {
-            "datetime": datetime.now(),
-            "date_str": datetime.now().strftime("%Y-%m-%d"),
-            "tag": tag,
-            "task": task,
-            "duration": duration,
-            "note": note
-        }
-
-        new_df = pd.DataFrame([new_row])
-        self.db = pd.concat([self.db, new_df], ignore_index=True)
-
-        self.save_data()
+        try:
+            # Имя сводится реестром тэгов к каноническому; новое имя становится тэгом
+            row = self.engine.log(tag, task, duration, note)
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e).capitalize())
+            return
+        if row["tag"] not in self.combo_tag.cget("values"):
+            self.update_tag_combos()
 
         # Reset
         self.running = False
@@ -644,94 +858,170 @@ class LogWatchPro(ctk.CTk):
         self.entry_task.delete(0, 'end')
         self.entry_note.delete(0, 'end')
 
-        self.update_progress_bar()
+        self.mark_stats_dirty()
         self.refresh_recent_logs()
+        if self.tab_visible("History"):
+            self.refresh_table(keep_offset=True)
 
         messagebox.showinfo("Logged!", f"Session logged: {self.format_time(duration)}")
 
     def undo_last_log(self):
-        if self.db.empty:
-            messagebox.showinfo("Info", "No logs to undo")
+        self.ensure_data()
+        op = self.engine.next_undo()
+        if op is None:
+            messagebox.showinfo("Info", "Nothing to undo")
             return
 
-        if messagebox.askyesno("Confirm", "Delete the last log entry?"):
-            self.db = self.db.iloc[:-1]
-            self.save_data()
-            self.update_progress_bar()
-            self.refresh_recent_logs()
-            if self.frames["History"].winfo_ismapped():
-                self.refresh_table()
-            messagebox.showinfo("Success", "Last log removed")
+        if messagebox.askyesno("Confirm", f"Undo the {describe(op)}?"):
+            self.engine.undo()
+            self.data_changed()
 
-    def calculate_streak(self):
-        """Вычисление streak (дней подряд с выполненной целью)"""
-        if self.db.empty:
-            return 0
+    def redo_last_undo(self):
+        self.ensure_data()
+        op = self.engine.redo()
+        if op is None:
+            messagebox.showinfo("Info", "Nothing to redo")
+            return
+        self.data_changed()
 
-        daily_goal_sec = self.settings["goals"]["daily"] * 3600
-        dates = self.db.groupby('date_str')['duration'].sum()
-        dates = dates[dates >= daily_goal_sec].sort_index(ascending=False)
+    def data_changed(self):
+        """Обновление видов после правки истории (undo/redo, удаление, редактирование)"""
+        self.mark_stats_dirty()
+        self.refresh_recent_logs()
+        if self.tab_visible("History"):
+            self.refresh_table(keep_offset=True)
+        if self.tab_visible("Analytics"):
+            self.refresh_charts()
 
-        if dates.empty:
-            return 0
+    def selected_session_ids(self):
+        ids = session_ids(self.db)
+        return [int(ids[pos]) for pos in self.history_table.selected_positions()]
 
-        streak = 0
-        current_date = pd.Timestamp.now().normalize()
+    def delete_selected(self):
+        sids = self.selected_session_ids()
+        if not sids:
+            return
+        if messagebox.askyesno("Confirm", f"Delete {len(sids)} selected session(s)? (Ctrl+Z undoes one at a time)"):
+            for sid in sids:
+                self.engine.delete(sid)
+            self.data_changed()
+
+    def edit_selected(self):
+        sids = self.selected_session_ids()
+        if not sids:
+            return
+        if self.edit_window is not None and self.edit_window.winfo_exists():
+            self.edit_window.destroy()
+        sid = sids[0]
+        row = self.engine.row(self.engine.position(sid))
+
+        win = ctk.CTkToplevel(self)
+        win.title("Edit Session")
+        win.geometry("380x330")
+        win.transient(self)
+        self.edit_window = win
+        ctk.CTkLabel(win, text=f"{row['datetime']:%Y-%m-%d %H:%M}", font=("Arial", 14, "bold")).pack(pady=10)
+
+        tag = ctk.CTkComboBox(win, values=self.settings["tags"], width=300)
+        tag.set(row["tag"])
+        tag.pack(pady=5)
+        fields = {}
+        for name, value in (("task", row["task"]), ("duration", format_time(row["duration"])),
+                            ("note", row["note"])):
+            entry = ctk.CTkEntry(win, placeholder_text=name.title(), width=300)
+            entry.insert(0, value)
+            entry.pack(pady=5)
+            fields[name] = entry
+
+        def save():
+            try:
+                duration = parse_time(fields["duration"].get())
+            except ValueError:
+                messagebox.showerror("Edit", "Duration must be HH:MM:SS", parent=win)
+                return
+            try:
+                new = self.engine.edit(sid, tag=tag.get(), task=fields["task"].get().strip() or "Unnamed Task",
+                                       duration=duration, note=fields["note"].get().strip())
+            except ValueError as e:
+                messagebox.showerror("Edit", str(e).capitalize(), parent=win)
+                return
+            win.destroy()
+            if new["tag"] not in self.combo_tag.cget("values"):
+                self.update_tag_combos()
+            self.data_changed()
+
+        ctk.CTkButton(win, text="Save", command=save).pack(pady=15)
 
-        for date_str in dates.index:
-            date = pd.Timestamp(date_str)
-            if date == current_date - pd.Timedelta(days=streak):
-                streak += 1
-            else:
-                break
+    def calculate_streak(self):
+        """Вычисление streak (дней подряд с выполненной целью)"""
+        return self.engine.streak()
+
+    # --- SCHEDULER ---
+    TICK_FAST = 50
+    TICK_SLOW = 1000
 
-        return streak
+    def mark_stats_dirty(self):
+        self._stats_dirty = True
+        self.wake_timer_loop()
+
+    def wake_timer_loop(self):
+        """Внеочередной тик по событию (лог, старт/пауза, показ окна) вместо ожидания медленного"""
+        if self._tick_job is not None:
+            self.after_cancel(self._tick_job)
+        self._tick_due = None
+        self._tick_job = self.after_idle(self.update_timer_loop)
 
     def update_timer_loop(self):
-        # Current Lap
+        self._tick_job = None
+        if self._tick_due is not None and self.perf.enabled:
+            # Лаг цикла событий: насколько позже запланированного сработал тик
+            self.perf.record(LAG, time.perf_counter() - self._tick_due)
+        visible = self.tab_visible("Dashboard") and self.state() != "iconic"
         dur = self.get_current_duration()
-        ms = int((dur % 1) * 100)
-        self.lbl_main_timer.configure(text=f"{self.format_time(dur)}.{ms:02d}")
-
-        # Stats Update
-        if not self.db.empty:
-            today_str = datetime.now().strftime("%Y-%m-%d")
-            tag = self.combo_tag.get().title()
-
-            # Today total
-            today_total = self.db[self.db['date_str'] == today_str]['duration'].sum()
-            if self.running:
-                today_total += dur
-
-            # Week total
-            week_start = pd.Timestamp.now().normalize() - pd.Timedelta(days=pd.Timestamp.now().weekday())
-            week_total = self.db[self.db['datetime'] >= week_start]['duration'].sum()
-            if self.running:
-                week_total += dur
-
-            # Current tag today
-            tag_total = self.db[(self.db['date_str'] == today_str) & (self.db['tag'] == tag)]['duration'].sum()
-            if self.running:
-                tag_total += dur
-
-            # Streak
-            streak = self.calculate_streak()
-
-            self.today_lbl.configure(text=self.format_time(today_total, short=True))
-            self.week_lbl.configure(text=self.format_time(week_total, short=True))
-            self.tag_lbl.configure(text=self.format_time(tag_total, short=True))
-            self.streak_lbl.configure(text=f"{streak} days")
-
-        # Refresh recent logs periodically (every 5 seconds when dashboard is visible)
-        if hasattr(self, '_last_refresh'):
-            if time.time() - self._last_refresh > 5 and self.frames["Dashboard"].winfo_ismapped():
-                self.refresh_recent_logs()
-                self._last_refresh = time.time()
-        else:
-            self._last_refresh = time.time()
-            self.refresh_recent_logs()
 
-        self.after(50, self.update_timer_loop)
+        # Current Lap: configure только если текст изменился
+        if visible:
+            ms = int((dur % 1) * 100)
+            text = f"{self.format_time(dur)}.{ms:02d}"
+            if text != self._timer_text:
+                self._timer_text = text
+                self.lbl_main_timer.configure(text=text)
+
+        # Stats: пересчёт только после изменения данных, смены дня или тэга
+        now = datetime.now()
+        key = (day_key(now), self.engine.tags.lookup(self.combo_tag.get()))
+        if self.data_loaded and (self._stats_dirty or key != self._stats_key):
+            self._stats_dirty = False
+            self._stats_key = key
+            self.compute_dashboard_stats(now, key[1])
+        if visible and self.data_loaded:
+            self.render_dashboard_stats(dur)
+
+        # На паузе, в другой вкладке или в свёрнутом окне — редкий тик
+        interval = self.TICK_FAST if self.running and visible else self.TICK_SLOW
+        self._tick_due = time.perf_counter() + interval / 1000
+        self._tick_job = self.after(interval, self.update_timer_loop)
+
+    def compute_dashboard_stats(self, now, tag):
+        today_str = day_key(now)
+        self._stats_base = {
+            "today_lbl": self.stats.day_total(today_str),
+            "week_lbl": self.stats.week_total(now),
+            "tag_lbl": self.stats.day_tag_total(today_str, tag),
+        }
+        self._streak = self.calculate_streak()
+        self.update_progress_bar()
+
+    def render_dashboard_stats(self, dur):
+        if not self.stats.count:
+            return
+        live = dur if self.running else 0
+        texts = {attr: self.format_time(total + live, short=True) for attr, total in self._stats_base.items()}
+        texts["streak_lbl"] = f"{self._streak} days"
+        for attr, text in texts.items():
+            if self._stat_texts.get(attr) != text:
+                self._stat_texts[attr] = text
+                getattr(self, attr).configure(text=text)
 
     def update_progress_bar(self):
         if self.db.empty:
@@ -741,44 +1031,270 @@ class LogWatchPro(ctk.CTk):
             self.lbl_weekly_prog.configure(text="0%")
             return
 
-        # Daily
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        total_today = self.db[self.db['date_str'] == today_str]['duration'].sum()
-        daily_goal_sec = self.settings["goals"]["daily"] * 3600
+        now = datetime.now()
+        daily_ratio, weekly_ratio = self.engine.goal_progress(now)
 
-        daily_ratio = min(total_today / daily_goal_sec, 1.0)
+        # Daily
+        total_today = self.engine.day_total(now)
         self.progress_daily.set(daily_ratio)
         self.lbl_daily_prog.configure(text=f"{int(daily_ratio * 100)}% ({self.format_time(total_today, short=True)})")
 
         # Weekly
-        week_start = pd.Timestamp.now().normalize() - pd.Timedelta(days=pd.Timestamp.now().weekday())
-        total_week = self.db[self.db['datetime'] >= week_start]['duration'].sum()
-        weekly_goal_sec = self.settings["goals"]["weekly"] * 3600
-
-        weekly_ratio = min(total_week / weekly_goal_sec, 1.0)
+        total_week = self.engine.week_total(now)
         self.progress_weekly.set(weekly_ratio)
         self.lbl_weekly_prog.configure(text=f"{int(weekly_ratio * 100)}% ({self.format_time(total_week, short=True)})")
 
     def format_time(self, seconds, short=False):
-        h = int(seconds // 3600)
-        m = int((seconds % 3600) // 60)
-        s = int(seconds % 60)
-        if short:
-            return f"{h}h {m}m"
-        return f"{h:02}:{m:02}:{s:02}"
-
-    def export_csv(self):
+        return format_time(seconds, short)
+
+    # --- EXPORT ---
+    def export_data(self):
+        self.ensure_data()
         if self.db.empty:
             messagebox.showinfo("Info", "No data to export")
             return
+        if self.export_window is not None and self.export_window.winfo_exists():
+            self.export_window.lift()
+            return
+
+        win = ctk.CTkToplevel(self)
+        win.title("Export")
+        win.geometry("440x620")
+        win.transient(self)
+        win.protocol("WM_DELETE_WINDOW", self.close_export_dialog)
+        self.export_window = win
+        self._export_cancel = None
+        self._export_progress = queue.Queue()
+
+        ctk.CTkLabel(win, text="EXPORT", font=("Arial", 16, "bold")).pack(pady=10)
+
+        # Date range
+        range_row = ctk.CTkFrame(win, fg_color="transparent")
+        range_row.pack(fill="x", padx=20, pady=5)
+        self.export_from = ctk.CTkEntry(range_row, placeholder_text="From YYYY-MM-DD", width=180)
+        self.export_from.pack(side="left", padx=(0, 10))
+        self.export_to = ctk.CTkEntry(range_row, placeholder_text="To YYYY-MM-DD", width=180)
+        self.export_to.pack(side="left")
+
+        # Tags
+        tags_frame = ctk.CTkScrollableFrame(win, height=120, label_text="Tags")
+        tags_frame.pack(fill="x", padx=20, pady=5)
+        self.export_tags = {}
+        for tag in sorted(self.db['tag'].unique()):
+            var = tk.BooleanVar(value=True)
+            ctk.CTkCheckBox(tags_frame, text=tag, variable=var).pack(anchor="w", pady=2)
+            self.export_tags[tag] = var
+
+        # Columns
+        cols_frame = ctk.CTkFrame(win, fg_color=COLORS["card"])
+        cols_frame.pack(fill="x", padx=20, pady=5)
+        self.export_columns = {}
+        for i, col in enumerate(COLUMNS):
+            var = tk.BooleanVar(value=True)
+            ctk.CTkCheckBox(cols_frame, text=col, variable=var).grid(row=i // 3, column=i % 3,
+                                                                     sticky="w", padx=10, pady=5)
+            self.export_columns[col] = var
+
+        # Format
+        fmt_row = ctk.CTkFrame(win, fg_color="transparent")
+        fmt_row.pack(fill="x", padx=20, pady=5)
+        self.export_format = ctk.CTkOptionMenu(fmt_row, values=FORMATS, width=120)
+        self.export_format.pack(side="left", padx=(0, 15))
+        self.export_gzip = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(fmt_row, text="gzip", variable=self.export_gzip).pack(side="left")
+
+        self.export_bar = ctk.CTkProgressBar(win)
+        self.export_bar.set(0)
+        self.export_bar.pack(fill="x", padx=20, pady=(15, 5))
+        self.lbl_export_status = ctk.CTkLabel(win, text="", text_color="gray")
+        self.lbl_export_status.pack()
+        self.btn_export = ctk.CTkButton(win, text="Export", command=self.start_export)
+        self.btn_export.pack(pady=15)
+
+    def start_export(self):
+        if self._export_cancel is not None:
+            # Кнопка во время экспорта работает как Cancel
+            self._export_cancel.set()
+            return
+
+        try:
+            start = pd.Timestamp(self.export_from.get()) if self.export_from.get().strip() else None
+            end = pd.Timestamp(self.export_to.get()) if self.export_to.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Export", "Dates must be in YYYY-MM-DD format", parent=self.export_window)
+            return
+        tags = [tag for tag, var in self.export_tags.items() if var.get()]
+        if len(tags) == len(self.export_tags):
+            tags = None
+        columns = [col for col, var in self.export_columns.items() if var.get()]
+        if not columns:
+            messagebox.showerror("Export", "Select at least one column", parent=self.export_window)
+            return
+        fmt = self.export_format.get()
+        compress = self.export_gzip.get()
 
         filename = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            parent=self.export_window,
+            defaultextension=default_extension(fmt, compress),
+            filetypes=[(f"{fmt.upper()} files", "*" + default_extension(fmt, compress)), ("All files", "*.*")]
         )
+        if not filename:
+            return
+
+        # Экспорт идёт в своём потоке; прогресс — через очередь
+        cancel = threading.Event()
+        self._export_cancel = cancel
+        progress = self._export_progress
+
+        def run():
+            try:
+                count = self.engine.export(filename, fmt, columns=columns, start=start, end=end, tags=tags,
+                                           compress=compress,
+                                           progress=lambda done, total: progress.put((done, total)),
+                                           cancel=cancel.is_set)
+                progress.put(("done", count))
+            except ExportCancelled:
+                progress.put(("cancelled", 0))
+            except Exception as e:
+                traceback.print_exc()
+                progress.put(("error", e))
+
+        threading.Thread(target=run, daemon=True).start()
+        self.btn_export.configure(text="Cancel", fg_color=COLORS["danger"])
+        self.lbl_export_status.configure(text="Exporting...")
+        self.after(50, self._poll_export)
+
+    def _poll_export(self):
+        result = None
+        while True:
+            try:
+                item = self._export_progress.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item[0], str):
+                result = item
+            elif self.export_window.winfo_exists():
+                done, total = item
+                self.export_bar.set(done / total if total else 1)
+                self.lbl_export_status.configure(text=f"{done:,} / {total:,} sessions")
+
+        if result is None:
+            self.after(50, self._poll_export)
+            return
+
+        self._export_cancel = None
+        if not self.export_window.winfo_exists():
+            return
+        self.btn_export.configure(text="Export", fg_color=COLORS["accent"])
+        status, value = result
+        if status == "done":
+            self.export_bar.set(1)
+            self.lbl_export_status.configure(text=f"Exported {value:,} sessions")
+        elif status == "cancelled":
+            self.export_bar.set(0)
+            self.lbl_export_status.configure(text="Export cancelled")
+        else:
+            messagebox.showerror("Export", f"Export failed: {value}", parent=self.export_window)
+            self.lbl_export_status.configure(text="")
+
+    def close_export_dialog(self):
+        if self._export_cancel is not None:
+            self._export_cancel.set()
+        self.export_window.destroy()
+
+    # --- PERF PANEL ---
+    # Обработчики UI, которые оборачиваются замером (after-колбэки и bind ловит Tk-хук)
+    PERF_METHODS = ("refresh_recent_logs", "refresh_table", "refresh_charts", "show_charts", "log_lap",
+                    "undo_last_log", "redo_last_undo", "delete_selected", "compute_dashboard_stats",
+                    "render_dashboard_stats", "select_frame", "save_data")
+    PERF_STORAGE_METHODS = ("load", "save", "append", "remove", "update", "close", "_write_snapshot",
+                            "_write_binary")
+
+    def enable_perf(self):
+        self.perf.enable()
+        self.perf.instrument(self, self.PERF_METHODS, "app")
+        self.perf.instrument(self.storage, self.PERF_STORAGE_METHODS, "storage")
+
+    def toggle_perf(self):
+        if self.perf.enabled:
+            self.perf.disable()
+        else:
+            self.enable_perf()
+        if self._perf_job is not None:
+            self.after_cancel(self._perf_job)
+        self._refresh_perf_panel()
+
+    def open_perf_panel(self):
+        if self.perf_window is not None and self.perf_window.winfo_exists():
+            self.perf_window.lift()
+            return
+
+        win = ctk.CTkToplevel(self)
+        win.title("Performance")
+        win.geometry("760x520")
+        self.perf_window = win
+
+        buttons = ctk.CTkFrame(win, fg_color="transparent")
+        buttons.pack(fill="x", padx=10, pady=10)
+        self.btn_perf_toggle = ctk.CTkButton(buttons, width=110, command=self.toggle_perf)
+        self.btn_perf_toggle.pack(side="left", padx=(0, 5))
+        ctk.CTkButton(buttons, text="Reset", width=80, command=self.perf.reset).pack(side="left", padx=5)
+        ctk.CTkButton(buttons, text="Export JSON...", width=110,
+                      command=self.export_perf_json).pack(side="left", padx=5)
+        self.btn_profile = ctk.CTkButton(buttons, text="Start cProfile", width=120, command=self.toggle_profile)
+        self.btn_profile.pack(side="left", padx=5)
+        self.lbl_perf_lag = ctk.CTkLabel(win, text="", anchor="w", font=("Roboto Mono", 12))
+        self.lbl_perf_lag.pack(fill="x", padx=10)
+
+        columns = [("name", 300), ("count", 70), ("p50", 80), ("p95", 80), ("p99", 80), ("max", 80)]
+        self.perf_tree = ttk.Treeview(win, columns=[c for c, _ in columns], show="headings")
+        for col, width in columns:
+            self.perf_tree.heading(col, text=col if col in ("name", "count") else f"{col}, ms")
+            self.perf_tree.column(col, width=width, anchor="w" if col == "name" else "e")
+        self.perf_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self._refresh_perf_panel()
+
+    def _refresh_perf_panel(self):
+        self._perf_job = None
+        if self.perf_window is None or not self.perf_window.winfo_exists():
+            return
+        self.btn_perf_toggle.configure(text="Disable" if self.perf.enabled else "Enable",
+                                       fg_color=COLORS["danger"] if self.perf.enabled else COLORS["success"])
+
+        timings = self.perf.snapshot()
+        lag = timings.pop(LAG, None)
+        if lag and lag["count"]:
+            # Гистограмма лага одной строкой: число тиков по корзинам до N мс
+            bars = " ".join(f"<{b:g}:{n}" for b, n in zip(BUCKETS_MS, lag["buckets"]) if n)
+            self.lbl_perf_lag.configure(text=f"Tick lag p50 {lag['p50_ms']:.1f} ms, p95 {lag['p95_ms']:.1f} ms, "
+                                             f"max {lag['max_ms']:.1f} ms   {bars}")
+        else:
+            self.lbl_perf_lag.configure(text="Tick lag: no samples" if self.perf.enabled else "Instrumentation off")
+
+        self.perf_tree.delete(*self.perf_tree.get_children())
+        rows = sorted(timings.items(), key=lambda kv: kv[1].get("p95_ms", 0), reverse=True)
+        for name, s in rows:
+            if s["count"]:
+                self.perf_tree.insert("", "end", values=(name, s["count"], f"{s['p50_ms']:.2f}", f"{s['p95_ms']:.2f}",
+                                                         f"{s['p99_ms']:.2f}", f"{s['max_ms']:.2f}"))
+        if self._perf_job is None:
+            self._perf_job = self.after(1000, self._refresh_perf_panel)
+
+    def export_perf_json(self):
+        filename = filedialog.asksaveasfilename(parent=self.perf_window, defaultextension=".json",
+                                                filetypes=[("JSON files", "*.json")])
         if filename:
-            self.db.to_csv(filename, index=False)
-            messagebox.showinfo("Success", f"Data exported to {filename}")
+            self.perf.export_json(filename)
+
+    def toggle_profile(self):
+        if self.perf.profiler is None:
+            self.perf.start_profile()
+            self.btn_profile.configure(text="Stop & Save...")
+            return
+        filename = filedialog.asksaveasfilename(parent=self.perf_window, defaultextension=".prof",
+                                                filetypes=[("cProfile dump", "*.prof")])
+        self.perf.stop_profile(filename or None)
+        self.btn_profile.configure(text="Start cProfile")
 
 
 if __name__ == "__main__":
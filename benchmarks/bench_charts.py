@@ -0,0 +1,47 @@
+"""Время подготовки данных Analytics (prepare_chart_data по роллапам) и пересборки роллапов.
+
+    python benchmarks/bench_charts.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logwatch_aggregates import AggregateIndex  # noqa: E402
+from logwatch_charts import PERIODS, prepare_chart_data  # noqa: E402
+from synth import synthetic_frame  # noqa: E402
+
+
+def bench(n, repeat):
+    df = synthetic_frame(n)
+    rollups = AggregateIndex()
+    start = time.perf_counter()
+    rollups.rebuild(df)
+    rebuild = time.perf_counter() - start
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for period in PERIODS:
+            prepare_chart_data(rollups, period=period)
+        timings.append((time.perf_counter() - start) / len(PERIODS))
+    return rebuild, min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'sessions':>10} {'rebuild, ms':>12} {'best, ms':>10} {'mean, ms':>10}")
+    for n in args.sizes:
+        rebuild, best, mean = bench(n, args.repeat)
+        print(f"{n:>10} {rebuild * 1000:>12.1f} {best * 1000:>10.1f} {mean * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
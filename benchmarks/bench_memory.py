@@ -0,0 +1,50 @@
+"""Память на сессию: прежний self.db (строки object, date_str, weekday/hour) против компактной таблицы.
+
+    python benchmarks/bench_memory.py --sessions 1000000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logwatch_table import compact_frame  # noqa: E402
+from synth import synthetic_history  # noqa: E402
+
+
+def legacy_frame(n):
+    """self.db в том виде, в каком его держала старая версия после открытия Analytics"""
+    df = synthetic_history(n)
+    df['task'] = df['task'].astype(object)
+    df['weekday'] = df['datetime'].dt.dayofweek.astype(float)
+    df['hour'] = df['datetime'].dt.hour.astype(float)
+    return df
+
+
+def per_column(df):
+    usage = df.memory_usage(deep=True, index=False)
+    return {col: int(usage[col]) for col in df.columns}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    args = parser.parse_args()
+    n = args.sessions
+
+    before = legacy_frame(n)
+    after = compact_frame(before)
+    old, new = per_column(before), per_column(after)
+
+    print(f"{n} sessions, bytes per session")
+    print(f"{'column':>10} {'before':>10} {'after':>10}")
+    for col in old:
+        print(f"{col:>10} {old[col] / n:>10.1f} {new.get(col, 0) / n:>10.1f}")
+    total_old, total_new = sum(old.values()), sum(new.values())
+    print(f"{'total':>10} {total_old / n:>10.1f} {total_new / n:>10.1f}")
+    print(f"{total_old / 2 ** 20:.1f} MiB -> {total_new / 2 ** 20:.1f} MiB ({total_old / total_new:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Время холодного старта: импорт приложения, первое окно и фоновая загрузка истории.
+
+    python benchmarks/bench_startup.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logwatch_engine import LogWatchEngine  # noqa: E402
+from logwatch_storage import COLUMNS  # noqa: E402
+from synth import synthetic_history  # noqa: E402
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import LogWatch_app
+print(time.perf_counter() - start, int('matplotlib' in sys.modules))
+"""
+
+WINDOW_PROBE = """
+import time
+start = time.perf_counter()
+import LogWatch_app
+app = LogWatch_app.LogWatchPro()
+app.update()
+shown = time.perf_counter() - start
+app.ensure_data()
+loaded = time.perf_counter() - start
+app.on_close()
+print(shown, loaded)
+"""
+
+
+def _probe(code, cwd):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return [float(x) for x in out.split()]
+
+
+def bench_import(repeat):
+    timings, heavy = [], 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            elapsed, mpl = _probe(IMPORT_PROBE, tmp)
+            timings.append(elapsed)
+            heavy |= int(mpl)
+    return timings, bool(heavy)
+
+
+def _write_history(n, tmp):
+    synthetic_history(n)[COLUMNS].to_json(os.path.join(tmp, "logwatch_db.json"),
+                                         orient='records', date_format='iso')
+
+
+def bench_load(n, repeat):
+    """(первая загрузка JSON, загрузка с бинарного снапшота) — то, что идёт в фоне"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_history(n, tmp)
+        path = os.path.join(tmp, "logwatch_db.json")
+        settings = os.path.join(tmp, "logwatch_settings.json")
+        start = time.perf_counter()
+        LogWatchEngine(path, settings).load()
+        cold = time.perf_counter() - start
+        warm = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            LogWatchEngine(path, settings).load()
+            warm.append(time.perf_counter() - start)
+    return cold, statistics.median(warm)
+
+
+def bench_window(n):
+    """(окно показано, история загружена) от старта процесса; None без дисплея"""
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_history(n, tmp)
+        try:
+            return _probe(WINDOW_PROBE, tmp)
+        except subprocess.CalledProcessError:
+            return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    timings, heavy = bench_import(args.repeat)
+    print(f"import LogWatch_app: best {min(timings) * 1000:.0f} ms, "
+          f"median {statistics.median(timings) * 1000:.0f} ms, "
+          f"matplotlib loaded: {'yes' if heavy else 'no'}")
+
+    print(f"{'sessions':>10} {'cold load, ms':>14} {'warm load, ms':>14} {'window, ms':>11} {'ready, ms':>10}")
+    for n in args.sizes:
+        cold, warm = bench_load(n, args.repeat)
+        window = bench_window(n)
+        shown, ready = (f"{window[0] * 1000:>11.0f}", f"{window[1] * 1000:>10.0f}") if window else \
+            (f"{'no display':>11}", f"{'-':>10}")
+        print(f"{n:>10} {cold * 1000:>14.0f} {warm * 1000:>14.0f} {shown} {ready}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Набор бенчмарков горячих путей LogWatch на синтетической истории (без окна Tk).
+
+    python benchmarks/bench_suite.py --sizes 10000 100000 1000000 --json results.json
+    python benchmarks/bench_suite.py --sizes 1000000 --baseline results.json
+
+Пути: load (холодный JSON и тёплый снапшот), save, log, undo, timer_stats (блок статистики
+update_timer_loop), streak, refresh_table (срез индекса + поиск + строки первой страницы),
+date_range (окна от дня до пяти лет двоичным поиском + строки первой страницы), tag_rename
+(переименование тэга туда и обратно через реестр), chart_data (по всем периодам) и chart_render (Agg). Время — p50/p95 по повторам,
+память — пик tracemalloc за один отдельный прогон (трассировка замедляет код, поэтому
+время меряется без неё). JSON-отчёт можно сравнить с прошлым прогоном через --baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+from logwatch_charts import PERIODS  # noqa: E402
+from logwatch_engine import LogWatchEngine, format_time  # noqa: E402
+from logwatch_storage import STORAGE_ENGINES  # noqa: E402
+from logwatch_writer import BackgroundWriter  # noqa: E402
+from synth import TAGS, synthetic_frame  # noqa: E402
+
+PATHS = ["load_cold", "load_warm", "save", "log", "undo", "timer_stats", "streak",
+         "refresh_table", "date_range", "tag_rename", "chart_data", "chart_render"]
+PAGE = 30
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _history_rows(engine, positions):
+    """Строки первой страницы History тем же кодом, что и в приложении (вместо self — заглушка)"""
+    from LogWatch_app import LogWatchPro
+    stub = SimpleNamespace(db=engine.db, format_time=format_time)
+    return LogWatchPro.history_rows(stub, positions)
+
+
+class Suite:
+    """Один размер истории: файлы во временном каталоге, движок и набор замеров"""
+
+    def __init__(self, n, storage, seed, tmp):
+        self.n = n
+        self.storage = storage
+        self.data = os.path.join(tmp, "logwatch_db.json" if storage != "sqlite" else "logwatch.sqlite")
+        self.settings = os.path.join(tmp, "logwatch_settings.json")
+        engine = self.engine()
+        engine.db = synthetic_frame(n, seed)
+        engine.save()
+        engine.close()
+        self.figure = None
+        self._loaded = None
+        self._cleanup = None
+
+    def engine(self, writer=None):
+        return LogWatchEngine(self.data, self.settings, writer=writer, storage=self.storage)
+
+    def _drop_caches(self):
+        # Холодный старт: без бинарных снапшотов (и шардов тоже), сохранённых роллапов и индекса поиска
+        stem = os.path.splitext(self.data)[0]
+        paths = [stem + ".snap", stem + ".rollups.json", stem + ".search.npz"]
+        if os.path.isdir(stem + "_shards"):
+            paths += [os.path.join(stem + "_shards", name) for name in os.listdir(stem + "_shards")
+                      if name.endswith(".snap")]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    # --- PATHS --- (каждый возвращает функцию одного вызова; подготовка не замеряется)
+    def load_cold(self):
+        def run():
+            self._drop_caches()
+            self.engine().load()
+        return run
+
+    def load_warm(self):
+        warm = self.engine()
+        warm.load()
+        warm.rebuild_rollups()
+        warm.close()
+        return lambda: self.engine().load()
+
+    def save(self):
+        engine = self.engine()
+        engine.load()
+        return engine.save
+
+    def log(self):
+        writer = BackgroundWriter()
+        engine = self.engine(writer)
+        engine.load()
+        self._cleanup = (engine, writer)
+        return lambda: engine.log("Work", "Benchmark task", 1500.0, "bench")
+
+    def undo(self):
+        writer = BackgroundWriter()
+        engine = self.engine(writer)
+        engine.load()
+        self._cleanup = (engine, writer)
+        return engine.undo
+
+    def timer_stats(self):
+        engine = self.loaded()
+
+        def run():
+            now = datetime.now()
+            engine.day_total(now)
+            engine.week_total(now)
+            engine.day_tag_total(TAGS[0], now)
+            # Как после лога: кэш streak сброшен
+            engine.stats._streak = None
+            engine.streak(now)
+            engine.goal_progress(now)
+        return run
+
+    def streak(self):
+        engine = self.loaded()
+
+        def run():
+            engine.stats._streak = None
+            engine.streak()
+        return run
+
+    def refresh_table(self):
+        engine = self.loaded()
+        engine.search.ensure(engine.db)
+        tags = [None, *TAGS[:3]]
+        state = {"i": 0}
+
+        def run():
+            tag = tags[state["i"] % len(tags)]
+            state["i"] += 1
+            positions = engine.history_index.view(tag)
+            mask = np.zeros(len(engine.db), dtype=bool)
+            mask[engine.search.query("task 1")] = True
+            positions = positions[mask[positions]]
+            _history_rows(engine, positions[:PAGE])
+        return run
+
+    def date_range(self):
+        engine = self.loaded()
+        end = engine.db['datetime'].max().normalize() + pd.Timedelta(days=1)
+        windows = [end - pd.Timedelta(days=days) for days in (1, 7, 28, 91, 365, 1826)]
+        state = {"i": 0}
+
+        def run():
+            start = windows[state["i"] % len(windows)]
+            state["i"] += 1
+            positions = engine.sessions_between(start, end)
+            _history_rows(engine, positions[:PAGE])
+        return run
+
+    def tag_rename(self):
+        engine = self.engine()
+        engine.load()
+
+        def run():
+            engine.rename_tag(TAGS[0], "Renamed")
+            engine.rename_tag("Renamed", TAGS[0])
+        return run
+
+    def chart_data(self):
+        engine = self.loaded()
+        return lambda: [engine.chart_data(period=period) for period in PERIODS]
+
+    def chart_render(self):
+        engine = self.loaded()
+        if self.figure is None:
+            from logwatch_figure import AnalyticsFigure
+            from logwatch_charts import COLORS
+            self.figure = AnalyticsFigure(COLORS)
+        data = engine.chart_data()
+
+        def run():
+            self.figure.update(data, 6)
+            self.figure.render(1000)
+        return run
+
+    def loaded(self):
+        if self._loaded is None:
+            self._loaded = self.engine()
+            self._loaded.load()
+        return self._loaded
+
+    # --- MEASURE ---
+    def measure(self, name, repeat):
+        self._cleanup = None
+        run = getattr(self, name)()
+        run()  # прогрев: ленивые импорты, кэши
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if self._cleanup is not None:
+            engine, writer = self._cleanup
+            engine.close()
+            writer.close()
+        ms = np.asarray(timings) * 1000
+        return {
+            "sessions": self.n,
+            "path": name,
+            "repeat": repeat,
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "peak_mib": round(peak / 2 ** 20, 2),
+        }
+
+
+def repeats_for(path, n, repeat, calls):
+    """Дорогие пути (загрузка, запись) повторяются repeat раз, дешёвые — calls раз"""
+    if path in ("load_cold", "load_warm", "save"):
+        return repeat if n < 1_000_000 else max(3, repeat // 2)
+    if path == "chart_render":
+        return repeat
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS)
+    parser.add_argument("--storage", choices=sorted(STORAGE_ENGINES), default="json")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats for load/save/render")
+    parser.add_argument("--calls", type=int, default=100, help="repeats for the per-call paths")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results here ('-' for stdout)")
+    parser.add_argument("--baseline", help="earlier --json output to compare p50 against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["sessions"], r["path"]): r for r in json.load(f)["results"]}
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+
+    print(f"{'sessions':>10} {'path':<14} {'p50, ms':>10} {'p95, ms':>10} {'peak, MiB':>10}"
+          + (f" {'vs base':>8}" if baseline else ""))
+    for n in args.sizes:
+        tmp = tempfile.mkdtemp(prefix="logwatch-bench-")
+        try:
+            suite = Suite(n, args.storage, args.seed, tmp)
+            for path in args.paths:
+                row = suite.measure(path, repeats_for(path, n, args.repeat, args.calls))
+                report["results"].append(row)
+                line = f"{n:>10} {path:<14} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f} {row['peak_mib']:>10.1f}"
+                old = baseline.get((n, path))
+                if old and old["p50_ms"]:
+                    line += f" {row['p50_ms'] / old['p50_ms']:>7.2f}x"
+                print(line, flush=True)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from logwatch_table import disk_frame
+
+TAGS = ["Work", "Study", "Project", "Personal", "Music", "Sport", "Reading", "Admin"]
+TASKS = [f"Task {i}" for i in range(200)]
+NOTES = ["", "focus", "meeting notes", "review", "deep work"]
+
+# Сессии в основном днём: вес часа суток (0..23)
+HOUR_WEIGHTS = np.array([1, 1, 1, 1, 1, 2, 4, 8, 14, 18, 18, 16, 12, 15, 17, 16, 14, 12, 10, 9, 8, 6, 4, 2],
+                        dtype=float)
+
+
+def synthetic_frame(n, seed=0, end=None, years=3):
+    """Случайная история из n сессий за последние years лет, сразу в компактных типах (logwatch_table).
+    Тэги распределены по Ципфу, задачи и заметки — по степенному закону, время суток — дневное;
+    одинаковый seed даёт одинаковую историю."""
+    rng = np.random.default_rng(seed)
+    end = (end or pd.Timestamp.now()).floor('s')
+    n_days = int(years * 365)
+    days = rng.integers(0, n_days, n)
+    hours = rng.choice(24, n, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    offsets_ms = (days * 24 + hours) * 3_600_000 + rng.integers(0, 3_600_000, n)
+    start = (end - pd.Timedelta(days=n_days)).normalize()
+    ts = np.sort(start.to_datetime64().astype('datetime64[ms]') + offsets_ms.astype('timedelta64[ms]'))
+    ts = np.minimum(ts, end.to_datetime64().astype('datetime64[ms]'))
+
+    def skewed(words, power):
+        weights = 1.0 / np.arange(1, len(words) + 1) ** power
+        codes = rng.choice(len(words), n, p=weights / weights.sum())
+        return pd.Categorical.from_codes(codes, categories=words)
+
+    return pd.DataFrame({
+        "datetime": ts,
+        "tag": skewed(TAGS, 1.0),
+        "task": skewed(TASKS, 0.8),
+        "duration": rng.gamma(2.0, 900.0, n).astype(np.float32),
+        "note": skewed(NOTES, 1.5),
+    })
+
+
+def synthetic_history(n, seed=0, end=None, years=3):
+    """То же в формате файла истории (с date_str, строковые столбцы)"""
+    return disk_frame(synthetic_frame(n, seed, end, years))
@@ -0,0 +1,326 @@
+"""Роллапы истории: суммы секунд по дням, ISO-неделям и месяцам (в т.ч. по тэгам),
+по дням×часам и матрица день недели×час.
+
+Обновляются инкрементально на каждый log/undo и сохраняются рядом с файлом истории.
+Запрос за любой период (квартал, год, всё время) собирается из целых месяцев, целых
+недель и оставшихся дней, то есть не зависит от числа сессий.
+"""
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from logwatch_table import frame_signature
+from logwatch_writer import write_text
+
+DAY_FMT = "%Y-%m-%d"
+VERSION = 1
+
+
+def day_key(dt):
+    return dt.strftime(DAY_FMT)
+
+
+def week_key(dt):
+    iso = dt.isocalendar()
+    return int(iso[0]), int(iso[1])
+
+
+def month_key(dt):
+    return dt.year, dt.month
+
+
+def rollups_path(data_path):
+    return os.path.splitext(data_path)[0] + ".rollups.json"
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def _next_month(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+class AggregateIndex:
+    """Инкрементальные роллапы (см. модуль) + кэш streak"""
+
+    def __init__(self, path=None, read_only=False):
+        self.path = path
+        # Только чтение: устаревший файл не удаляется и не перезаписывается
+        self.read_only = read_only
+        self.dirty = False
+        self._reset()
+
+    def _reset(self):
+        self.day_totals = {}
+        self.week_totals = {}
+        self.day_tags = {}      # 'YYYY-MM-DD' -> {tag: сек}
+        self.week_tags = {}     # (ISO-год, неделя) -> {tag: сек}
+        self.month_tags = {}    # (год, месяц) -> {tag: сек}
+        self.day_hours = {}     # 'YYYY-MM-DD' -> np.array(24)
+        self.weekday_hours = np.zeros((7, 24))
+        self.total = 0.0
+        self.count = 0
+        self._streak = None
+
+    # --- BUILD ---
+    def rebuild(self, df):
+        """Все роллапы с нуля одним проходом по таблице"""
+        self._reset()
+        self._changed()
+        if df.empty:
+            return
+
+        days, day_codes = np.unique(df['datetime'].to_numpy(dtype='datetime64[D]'), return_inverse=True)
+        day_codes = day_codes.ravel()
+        tag = df['tag'].astype('category')
+        tags = [str(t) for t in tag.cat.categories]
+        tag_codes = tag.cat.codes.to_numpy()
+        ms = df['datetime'].to_numpy(dtype='datetime64[ms]').view(np.int64)
+        hours = (ms // 3_600_000) % 24
+        dur = df['duration'].to_numpy(dtype=np.float64)
+
+        # Сетки день×тэг и день×час; недели и месяцы досчитываются уже из них
+        n_days, n_tags = len(days), len(tags)
+        tag_grid = np.bincount(day_codes * n_tags + tag_codes, weights=dur,
+                               minlength=n_days * n_tags).reshape(n_days, n_tags)
+        hour_grid = np.bincount(day_codes * 24 + hours, weights=dur, minlength=n_days * 24).reshape(n_days, 24)
+
+        for i, d in enumerate(days.astype(object)):
+            day = d.isoformat()
+            row = tag_grid[i]
+            used = np.flatnonzero(row)
+            if not len(used):
+                continue
+            per_tag = {tags[j]: float(row[j]) for j in used}
+            self.day_tags[day] = per_tag
+            self.day_totals[day] = float(row.sum())
+            self.day_hours[day] = hour_grid[i].copy()
+            self.weekday_hours[d.weekday()] += hour_grid[i]
+
+            week, month = week_key(d), month_key(d)
+            self.week_totals[week] = self.week_totals.get(week, 0.0) + self.day_totals[day]
+            for bucket, key in ((self.week_tags, week), (self.month_tags, month)):
+                target = bucket.setdefault(key, {})
+                for t, v in per_tag.items():
+                    target[t] = target.get(t, 0.0) + v
+
+        self.total = float(dur.sum())
+        self.count = len(df)
+
+    # --- INCREMENTAL UPDATES ---
+    def add(self, dt, tag, duration):
+        self._bump(dt, tag, float(duration))
+        self.count += 1
+
+    def remove(self, dt, tag, duration):
+        self._bump(dt, tag, -float(duration))
+        self.count -= 1
+
+    def _bump(self, dt, tag, delta):
+        day = day_key(dt)
+        self._add_to(self.day_totals, day, delta)
+        self._add_to(self.week_totals, week_key(dt), delta)
+        self._add_to(self.day_tags.setdefault(day, {}), tag, delta)
+        self._add_to(self.week_tags.setdefault(week_key(dt), {}), tag, delta)
+        self._add_to(self.month_tags.setdefault(month_key(dt), {}), tag, delta)
+        for bucket, key in ((self.day_tags, day), (self.week_tags, week_key(dt)), (self.month_tags, month_key(dt))):
+            if not bucket[key]:
+                del bucket[key]
+
+        hours = self.day_hours.setdefault(day, np.zeros(24))
+        hours[dt.hour] += delta
+        if day not in self.day_totals:
+            del self.day_hours[day]
+        self.weekday_hours[dt.weekday(), dt.hour] += delta
+
+        self.total += delta
+        self._streak = None
+        self._changed()
+
+    def retag(self, mapping):
+        """Тэги переименованы или слиты ({старое имя: новое}): правятся только ключи тэгов"""
+        if not mapping:
+            return
+        for bucket in (self.day_tags, self.week_tags, self.month_tags):
+            for key, per_tag in bucket.items():
+                if not mapping.keys() & per_tag.keys():
+                    continue
+                merged = {}
+                for tag, value in per_tag.items():
+                    tag = mapping.get(tag, tag)
+                    merged[tag] = merged.get(tag, 0.0) + value
+                bucket[key] = merged
+        self._changed()
+
+    def _changed(self):
+        # Первая правка после load/save: файл на диске сразу удаляется. Подпись — число сессий
+        # и их datetime, правка длительности или тэга её не меняет, и после выхода без close()
+        # старые роллапы загрузились бы без ошибок.
+        if not (self.dirty or self.read_only) and self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.dirty = True
+
+    @staticmethod
+    def _add_to(bucket, key, delta):
+        value = bucket.get(key, 0.0) + delta
+        # Убираем остатки после вычитания, чтобы пустые ключи не копились
+        if abs(value) < 1e-9:
+            bucket.pop(key, None)
+        else:
+            bucket[key] = value
+
+    # --- QUERIES ---
+    def day_total(self, day):
+        return self.day_totals.get(day, 0.0)
+
+    def day_tag_total(self, day, tag):
+        return self.day_tags.get(day, {}).get(tag, 0.0)
+
+    def week_total(self, dt):
+        return self.week_totals.get(week_key(dt), 0.0)
+
+    def first_day(self):
+        return date.fromisoformat(min(self.day_totals)) if self.day_totals else None
+
+    def _cover(self, start, end):
+        """Разбиение [start, end) на целые месяцы, целые недели (внутри месяца) и дни"""
+        d = start
+        while d < end:
+            month_end = _next_month(d)
+            if d.day == 1 and month_end <= end:
+                yield self.month_tags.get(month_key(d))
+                d = month_end
+            elif d.weekday() == 0 and d + timedelta(days=7) <= min(end, month_end):
+                yield self.week_tags.get(week_key(d))
+                d += timedelta(days=7)
+            else:
+                yield self.day_tags.get(d.isoformat())
+                d += timedelta(days=1)
+
+    def tag_totals(self, start=None, end=None):
+        """{тэг: секунды} за [start, end); без границ — за всё время"""
+        start = _as_date(start) if start is not None else self.first_day()
+        end = _as_date(end) if end is not None else date.max
+        totals = {}
+        if start is None:
+            return totals
+        if end == date.max:
+            end = date.fromisoformat(max(self.day_totals)) + timedelta(days=1)
+        for part in self._cover(start, end):
+            for tag, value in (part or {}).items():
+                totals[tag] = totals.get(tag, 0.0) + value
+        return totals
+
+    def total_between(self, start, end):
+        return sum(self.tag_totals(start, end).values())
+
+    def heatmap(self, start=None, end=None):
+        """Секунды по (день недели, час), Пн = 0"""
+        if start is None and end is None:
+            return self.weekday_hours.copy()
+        lo = _as_date(start).isoformat() if start is not None else ""
+        hi = _as_date(end).isoformat() if end is not None else "9999"
+        grid = np.zeros((7, 24))
+        for day, hours in self.day_hours.items():
+            if lo <= day < hi:
+                grid[date.fromisoformat(day).weekday()] += hours
+        return grid
+
+    def streak(self, daily_goal_sec, today=None):
+        """Дней подряд (считая сегодня) с выполненной дневной целью"""
+        today = today or datetime.now()
+        key = (day_key(today), daily_goal_sec)
+        if self._streak is not None and self._streak[0] == key:
+            return self._streak[1]
+
+        streak = 0
+        day = today
+        while day_key(day) in self.day_totals and self.day_totals[day_key(day)] >= daily_goal_sec:
+            streak += 1
+            day -= timedelta(days=1)
+
+        self._streak = (key, streak)
+        return streak
+
+    # --- VERIFY ---
+    def verify(self, df):
+        """Сверка с пересчётом по сырым данным; список расхождений (пустой — всё сходится)"""
+        fresh = AggregateIndex()
+        fresh.rebuild(df)
+        problems = []
+        if self.count != fresh.count:
+            problems.append(f"count: {self.count} != {fresh.count}")
+        if not np.isclose(self.total, fresh.total, rtol=1e-6, atol=0.5):
+            problems.append(f"total: {self.total:.1f} != {fresh.total:.1f}")
+        for name in ("day_totals", "week_totals", "day_tags", "week_tags", "month_tags", "day_hours"):
+            problems += self._diff(name, getattr(self, name), getattr(fresh, name))
+        if not np.allclose(self.weekday_hours, fresh.weekday_hours, rtol=1e-6, atol=0.5):
+            problems.append("weekday_hours differ")
+        return problems
+
+    @staticmethod
+    def _diff(name, ours, theirs):
+        problems = []
+        for key in sorted(set(ours) | set(theirs), key=str):
+            a, b = ours.get(key, {}), theirs.get(key, {})
+            if isinstance(a, dict) or isinstance(b, dict):
+                same = set(a) == set(b) and all(np.isclose(a[t], b[t], rtol=1e-6, atol=0.5) for t in a)
+            else:
+                same = np.allclose(a, b, rtol=1e-6, atol=0.5)
+            if not same:
+                problems.append(f"{name}[{key}]: {a} != {b}")
+        return problems
+
+    # --- PERSISTENCE ---
+    def save(self, df):
+        if self.path is None or self.read_only or not self.dirty:
+            return
+        data = {
+            "version": VERSION,
+            "count": self.count,
+            "signature": frame_signature(df),
+            "total": self.total,
+            "day_tags": self.day_tags,
+            "week_tags": [[y, w, tags] for (y, w), tags in self.week_tags.items()],
+            "month_tags": [[y, m, tags] for (y, m), tags in self.month_tags.items()],
+            "day_hours": {day: hours.tolist() for day, hours in self.day_hours.items()},
+        }
+        write_text(self.path, json.dumps(data))
+        self.dirty = False
+
+    def load(self, df):
+        """Роллапы из файла, если они сняты с этой же истории; иначе False (нужен rebuild)"""
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if (data.get("version") != VERSION or data["count"] != len(df)
+                    or data["signature"] != frame_signature(df)):
+                return False
+            self._reset()
+            self.day_tags = data["day_tags"]
+            self.week_tags = {(y, w): tags for y, w, tags in data["week_tags"]}
+            self.month_tags = {(y, m): tags for y, m, tags in data["month_tags"]}
+            self.day_hours = {day: np.asarray(hours, dtype=float) for day, hours in data["day_hours"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset()
+            return False
+
+        # Производные суммы восстанавливаются из сохранённых таблиц
+        for day, tags in self.day_tags.items():
+            self.day_totals[day] = sum(tags.values())
+            self.weekday_hours[date.fromisoformat(day).weekday()] += self.day_hours.get(day, 0.0)
+        self.week_totals = {key: sum(tags.values()) for key, tags in self.week_tags.items()}
+        self.total = float(data["total"])
+        self.count = int(data["count"])
+        self.dirty = False
+        return True
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from logwatch_aggregates import day_key
+
+# Палитра приложения; графики и отчёты (logwatch_reports) рисуются в ней же
+COLORS = {
+    "bg": "#1a1a1a",
+    "card": "#2b2b2b",
+    "accent": "#1f6aa5",
+    "success": "#2cc985",
+    "warning": "#e2b63e",
+    "danger": "#ff5f5f"
+}
+DAYS_BACK = 14
+TOP_TAGS = 5
+# Период круговой диаграммы, тепловой карты и трендов: дней назад (None — всё время)
+PERIODS = {"Last 4 Weeks": 28, "Last Quarter": 91, "Last Year": 365, "All Time": None}
+DEFAULT_PERIOD = "All Time"
+# Периоды длиннее этого разбиваются в трендах на месяцы, короче — на недели, совсем короткие
+# (недельные отчёты, свой диапазон в несколько дней) — на дни
+WEEKLY_TRENDS_MAX_DAYS = 120
+DAILY_TRENDS_MAX_DAYS = 14
+
+
+def trend_edges(start, end):
+    """Границы интервалов трендов: дни, начала недель или месяцев внутри [start, end)"""
+    if (end - start).days <= DAILY_TRENDS_MAX_DAYS:
+        step = [start + timedelta(days=i) for i in range((end - start).days)]
+        fmt = "%a %m/%d"
+    elif (end - start).days <= WEEKLY_TRENDS_MAX_DAYS:
+        first = start + timedelta(days=-start.weekday() % 7)
+        step = [first + timedelta(weeks=i) for i in range((end - first).days // 7 + 1)]
+        fmt = "%m/%d"
+    else:
+        first = (start.replace(day=1) + timedelta(days=32)).replace(day=1) if start.day > 1 else start
+        step = list(pd.date_range(first, end, freq='MS').date)
+        fmt = "%b %Y"
+    edges = sorted({start, end, *(d for d in step if start < d < end)})
+    return edges, [d.strftime(fmt) for d in edges[:-1]]
+
+
+def prepare_chart_data(rollups, today=None, period=DEFAULT_PERIOD, start=None, end=None):
+    """Все данные для вкладки Analytics из роллапов (без matplotlib и без прохода по сессиям).
+
+    period — имя из PERIODS или подпись произвольного диапазона [start, end) (даты; None —
+    от первого дня истории / по сегодня включительно; у подписи не из PERIODS обе границы
+    могут быть None — тогда это всё время)."""
+    today = (today or pd.Timestamp.now()).normalize()
+    if start is None and end is None:
+        days_back = PERIODS.get(period)
+        if days_back is not None:
+            start = today.date() + timedelta(days=1 - days_back)
+    start = pd.Timestamp(start).date() if start is not None else None
+    open_start = start is None
+    end = pd.Timestamp(end).date() if end is not None else today.date() + timedelta(days=1)
+    if start is None:
+        start = min(rollups.first_day() or today.date(), end - timedelta(days=1))
+
+    date_range = pd.date_range(start=today - pd.Timedelta(days=DAYS_BACK - 1), end=today, freq='D')
+    daily = [rollups.day_total(day_key(d)) for d in date_range]
+    week_total = rollups.week_total(today)
+
+    tag_sum = pd.Series(rollups.tag_totals(start, end), dtype=float)
+    tag_sum = tag_sum[tag_sum > 0].sort_index()
+    heatmap = rollups.heatmap(None if open_start else start, end)
+
+    top_tags = list(tag_sum.nlargest(TOP_TAGS).index)
+    edges, labels = trend_edges(start, end)
+    trends = {tag: [0.0] * len(labels) for tag in top_tags}
+    for i in range(len(labels)):
+        totals = rollups.tag_totals(edges[i], edges[i + 1])
+        for tag in top_tags:
+            trends[tag][i] = totals.get(tag, 0.0)
+
+    return {
+        "today": today,
+        "period": period,
+        "count": rollups.count,
+        "total": rollups.total,
+        "n_days": len(rollups.day_totals),
+        "today_total": daily[-1],
+        "yesterday_total": daily[-2],
+        "week_total": week_total,
+        "dates": date_range,
+        "daily": daily,
+        "tag_sum": tag_sum,
+        "heatmap": np.asarray(heatmap),
+        "top_tags": top_tags,
+        "trends": trends,
+        "trend_labels": labels,
+    }
@@ -0,0 +1,285 @@
+"""Консольный LogWatch: отчёты, экспорт, импорт и статистика без Tk (matplotlib — только в reports).
+
+    logwatch report [--date YYYY-MM-DD]
+    logwatch export out.csv [--format jsonl] [--from ...] [--to ...] [--tag Work] [--gzip]
+    logwatch import old.json [more.json ...]
+    logwatch stats --since YYYY-MM-DD
+    logwatch rollups [--rebuild]
+    logwatch merge desktop.json laptop.json -o merged.json
+    logwatch shards [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--workers N]
+    logwatch tags [rename OLD NEW | merge A B --into C | split TAG --into NEW [--task TEXT]]
+    logwatch reports [alice.json bob.json ...] -o reports/ [--period week] [--last N | --all]
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from logwatch_engine import FILE_SETTINGS, LogWatchEngine, format_time
+from logwatch_export import FORMATS, default_extension
+from logwatch_merge import merge_files
+from logwatch_reports import DEFAULT_LAST, KINDS, generate_reports
+from logwatch_shards import shards_between
+from logwatch_storage import COLUMNS, FILE_DB, STORAGE_ENGINES, ShardedStorage
+
+
+def _date(text):
+    try:
+        return pd.Timestamp(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {text!r} (expected YYYY-MM-DD)")
+
+
+def cmd_report(engine, args):
+    day = (args.date or pd.Timestamp.now()).to_pydatetime()
+    daily, weekly = engine.goal_progress(day)
+    print(f"Date:     {day:%Y-%m-%d}")
+    print(f"Today:    {format_time(engine.day_total(day), short=True)} ({daily:.0%} of daily goal)")
+    print(f"Week:     {format_time(engine.week_total(day), short=True)} ({weekly:.0%} of weekly goal)")
+    print(f"Streak:   {engine.streak(day)} days")
+    print(f"All time: {format_time(engine.stats.total, short=True)} in {engine.stats.count} sessions")
+    return 0
+
+
+def cmd_export(engine, args):
+    fmt = args.format or os.path.splitext(args.path.removesuffix(".gz"))[1].lstrip(".") or "csv"
+    if fmt not in FORMATS:
+        print(f"Unsupported format: {fmt} (available: {', '.join(FORMATS)})", file=sys.stderr)
+        return 2
+    compress = args.gzip or args.path.endswith(".gz")
+    # --tag — имя или алиас из реестра; неизвестный тэг — ошибка, а не пустой экспорт
+    unknown = [t for t in args.tag or [] if engine.tags.resolve(t) is None]
+    if unknown:
+        print(f"Unknown tag: {', '.join(map(repr, unknown))} (see 'logwatch tags')", file=sys.stderr)
+        return 2
+    path = args.path if os.path.splitext(args.path)[1] else args.path + default_extension(fmt, compress)
+    count = engine.export(path, fmt, columns=args.columns, start=args.date_from, end=args.date_to,
+                          tags=[engine.tags.lookup(t) for t in args.tag] if args.tag else None, compress=compress)
+    print(f"Exported {count} sessions to {path}")
+    return 0
+
+
+def cmd_import(engine, args):
+    report = engine.import_files(args.files, workers=args.workers)
+    for path, r in report.items():
+        print(f"{path} ({r['format']}): {r['imported']} imported, {r['duplicates']} duplicates")
+    return 0
+
+
+def cmd_stats(engine, args):
+    stats = engine.tag_stats(args.since, args.until)
+    if stats.empty:
+        print("No sessions in range")
+        return 0
+    width = max(len(tag) for tag in stats.index)
+    print(f"{'Tag':<{width}}  {'Sessions':>8}  {'Total':>9}  {'Average':>9}")
+    for tag, row in stats.iterrows():
+        print(f"{tag:<{width}}  {int(row['sessions']):>8}  {format_time(row['total'], short=True):>9}  "
+              f"{format_time(row['average']):>9}")
+    print(f"{'Total':<{width}}  {int(stats['sessions'].sum()):>8}  "
+          f"{format_time(stats['total'].sum(), short=True):>9}")
+    return 0
+
+
+def cmd_rollups(engine, args):
+    if args.rebuild:
+        engine.rebuild_rollups()
+        print(f"Rebuilt rollups for {engine.stats.count} sessions ({engine.stats.path})")
+        return 0
+    problems = engine.verify_rollups()
+    for problem in problems[:20]:
+        print(problem)
+    if problems:
+        print(f"{len(problems)} mismatches; run 'logwatch rollups --rebuild'", file=sys.stderr)
+        return 1
+    print(f"Rollups OK ({engine.stats.count} sessions, {len(engine.stats.day_totals)} days)")
+    return 0
+
+
+def cmd_tags(engine, args):
+    try:
+        if args.tags_command == "rename":
+            engine.rename_tag(args.old, args.new)
+            print(f"Renamed {args.old!r} to {engine.tags.lookup(args.new)!r}")
+        elif args.tags_command == "merge":
+            mapping = engine.merge_tags(args.sources, args.into)
+            print(f"Merged {', '.join(map(repr, mapping)) or 'nothing'} into {engine.tags.lookup(args.into)!r}")
+        elif args.tags_command == "split":
+            end = args.date_to + pd.Timedelta(days=1) if args.date_to is not None else None
+            moved = engine.split_tag(args.tag, args.into, args.task, args.date_from, end)
+            print(f"Moved {moved} sessions from {engine.tags.lookup(args.tag)!r} to {engine.tags.lookup(args.into)!r}")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.tags_command is None:
+        for tid, name, aliases, hidden, sessions, total in engine.tag_table():
+            extra = (" (hidden)" if hidden else "") + (f"  aka {', '.join(map(repr, aliases))}" if aliases else "")
+            print(f"{tid:>4}  {name:<20} {sessions:>8} sessions  {format_time(total, short=True):>10}{extra}")
+    return 0
+
+
+def cmd_merge(args):
+    report = merge_files(args.files, args.output)
+    for path, r in report["inputs"].items():
+        order = "sorted" if r["sorted"] else f"unsorted, {r['runs']} runs"
+        print(f"{path} ({r['format']}, {order}): {r['read']} sessions")
+    print(f"Wrote {report['written']} sessions to {args.output}: "
+          f"{report['duplicates']} duplicates dropped, {report['conflicts']} conflicts")
+    for c in report["conflict_samples"][:args.show_conflicts]:
+        print(f"  {c['kind']} conflict at {c['datetime']}:")
+        for e in c["entries"]:
+            print(f"    {e['source']}: {e['tag']} / {e['task']} / {format_time(e['duration'])} / {e['note']!r}")
+    return 0
+
+
+def cmd_shards(args):
+    storage = ShardedStorage(args.data)
+    if not os.path.isdir(storage.root):
+        print(f"No shards at {storage.root} (switch storage to 'sharded' first)", file=sys.stderr)
+        return 1
+    storage.workers = args.workers
+    storage.read_only = True
+    storage.load_manifest()
+    keys = shards_between(storage.manifest, args.since, args.until)
+    for key in keys:
+        entry = storage.manifest[key]
+        print(f"{key}  {entry['count']:>8} sessions  {format_time(entry['total'], short=True):>10}")
+    # Итоги по тэгам за диапазон: только шарды из списка выше, по процессу на шард
+    result = storage.aggregate(args.since, args.until)
+    print(f"{len(keys)} of {len(storage.manifest)} shards, {result['count']} sessions in range, "
+          f"{format_time(result['total'], short=True)}")
+    for tag, total in sorted(result["tags"].items(), key=lambda item: -item[1]):
+        print(f"  {tag:<20} {format_time(total, short=True):>10}")
+    return 0
+
+
+def cmd_reports(args):
+    # Настройки (дневная цель, тэги) — файл FILE_SETTINGS рядом с историей, иначе --settings
+    histories = []
+    for path in args.histories or [args.data]:
+        settings = os.path.join(os.path.dirname(path), FILE_SETTINGS)
+        histories.append((path, settings if os.path.exists(settings) else args.settings))
+    kinds = KINDS if args.period == "all" else (args.period,)
+    results = generate_reports(histories, args.output, kinds, None if args.all else args.last,
+                               args.date, args.storage, args.workers, args.force)
+    failed = 0
+    for path, r in results.items():
+        if "error" in r:
+            print(f"{path}: could not read: {r['error']}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"{path}: {len(r['rendered'])} rendered, {len(r['unchanged'])} unchanged, "
+              f"{len(r['empty'])} without sessions -> {r['dir']}")
+    return 1 if failed else 0
+
+
+def read_only(args):
+    """Запросы (report, export, stats, проверка роллапов, список тэгов) ничего не пишут на диск"""
+    if args.func is cmd_rollups:
+        return not args.rebuild
+    if args.func is cmd_tags:
+        return args.tags_command is None
+    return args.func in (cmd_report, cmd_export, cmd_stats)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="logwatch", description="LogWatch command line")
+    parser.add_argument("--data", default=FILE_DB, help="history file (default: %(default)s)")
+    parser.add_argument("--settings", default=FILE_SETTINGS, help="settings file (default: %(default)s)")
+    parser.add_argument("--storage", choices=sorted(STORAGE_ENGINES),
+                        help="storage engine (default: from settings)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("report", help="today / week / streak summary")
+    p.add_argument("--date", type=_date, help="report for this day instead of today")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("export", help="export sessions")
+    p.add_argument("path")
+    p.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    p.add_argument("--from", dest="date_from", type=_date)
+    p.add_argument("--to", dest="date_to", type=_date)
+    p.add_argument("--tag", action="append", help="repeatable")
+    p.add_argument("--columns", nargs="+", choices=COLUMNS)
+    p.add_argument("--gzip", action="store_true")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="import legacy LogWatch files")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--workers", type=int)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("stats", help="per-tag totals")
+    p.add_argument("--since", type=_date)
+    p.add_argument("--until", type=_date)
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("rollups", help="verify the saved rollups against the raw history")
+    p.add_argument("--rebuild", action="store_true", help="recompute and save them instead")
+    p.set_defaults(func=cmd_rollups)
+
+    p = sub.add_parser("tags", help="list tags; rename, merge or split them")
+    p.set_defaults(func=cmd_tags)
+    tags = p.add_subparsers(dest="tags_command")
+    t = tags.add_parser("rename", help="the old name stays as an alias")
+    t.add_argument("old")
+    t.add_argument("new")
+    t = tags.add_parser("merge", help="sessions of the source tags move to --into")
+    t.add_argument("sources", nargs="+")
+    t.add_argument("--into", required=True)
+    t = tags.add_parser("split", help="move matching sessions of a tag to another tag")
+    t.add_argument("tag")
+    t.add_argument("--into", required=True)
+    t.add_argument("--task", help="only sessions whose task contains this text")
+    t.add_argument("--from", dest="date_from", type=_date)
+    t.add_argument("--to", dest="date_to", type=_date)
+
+    # merge работает только с файлами и не загружает историю движка
+    p = sub.add_parser("merge", help="merge histories from several machines into one sorted file")
+    p.add_argument("files", nargs="+", help="history files; earlier ones win note conflicts")
+    p.add_argument("-o", "--output", required=True, help="may be one of the inputs")
+    p.add_argument("--show-conflicts", type=int, default=10, metavar="N")
+    p.set_defaults(standalone=cmd_merge)
+
+    # shards читает манифест и только нужные шарды, без загрузки всей истории
+    p = sub.add_parser("shards", help="per-month shards and per-tag totals of the sharded storage")
+    p.add_argument("--since", type=_date)
+    p.add_argument("--until", type=_date)
+    p.add_argument("--workers", type=int)
+    p.set_defaults(standalone=cmd_shards)
+
+    # reports загружает каждую историю сам (по одной за раз), рендер — в пуле процессов
+    p = sub.add_parser("reports", help="weekly / monthly PNG + HTML reports (skips unchanged periods)")
+    p.add_argument("histories", nargs="*", help="history files (default: --data)")
+    p.add_argument("-o", "--output", required=True, help="reports directory")
+    p.add_argument("--period", choices=[*KINDS, "all"], default="all")
+    p.add_argument("--last", type=int, default=DEFAULT_LAST, metavar="N",
+                   help="only the N latest periods of each kind (default: %(default)s)")
+    p.add_argument("--all", action="store_true", help="every period since the first session")
+    p.add_argument("--date", type=_date, help="treat this day as today")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--force", action="store_true", help="re-render unchanged periods too")
+    p.set_defaults(standalone=cmd_reports)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "standalone", None):
+        return args.standalone(args)
+    engine = LogWatchEngine(args.data, args.settings, storage=args.storage, read_only=read_only(args))
+    try:
+        engine.load()
+    except Exception as e:
+        # В отличие от приложения, CLI не трогает нечитаемый файл — только сообщает
+        print(f"Could not read {engine.storage.path}: {e}", file=sys.stderr)
+        return 1
+    try:
+        return args.func(engine, args)
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from logwatch_aggregates import AggregateIndex, day_key, rollups_path
+from logwatch_charts import DEFAULT_PERIOD, prepare_chart_data
+from logwatch_export import export_frame
+from logwatch_import import import_files
+from logwatch_index import RecentRing, SessionIndex
+from logwatch_oplog import Operation, OperationLog
+from logwatch_search import SearchIndex, search_path
+from logwatch_storage import FILE_DB, empty_frame, make_storage
+from logwatch_table import append_rows, replace_row, session_id
+from logwatch_tags import TagRegistry, remap_tags
+from logwatch_writer import write_text
+
+FILE_SETTINGS = "logwatch_settings.json"
+
+
+def default_settings():
+    return {
+        "goals": {"daily": 6, "weekly": 35, "global": 1000},
+        "tags": ["Work", "Study", "Project", "Personal"],
+        "theme": "blue",
+        "storage": "json"
+    }
+
+
+def format_time(seconds, short=False):
+    h = int(seconds // 3600)
+    m = int((seconds % 3600) // 60)
+    s = int(seconds % 60)
+    if short:
+        return f"{h}h {m}m"
+    return f"{h:02}:{m:02}:{s:02}"
+
+
+def parse_time(text):
+    """'HH:MM:SS' (или 'MM:SS', 'SS') -> секунды; ValueError при неверном формате"""
+    parts = [float(p) for p in text.strip().split(":")]
+    if not 1 <= len(parts) <= 3 or any(p < 0 for p in parts):
+        raise ValueError(f"invalid duration: {text!r}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+
+class LogWatchEngine:
+    """Данные LogWatch без UI: загрузка, лог/undo, агрегаты, запросы, импорт и экспорт.
+    Tk-приложение и CLI — тонкие клиенты поверх него; Tk и matplotlib здесь не импортируются."""
+
+    def __init__(self, data_path=FILE_DB, settings_path=FILE_SETTINGS, writer=None, storage=None,
+                 read_only=False):
+        self.settings_path = settings_path
+        self.writer = writer
+        # Запросы CLI: настройки, роллапы, индекс поиска и снапшоты на диске не трогаются
+        self.read_only = read_only
+        self.settings = self.load_settings()
+        self.tags = TagRegistry.from_settings(self.settings)
+        self.storage = make_storage(storage or self.settings.get("storage", "json"), data_path, writer, read_only)
+        self.stats = AggregateIndex(rollups_path(data_path), read_only)
+        self.history_index = SessionIndex()
+        self.recent = RecentRing(size=5)
+        self.search = SearchIndex(search_path(data_path))
+        self.ops = OperationLog()
+        self.db = empty_frame()
+
+    # --- PERSISTENCE ---
+    def load(self):
+        """Чтение истории; ошибки чтения пробрасываются (см. recover)"""
+        self._reindex(self.storage.load(), cached=True)
+        return self.db
+
+    def recover(self):
+        """Нечитаемый файл данных откладывается в сторону, работа продолжается с пустой историей"""
+        backup = self.storage.quarantine()
+        self._reindex(empty_frame())
+        return backup
+
+    def _reindex(self, df, cached=False):
+        df, renamed = self._canonical(df)
+        self.db = df
+        self.ops.clear()
+        # Сохранённые роллапы берутся, только если сняты с этой же истории
+        if not (cached and self.stats.load(df)):
+            self.stats.rebuild(df)
+        else:
+            self.stats.retag(renamed)
+        self.history_index.rebuild(df)
+        self.recent.rebuild(df, self.history_index.order)
+        self._sync_tags()
+
+    def _canonical(self, df):
+        """Тэги df в канонических именах реестра; {старое имя: новое} для сохранённых роллапов"""
+        if df.empty:
+            return df, {}
+        names = list(df['tag'].cat.categories)
+        targets = self.tags.targets(names)
+        renamed = {old: new for old, new in zip(names, targets) if old != new}
+        if renamed:
+            df = df.assign(tag=remap_tags(df['tag'].array, targets))
+        return df, renamed
+
+    def save(self):
+        self.storage.save(self.db)
+
+    def close(self):
+        if not self.read_only:
+            self.search.save(self.db)
+            self.stats.save(self.db)
+        self.storage.close()
+
+    def load_settings(self):
+        if os.path.exists(self.settings_path):
+            try:
+                with open(self.settings_path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return default_settings()
+        return default_settings()
+
+    def _sync_tags(self):
+        """Изменённый реестр — в настройки (список tags для выбора выводится из него)"""
+        if not self.tags.dirty:
+            return
+        self.settings["tag_registry"] = self.tags.to_settings()
+        self.settings["tags"] = self.tags.visible()
+        self.settings.pop("tag_colors", None)
+        self.tags.dirty = False
+        self.save_settings()
+
+    def save_settings(self):
+        # Снимок настроек берётся сейчас, запись на диск — в потоке writer'а (если он есть)
+        if self.read_only:
+            return
+        text = json.dumps(self.settings, indent=2)
+        if self.writer is None:
+            write_text(self.settings_path, text)
+        else:
+            self.writer.submit(self.settings_path, lambda: write_text(self.settings_path, text))
+
+    # --- MUTATIONS ---
+    # Каждая правка — операция в self.ops; агрегаты и индексы обновляются инкрементально
+    EDITABLE = ("tag", "task", "duration", "note")
+
+    def log(self, tag, task, duration, note="", now=None):
+        """Новая сессия; возвращает добавленную строку"""
+        # Точность таблицы (мс, float32), чтобы строка операции совпадала со строкой в db
+        now = pd.Timestamp(now or datetime.now()).floor('ms')
+        tag = self.tags.canonical(tag)
+        self._sync_tags()
+        while self.find(session_id(now)) is not None:
+            # id сессий уникальны: две записи в одну миллисекунду разводятся
+            now += pd.Timedelta(milliseconds=1)
+        new_row = {
+            "datetime": now,
+            "tag": tag,
+            "task": task,
+            "duration": float(np.float32(duration)),
+            "note": note
+        }
+        self._insert(new_row)
+        self.ops.record(Operation("log", None, new_row))
+        return new_row
+
+    def delete(self, sid):
+        """Удаление сессии по id; возвращает удалённую строку"""
+        row = self._remove(self.position(sid))
+        self.ops.record(Operation("delete", row, None))
+        return row
+
+    def edit(self, sid, **changes):
+        """Правка tag/task/duration/note сессии; возвращает новую строку"""
+        unknown = set(changes) - set(self.EDITABLE)
+        if unknown:
+            raise ValueError(f"not editable: {', '.join(sorted(unknown))}")
+        pos = self.position(sid)
+        old = self.row(pos)
+        new = dict(old, **changes)
+        new["tag"] = self.tags.canonical(new["tag"])
+        new["duration"] = float(np.float32(new["duration"]))
+        if new == old:
+            return old
+        self._sync_tags()
+        self._replace(pos, new)
+        self.ops.record(Operation("edit", old, new))
+        return new
+
+    def undo(self):
+        """Отмена последней операции; без журнала (история прошлых запусков) — удаление
+        самой свежей по datetime сессии. Возвращает операцию или None."""
+        op = self.ops.peek_undo(self._latest_log)
+        if op is not None:
+            self._apply(op.after, op.before)
+            self.ops.undo(lambda: op)
+        return op
+
+    def redo(self):
+        """Повтор последней отменённой операции; возвращает её или None"""
+        op = self.ops.peek_redo()
+        if op is not None:
+            self._apply(op.before, op.after)
+            self.ops.redo()
+        return op
+
+    def next_undo(self):
+        return self.ops.peek_undo(self._latest_log)
+
+    def next_redo(self):
+        return self.ops.peek_redo()
+
+    def _latest_log(self):
+        if self.db.empty:
+            return None
+        return Operation("log", None, self.row(self.history_index.order[0]))
+
+    def _apply(self, current, target):
+        """Переход сессии из состояния current в target (None — сессии нет)"""
+        if current is None:
+            self._insert(target)
+        elif target is None:
+            self._remove(self.position(session_id(current["datetime"])))
+        else:
+            self._replace(self.position(session_id(current["datetime"])), target)
+
+    def _insert(self, row):
+        # Таблица и массивы индекса копируются целиком (O(N) на запись): столбцы pandas
+        # и numpy не растут на месте. Роллапы, кольцо и запись в хранилище — O(1).
+        self.db = append_rows(self.db, pd.DataFrame([row]))
+        self.stats.add(row["datetime"], row["tag"], row["duration"])
+        self.history_index.append(self.db)
+        if self.history_index.order[0] == len(self.db) - 1:
+            # Самая свежая сессия — в начало кольца за O(1)
+            self.recent.push(row)
+        else:
+            self.recent.rebuild(self.db, self.history_index.order)
+        if self.search.loaded:
+            self.search.add(len(self.db) - 1, row["task"], row["note"])
+        self.storage.append(row, self.db)
+
+    def _remove(self, pos):
+        row = self.row(pos)
+        self.stats.remove(row["datetime"], row["tag"], row["duration"])
+        if pos == len(self.db) - 1:
+            # Последняя строка: срез без копирования, индекс поиска правится с конца
+            self.db = self.db.iloc[:-1]
+            if self.search.loaded:
+                self.search.remove_last(row["task"], row["note"])
+            self.history_index.remove_last(self.db)
+        else:
+            self.db = self.db.drop(index=self.db.index[pos]).reset_index(drop=True)
+            self.search.invalidate()
+            self.history_index.remove(self.db, pos)
+        self.recent.rebuild(self.db, self.history_index.order)
+        self.storage.remove(row, self.db)
+        return row
+
+    def _replace(self, pos, new):
+        old = self.row(pos)
+        self.db = replace_row(self.db, pos, {col: new[col] for col in self.EDITABLE if new[col] != old[col]})
+        self.stats.remove(old["datetime"], old["tag"], old["duration"])
+        self.stats.add(new["datetime"], new["tag"], new["duration"])
+        self.history_index.retag(pos, new["tag"])
+        self.recent.rebuild(self.db, self.history_index.order)
+        if (old["task"], old["note"]) != (new["task"], new["note"]):
+            self.search.invalidate()
+        self.storage.update(old, new, self.db)
+
+    def import_files(self, paths, workers=None):
+        """Импорт старых форматов; тэги, цвета и цели по тэгам переносятся в настройки"""
+        new, meta, report = import_files(list(paths), self.db, workers=workers)
+        if not new.empty:
+            self._reindex(append_rows(self.db, new))
+            self.save()
+
+        for tag in new['tag'].unique():
+            self.tags.add(tag)
+        for tag, color in meta["colors"].items():
+            self.tags.set_color(tag, color)
+        goals = self.settings.setdefault("tag_goals", {})
+        goals.update({self.tags.canonical(tag): goal for tag, goal in meta["goals"].items()})
+        self._sync_tags()
+        self.save_settings()
+        return report
+
+    def export(self, path, fmt="csv", **options):
+        """Экспорт текущей истории (см. export_frame); возвращает число строк"""
+        return export_frame(self.db, path, fmt, index=self.history_index, **options)
+
+    # --- TAGS ---
+    # rename/merge меняют реестр и одним проходом по кодам категорий — таблицу в памяти;
+    # файлы истории не переписываются: старые имена остаются алиасами и сводятся при загрузке
+    def add_tag(self, name):
+        """Тэг в списке выбора; False — он там уже был"""
+        added = self.tags.add(name)
+        self._sync_tags()
+        return added
+
+    def hide_tag(self, name):
+        """Тэг убирается из списков выбора; сессии с ним остаются"""
+        self.tags.hide(name)
+        self._sync_tags()
+
+    def rename_tag(self, name, new_name):
+        mapping = self.tags.rename(name, new_name)
+        self._retag(mapping)
+        return mapping
+
+    def merge_tags(self, sources, target):
+        """Тэги sources сливаются в target; возвращает {старое имя: target}"""
+        mapping = self.tags.merge(sources, target)
+        self._retag(mapping)
+        return mapping
+
+    def split_tag(self, tag, into, task=None, start=None, end=None):
+        """Сессии тэга tag (с task в названии задачи, в [start, end)) переносятся в тэг into.
+        Возвращает число перенесённых сессий."""
+        tid = self.tags.resolve(tag)
+        if tid is None:
+            raise ValueError(f"unknown tag: {tag!r}")
+        source, target = self.tags.names[tid], self.tags.canonical(into)
+        self.tags.add(target)
+        self._sync_tags()
+        if self.db.empty or source == target:
+            return 0
+
+        values = self.db['tag'].array
+        mask = np.asarray(values == source)
+        if task:
+            tasks = self.db['task'].array
+            hit = np.append(tasks.categories.str.contains(task, case=False, regex=False), False)
+            mask &= hit[tasks.codes]
+        if start is not None or end is not None:
+            in_range = np.zeros(len(self.db), dtype=bool)
+            in_range[self.history_index.range(start, end, tag=source)] = True
+            mask &= in_range
+        positions = np.flatnonzero(mask)
+        if not len(positions):
+            return 0
+
+        if target not in values.categories:
+            values = values.add_categories([target])
+        codes = values.codes.copy()
+        codes[positions] = values.categories.get_loc(target)
+        self.db = self.db.assign(tag=pd.Categorical.from_codes(codes, categories=values.categories))
+        self.stats.rebuild(self.db)
+        self.history_index.refresh_tags(self.db)
+        self.recent.rebuild(self.db, self.history_index.order)
+        self.ops.clear()
+        self.storage.retag(self.db, positions)
+        return len(positions)
+
+    def tag_table(self):
+        """[(id, имя, алиасы, скрыт, сессий, секунд)] по всем тэгам реестра"""
+        counts = self.db['tag'].value_counts() if not self.db.empty else {}
+        totals = self.stats.tag_totals()
+        return [(tid, name, self.tags.aliases.get(tid, []), tid in self.tags.hidden,
+                 int(counts.get(name, 0)), totals.get(name, 0.0))
+                for tid, name in sorted(self.tags.names.items())]
+
+    def _retag(self, mapping):
+        """Переименование категорий таблицы по mapping {старое имя: новое}: без проходов по строкам"""
+        if mapping and not self.db.empty:
+            targets = [mapping.get(name, name) for name in self.db['tag'].cat.categories]
+            self.db = self.db.assign(tag=remap_tags(self.db['tag'].array, targets))
+            self.stats.retag(mapping)
+            self.history_index.refresh_tags(self.db)
+            self.recent.rebuild(self.db, self.history_index.order)
+            self.ops.retag(mapping)
+        goals = self.settings.get("tag_goals", {})
+        for old, new in mapping.items():
+            goal = goals.pop(old, None)
+            if goal is not None:
+                goals.setdefault(new, goal)
+        self._sync_tags()
+
+    # --- QUERIES ---
+    def find(self, sid):
+        """Позиция сессии с id sid в self.db или None (при совпадении — последняя)"""
+        return self.history_index.find(sid)
+
+    def position(self, sid):
+        pos = self.find(sid)
+        if pos is None:
+            raise KeyError(f"no session {sid}")
+        return pos
+
+    def sessions_between(self, start=None, end=None, tag=None):
+        """Позиции сессий с start <= datetime < end, новые первыми (срез индекса, без маски)"""
+        return self.history_index.range(start, end, tag)
+
+    def row(self, pos):
+        r = self.db.iloc[pos]
+        return {"datetime": r['datetime'], "tag": r['tag'], "task": r['task'],
+                "duration": float(r['duration']), "note": r['note']}
+
+    def day_total(self, day=None):
+        return self.stats.day_total(day_key(day or datetime.now()))
+
+    def day_tag_total(self, tag, day=None):
+        return self.stats.day_tag_total(day_key(day or datetime.now()), tag)
+
+    def week_total(self, now=None):
+        return self.stats.week_total(now or datetime.now())
+
+    def streak(self, today=None):
+        """Дней подряд с выполненной дневной целью"""
+        return self.stats.streak(self.settings["goals"]["daily"] * 3600, today)
+
+    def goal_progress(self, now=None):
+        """(доля дневной цели, доля недельной цели), каждая не больше 1"""
+        now = now or datetime.now()
+        daily = self.day_total(now) / (self.settings["goals"]["daily"] * 3600)
+        weekly = self.week_total(now) / (self.settings["goals"]["weekly"] * 3600)
+        return min(daily, 1.0), min(weekly, 1.0)
+
+    def chart_data(self, today=None, period=DEFAULT_PERIOD, start=None, end=None):
+        return prepare_chart_data(self.stats, today, period, start, end)
+
+    def verify_rollups(self):
+        """Расхождения роллапов с сырой историей (пустой список — всё сходится)"""
+        return self.stats.verify(self.db)
+
+    def rebuild_rollups(self):
+        self.stats.rebuild(self.db)
+        self.stats.save(self.db)
+
+    def tag_stats(self, since=None, until=None):
+        """Сводка по тэгам за период: сессии, всего и в среднем секунд (по убыванию total)"""
+        df = self.db.iloc[self.sessions_between(since, until)]
+        stats = df.groupby('tag', observed=True)['duration'].agg(sessions='count', total='sum', average='mean')
+        return stats.sort_values('total', ascending=False)
@@ -0,0 +1,124 @@
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+
+from logwatch_storage import COLUMNS
+from logwatch_table import disk_frame
+from logwatch_writer import atomic_write
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CHUNK = 50_000
+FORMATS = ["csv", "jsonl"] + (["parquet"] if pq is not None else [])
+EXTENSIONS = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet"}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def select_rows(df, start=None, end=None, tags=None, index=None):
+    """Позиции строк в диапазоне дат [start, end] с нужными тэгами, по возрастанию datetime.
+
+    С index (SessionIndex той же таблицы) диапазон берётся двоичным поиском, без маски по df.
+    """
+    if df.empty:
+        return np.empty(0, dtype=np.int64)
+    if index is not None:
+        positions = index.range(None if start is None else pd.Timestamp(start).normalize(),
+                                None if end is None else pd.Timestamp(end).normalize() + pd.Timedelta(days=1),
+                                newest_first=False)
+        if tags:
+            positions = positions[df['tag'].iloc[positions].isin(list(tags)).to_numpy()]
+        return positions
+    mask = np.ones(len(df), dtype=bool)
+    dts = df['datetime']
+    if start is not None:
+        mask &= (dts >= pd.Timestamp(start).normalize()).to_numpy()
+    if end is not None:
+        mask &= (dts < pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).to_numpy()
+    if tags:
+        mask &= df['tag'].isin(list(tags)).to_numpy()
+    positions = np.flatnonzero(mask)
+    order = np.argsort(dts.to_numpy()[positions], kind='stable')
+    return positions[order]
+
+
+def _chunks(df, positions, columns, chunk):
+    # Копируется только текущая порция; date_str и строки восстанавливаются для неё же
+    for i in range(0, len(positions), chunk):
+        yield disk_frame(df.iloc[positions[i:i + chunk]])[columns]
+
+
+def export_frame(df, path, fmt="csv", columns=None, start=None, end=None, tags=None,
+                 compress=False, chunk=CHUNK, progress=None, cancel=None, index=None):
+    """Потоковый экспорт выбранных строк порциями по chunk.
+
+    progress(done, total) вызывается после каждой порции, cancel() -> True прерывает
+    экспорт (ExportCancelled, файл назначения не трогается). index — см. select_rows.
+    Возвращает число строк.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    columns = [c for c in (columns or COLUMNS) if c in COLUMNS]
+    positions = select_rows(df, start, end, tags, index)
+    total = len(positions)
+
+    def step(done):
+        if cancel is not None and cancel():
+            raise ExportCancelled()
+        if progress is not None:
+            progress(done, total)
+
+    def write(tmp):
+        done = 0
+        if fmt == "parquet":
+            writer = None
+            try:
+                for part in _chunks(df, positions, columns, chunk):
+                    table = pa.Table.from_pandas(part, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, table.schema,
+                                                  compression="gzip" if compress else "snappy")
+                    writer.write_table(table)
+                    done += len(part)
+                    step(done)
+                if writer is None:
+                    pq.write_table(pa.Table.from_pandas(disk_frame(df.iloc[:0])[columns], preserve_index=False), tmp)
+            finally:
+                if writer is not None:
+                    writer.close()
+            return
+
+        opener = gzip.open if compress else open
+        with opener(tmp, 'wt', encoding='utf-8', newline='') as f:
+            if fmt == "csv":
+                f.write(",".join(columns) + "\n")
+            for part in _chunks(df, positions, columns, chunk):
+                if fmt == "csv":
+                    part.to_csv(f, header=False, index=False)
+                else:
+                    text = part.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+                    f.write(text if text.endswith("\n") else text + "\n")
+                done += len(part)
+                step(done)
+
+    step(0)
+    try:
+        atomic_write(path, write)
+    except ExportCancelled:
+        if os.path.exists(path + ".tmp"):
+            os.remove(path + ".tmp")
+        raise
+    return total
+
+
+def default_extension(fmt, compress=False):
+    ext = EXTENSIONS[fmt]
+    return ext + ".gz" if compress and fmt != "parquet" else ext
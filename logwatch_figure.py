@@ -0,0 +1,121 @@
+import io
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from logwatch_charts import DAYS_BACK, TOP_TAGS
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+class AnalyticsFigure:
+    """Одна Figure на всё время жизни вкладки: артисты создаются один раз,
+    update() меняет только их данные, render() рисует в буфер через Agg.
+    pyplot не используется, поэтому фигуры не копятся в его реестре."""
+
+    DPI = 100
+
+    def __init__(self, colors):
+        self.colors = colors
+        self.fig = Figure(figsize=(14, 10), dpi=self.DPI, facecolor=colors["card"])
+        self.canvas = FigureCanvasAgg(self.fig)
+        gs = self.fig.add_gridspec(3, 2, hspace=0.3, wspace=0.3)
+
+        # 1. Last 14 days bar chart
+        self.ax1 = self.fig.add_subplot(gs[0, :])
+        self.bars = self.ax1.bar(range(DAYS_BACK), np.zeros(DAYS_BACK), color=colors["success"], alpha=0.8)
+        self.goal_line = self.ax1.axhline(y=0, color=colors["warning"], linestyle='--', label='Daily Goal')
+        self.ax1.set_title("Last 14 Days (Hours)", color="white", fontsize=14, pad=10)
+        self.ax1.set_xticks(range(DAYS_BACK))
+        self.ax1.legend(facecolor=colors["card"], edgecolor="white", labelcolor="white")
+        self._style(self.ax1)
+
+        # 2. Tag distribution pie (число секторов меняется — перерисовывается целиком)
+        self.ax2 = self.fig.add_subplot(gs[1, 0])
+
+        # 3. Heatmap - hours by weekday
+        self.ax3 = self.fig.add_subplot(gs[1, 1])
+        self.heatmap = self.ax3.imshow(np.zeros((7, 24)), cmap='YlGn', aspect='auto', interpolation='nearest')
+        self.ax3.set_yticks(range(7))
+        self.ax3.set_yticklabels(WEEKDAYS)
+        self.ax3.set_xticks(range(0, 24, 3))
+        self.ax3.set_xticklabels(range(0, 24, 3))
+        self.ax3.set_title("Activity Heatmap (Hour x Weekday)", color="white", fontsize=12, pad=10)
+        self.ax3.tick_params(colors="white")
+        self.ax3.set_facecolor(colors["card"])
+        self.fig.colorbar(self.heatmap, ax=self.ax3, label='Hours')
+
+        # 4. Tag trends over the selected period (недели или месяцы — см. trend_edges)
+        self.ax4 = self.fig.add_subplot(gs[2, :])
+        self.trend_lines = [self.ax4.plot([], [], marker='o', linewidth=2)[0] for _ in range(TOP_TAGS)]
+        self.ax4.grid(alpha=0.2)
+        self._style(self.ax4)
+
+    def _style(self, ax):
+        ax.tick_params(colors="white")
+        ax.set_facecolor(self.colors["card"])
+        for spine in ax.spines.values():
+            spine.set_edgecolor('#444')
+
+    def update(self, data, daily_goal):
+        """Обновление данных артистов по результату prepare_chart_data"""
+        daily_hours = np.asarray(data["daily"]) / 3600
+        for bar, hours in zip(self.bars, daily_hours):
+            bar.set_height(hours)
+        self.goal_line.set_ydata([daily_goal, daily_goal])
+        self.ax1.set_ylim(0, max(daily_hours.max(initial=0), daily_goal) * 1.1 or 1)
+        self.ax1.set_xticklabels([d.strftime('%m/%d') for d in data["dates"]], rotation=45)
+
+        self.ax2.clear()
+        tag_sum = data["tag_sum"]
+        if not tag_sum.empty:
+            self.ax2.pie(tag_sum.values, labels=tag_sum.index, autopct='%1.1f%%', startangle=90,
+                         textprops={'color': "white", 'fontsize': 10})
+            self.ax2.set_title(f"Time by Tag ({data['period']})", color="white", fontsize=12, pad=10)
+
+        heatmap_hours = data["heatmap"] / 3600
+        self.heatmap.set_array(heatmap_hours)
+        self.heatmap.set_clim(0, heatmap_hours.max() or 1)
+        self.ax3.set_title(f"Activity Heatmap ({data['period']})", color="white", fontsize=12, pad=10)
+
+        top = 0.0
+        for i, line in enumerate(self.trend_lines):
+            if i < len(data["top_tags"]):
+                tag = data["top_tags"][i]
+                weekly_hours = np.asarray(data["trends"][tag]) / 3600
+                line.set_data(range(len(weekly_hours)), weekly_hours)
+                line.set_label(tag)
+                line.set_visible(True)
+                top = max(top, weekly_hours.max(initial=0))
+            else:
+                line.set_data([], [])
+                line.set_label('_hidden')
+                line.set_visible(False)
+        labels = data["trend_labels"]
+        # Подписей не больше ~12, чтобы длинные периоды оставались читаемыми
+        ticks = range(0, len(labels), max(1, -(-len(labels) // 12)))
+        self.ax4.set_xticks(list(ticks))
+        self.ax4.set_xticklabels([labels[i] for i in ticks])
+        self.ax4.set_xlim(-0.2, max(len(labels), 1) - 0.8)
+        self.ax4.set_title(f"Tag Trends ({data['period']})", color="white", fontsize=14, pad=10)
+        self.ax4.set_ylim(0, top * 1.1 or 1)
+        self.ax4.legend(facecolor=self.colors["card"], edgecolor="white", labelcolor="white")
+
+    def _resize(self, width_px):
+        if width_px:
+            self.fig.set_size_inches(width_px / self.DPI, width_px / self.DPI * 10 / 14)
+
+    def render(self, width_px=None):
+        """Рисует фигуру в RGBA-буфер; возвращает (width, height, bytes). Tk не трогает."""
+        self._resize(width_px)
+        self.canvas.draw()
+        width, height = self.canvas.get_width_height()
+        return width, height, bytes(self.canvas.buffer_rgba())
+
+    def png(self, width_px=None):
+        """Фигура как PNG-файл (bytes) — для отчётов"""
+        self._resize(width_px)
+        buffer = io.BytesIO()
+        self.canvas.print_png(buffer)
+        return buffer.getvalue()
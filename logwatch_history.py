@@ -0,0 +1,102 @@
+from tkinter import ttk
+
+import numpy as np
+
+
+class VirtualTable:
+    """ttk.Treeview с постоянным пулом строк: в виджете живут только видимые строки,
+    данные подгружаются блоками (окно + OVERSCAN) по мере прокрутки."""
+
+    OVERSCAN = 50
+
+    def __init__(self, parent, columns, fetch, rowheight=30):
+        """fetch(positions) -> список кортежей значений для строк с этими позициями"""
+        self.fetch = fetch
+        self.rowheight = rowheight
+        self.tree = ttk.Treeview(parent, columns=[c for c, _ in columns], show="headings", height=20)
+        for col, width in columns:
+            self.tree.heading(col, text=col.title())
+            self.tree.column(col, width=width)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._on_scrollbar)
+
+        self.positions = np.empty(0, dtype=np.int64)
+        self.offset = 0
+        self.visible = 20
+        self._items = []
+        self._block_start = 0
+        self._block = []
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-1, "pages"))
+        self.tree.bind("<Next>", lambda e: self.scroll(1, "pages"))
+
+    def pack(self):
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+    def set_positions(self, positions, keep_offset=False):
+        """Новый список позиций; кэш блока сбрасывается всегда (в т.ч. после правки данных)"""
+        self.positions = positions
+        if not keep_offset:
+            self.offset = 0
+        self._block = []
+        self._render()
+
+    def selected_positions(self):
+        """Позиции (в df) строк, выделенных в дереве"""
+        rows = [self._items.index(iid) for iid in self.tree.selection() if iid in self._items]
+        return self.positions[[self.offset + i for i in rows]]
+
+    def scroll(self, amount, what):
+        step = self.visible if what == "pages" else 3
+        self._move_to(self.offset + amount * step)
+        return "break"
+
+    # --- INTERNALS ---
+    def _on_scrollbar(self, action, value, what=None):
+        if action == "moveto":
+            self._move_to(int(float(value) * len(self.positions)))
+        else:
+            self.scroll(int(value), what)
+
+    def _on_resize(self, event):
+        # Первая строка дерева — заголовок
+        visible = max(1, event.height // self.rowheight - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self._render()
+
+    def _move_to(self, offset):
+        offset = max(0, min(offset, len(self.positions) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def _rows(self, start, stop):
+        if not (self._block_start <= start and stop <= self._block_start + len(self._block)):
+            self._block_start = max(0, start - self.OVERSCAN)
+            end = min(len(self.positions), stop + self.OVERSCAN)
+            self._block = self.fetch(self.positions[self._block_start:end])
+        return self._block[start - self._block_start:stop - self._block_start]
+
+    def _render(self):
+        total = len(self.positions)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        stop = min(total, self.offset + self.visible)
+        rows = self._rows(self.offset, stop) if stop > self.offset else []
+
+        # Пул элементов меняется только при ресайзе или коротком списке
+        while len(self._items) < len(rows):
+            self._items.append(self.tree.insert("", "end"))
+        while len(self._items) > len(rows):
+            self.tree.delete(self._items.pop())
+        for iid, values in zip(self._items, rows):
+            self.tree.item(iid, values=values)
+
+        if total:
+            self.scrollbar.set(self.offset / total, stop / total)
+        else:
+            self.scrollbar.set(0, 1)
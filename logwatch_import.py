@@ -0,0 +1,312 @@
+"""Импорт старых форматов LogWatch (autosave, v2/v2.1, v7, v8) в текущую схему.
+
+Файлы читаются потоково (запись за записью), каждый — в своём процессе; результат
+процесса — временный JSONL-файл, который затем дедуплицируется и собирается пачками.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from logwatch_storage import empty_frame, normalize_frame, record_key
+from logwatch_table import session_ids
+from logwatch_tags import clean_tag, tag_key
+
+BATCH = 10_000
+
+_WS = " \t\r\n"
+
+
+class JsonStream:
+    """Минимальный pull-парсер: обходит структуру по токенам, а значения
+    (записи, словари настроек) разбирает json.raw_decode по мере чтения файла."""
+
+    def __init__(self, f, chunk=1 << 16):
+        self.f = f
+        self.chunk = chunk
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.f.read(self.chunk)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # Число на границе буфера могло обрезаться — дочитываем и разбираем заново
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        """Элементы массива, на начале которого стоит парсер"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+    def members(self):
+        """Пары (ключ, парсер на значении) объекта; значение нужно прочитать до следующего шага"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+def session_key(dt, tag, task, duration):
+    """Хэш содержимого сессии — для дедупликации без id"""
+    raw = f"{_iso_key(dt)}|{tag_key(tag)}|{task}|{float(duration):.3f}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _normalize_tag(tag):
+    # Регистр не трогается: варианты одного тэга сводит реестр (logwatch_tags)
+    return clean_tag(tag)
+
+
+def _iso_key(value):
+    """datetime записи текущего формата в виде record_key; строки to_json(iso) уже в нём"""
+    if isinstance(value, str) and len(value) == 23 and value[10] == "T":
+        return value
+    if isinstance(value, (int, float)):
+        # to_json без date_format пишет миллисекунды от эпохи
+        return record_key(pd.Timestamp(value, unit="ms"))
+    return record_key(pd.Timestamp(value))
+
+
+# --- FORMAT READERS ---
+def _stamp(day, hhmm, seen):
+    """datetime из даты и HH:MM; записи одной минуты разводятся на миллисекунды"""
+    base = datetime.strptime(f"{day} {hhmm}", "%Y-%m-%d %H:%M")
+    n = seen.get(base, 0)
+    seen[base] = n + 1
+    return base + timedelta(milliseconds=n)
+
+
+def _record(fmt, dt, rec, duration, ident=None):
+    tag = _normalize_tag(rec.get("tag", ""))
+    task = str(rec.get("task", "")).strip() or "Unnamed Task"
+    return {
+        "id": f"{fmt}:{ident}" if ident else None,
+        "datetime": record_key(dt),
+        "tag": tag,
+        "task": task,
+        "duration": float(duration),
+        "note": str(rec.get("note", "") or ""),
+    }
+
+
+def _read_flat(stream, fmt, day, seen):
+    """autosave / v7: список без дат, дата берётся из mtime файла"""
+    for rec in stream.items():
+        hhmm = rec.get("time") or rec.get("date")
+        yield _record(fmt, _stamp(day, hhmm, seen), rec, rec.get("raw_lap", 0), rec.get("id"))
+
+
+def _read_history(stream, fmt, seen):
+    """v2 / v2.1 / v8: {"YYYY-MM-DD": [записи]}"""
+    for day in stream.members():
+        for rec in stream.items():
+            duration = rec["dur"] if "dur" in rec else rec.get("raw_lap", 0)
+            yield _record(fmt, _stamp(day, rec["time"], seen), rec, duration, rec.get("id"))
+
+
+def _convert_goals(goals, fmt):
+    """Цели по тэгам в часах. v2.1 хранит часы, остальные версии — секунды"""
+    scale = 1.0 if fmt == "v21" else 1 / 3600
+    result = {}
+    for tag, goal in (goals or {}).items():
+        if isinstance(goal, dict):
+            result[_normalize_tag(tag)] = {k: float(v) * scale for k, v in goal.items()}
+        else:
+            result[_normalize_tag(tag)] = {"daily": float(goal) * scale}
+    return result
+
+
+def detect_format(path):
+    """Версия файла по первым ключам и первой записи (без чтения файла целиком)"""
+    with open(path, encoding="utf-8") as f:
+        stream = JsonStream(f, chunk=4096)
+        if stream.peek() == "[":
+            return "current"
+        for key in stream.members():
+            if key == "history":
+                for _day in stream.members():
+                    first = next(stream.items(), {})
+                    return "v8" if "raw_lap" in first else "v2"
+                return "v2"
+            if key == "data":
+                first = next(stream.items(), {})
+                return "autosave" if "lap" in first or "tot" in first else "v7"
+            stream.value()
+    return "unknown"
+
+
+def read_legacy(path):
+    """Генератор записей текущей схемы + meta (goals/colors) после исчерпания"""
+    fmt = detect_format(path)
+    day = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d")
+    meta = {"format": fmt, "goals": {}, "colors": {}}
+    seen = {}
+    with open(path, encoding="utf-8") as f:
+        stream = JsonStream(f)
+        if fmt == "current":
+            for rec in stream.items():
+                yield {"id": None, "datetime": _iso_key(rec["datetime"]),
+                       "tag": _normalize_tag(rec["tag"]), "task": str(rec["task"]),
+                       "duration": float(rec["duration"]), "note": str(rec.get("note") or "")}
+            return meta
+        for key in stream.members():
+            if key == "history":
+                yield from _read_history(stream, fmt, seen)
+            elif key == "data":
+                yield from _read_flat(stream, fmt, day, seen)
+            else:
+                meta[key] = stream.value()
+    # В v2 без поля tags версия 2.1 отличается целями в часах
+    if fmt == "v2" and "tags" in meta:
+        meta["format"] = fmt = "v21"
+    meta["goals"] = _convert_goals(meta.get("goals"), fmt)
+    meta["colors"] = {_normalize_tag(t): c for t, c in (meta.get("colors") or {}).items()}
+    return meta
+
+
+def _spool(path):
+    """Рабочий процесс: файл -> временный JSONL нормализованных записей"""
+    fd, spool = tempfile.mkstemp(prefix="logwatch_import_", suffix=".jsonl")
+    count = 0
+    reader = read_legacy(path)
+    with os.fdopen(fd, "w", encoding="utf-8") as out:
+        while True:
+            try:
+                rec = next(reader)
+            except StopIteration as stop:
+                meta = stop.value
+                break
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            count += 1
+    meta["read"] = count
+    return path, spool, meta
+
+
+def import_files(paths, db, workers=None):
+    """Импорт файлов в схему self.db.
+
+    Возвращает (DataFrame новых сессий, {"goals", "colors"}, отчёт по файлам).
+    Дубликаты отсекаются по id записи и по хэшу содержимого (в т.ч. против db).
+    """
+    seen_keys = set()
+    if not db.empty:
+        seen_keys.update(session_key(*row) for row in
+                         zip(db['datetime'], db['tag'], db['task'], db['duration']))
+    seen_ids = set()
+    batches, pending = [], []
+    settings = {"goals": {}, "colors": {}}
+    report = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, spool, meta in pool.map(_spool, paths):
+            imported = duplicates = 0
+            try:
+                with open(spool, encoding="utf-8") as f:
+                    for line in f:
+                        rec = json.loads(line)
+                        ident = rec.pop("id")
+                        if rec["duration"] <= 0:
+                            # Пустые круги старых версий (raw_lap = 0) не переносятся
+                            continue
+                        key = session_key(rec["datetime"], rec["tag"], rec["task"], rec["duration"])
+                        if (ident and ident in seen_ids) or key in seen_keys:
+                            duplicates += 1
+                            continue
+                        if ident:
+                            seen_ids.add(ident)
+                        seen_keys.add(key)
+                        pending.append(rec)
+                        imported += 1
+                        if len(pending) >= BATCH:
+                            batches.append(pd.DataFrame(pending))
+                            pending = []
+            finally:
+                os.remove(spool)
+            settings["goals"].update(meta["goals"])
+            settings["colors"].update(meta["colors"])
+            report[path] = {"format": meta["format"], "read": meta["read"],
+                            "imported": imported, "duplicates": duplicates}
+
+    if pending:
+        batches.append(pd.DataFrame(pending))
+    if not batches:
+        return empty_frame(), settings, report
+    return _separate_ids(normalize_frame(pd.concat(batches, ignore_index=True)), db), settings, report
+
+
+def _separate_ids(new, db):
+    """Разные сессии с одним id (мс): из разных файлов или уже в db. Повторные сдвигаются на
+    1 мс вперёд, как в LogWatchEngine.log (дубликаты по содержимому уже отсеяны)."""
+    ids = session_ids(new)
+    existing = session_ids(db) if not db.empty else np.empty(0, dtype=np.int64)
+    clash = np.isin(ids, existing)
+    repeated = np.ones(len(ids), dtype=bool)
+    repeated[np.unique(ids, return_index=True)[1]] = False
+    clash |= repeated
+    if not clash.any():
+        return new
+    taken = set(existing.tolist()) | set(ids[~clash].tolist())
+    ids = ids.copy()
+    for i in np.flatnonzero(clash):
+        sid = int(ids[i])
+        while sid in taken:
+            sid += 1
+        taken.add(sid)
+        ids[i] = sid
+    return new.assign(datetime=ids.view('datetime64[ms]'))
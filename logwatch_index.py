@@ -0,0 +1,122 @@
+from collections import deque
+
+import numpy as np
+
+from logwatch_table import session_id, session_ids
+
+
+class SessionIndex:
+    """Позиции строк self.db, отсортированные по datetime, и их метки времени (мс).
+
+    Хранится по возрастанию, order — развёрнутый вид без копии (новые первыми). Фильтр по
+    тэгу — срез этого индекса, а не пересортировка DataFrame; диапазон дат — двоичный поиск
+    по меткам времени (searchsorted), ответ — срез без копии: O(log N + k)."""
+
+    def __init__(self):
+        self._positions = np.empty(0, dtype=np.int64)
+        self._times = np.empty(0, dtype=np.int64)
+        self._tags = np.empty(0, dtype=object)
+        self._views = {}
+
+    @property
+    def order(self):
+        return self._positions[::-1]
+
+    def rebuild(self, df):
+        times = session_ids(df) if not df.empty else np.empty(0, dtype=np.int64)
+        self._positions = np.argsort(times, kind='stable').astype(np.int64)
+        self._times = times[self._positions]
+        self._tags = df['tag'].to_numpy(dtype=object) if not df.empty else np.empty(0, dtype=object)
+        self._views = {}
+
+    def append(self, df):
+        """Новая сессия добавлена в конец df"""
+        pos = len(df) - 1
+        ts = session_id(df['datetime'].iloc[pos])
+        if len(self._times) and ts < self._times[-1]:
+            # Запись не самая свежая (например, после перевода часов) — честная пересборка
+            self.rebuild(df)
+            return
+        self._positions = np.append(self._positions, pos)
+        self._times = np.append(self._times, ts)
+        self._tags = np.append(self._tags, df['tag'].iloc[pos])
+        self._views = {}
+
+    def remove_last(self, df):
+        """Последняя строка df удалена (df — уже без неё). Если она и самая свежая (обычный undo
+        лога) — срезы без копирования; иначе общий remove."""
+        pos = len(df)
+        if not len(self._positions) or self._positions[-1] != pos:
+            self.remove(df, pos)
+            return
+        self._positions = self._positions[:-1]
+        self._times = self._times[:-1]
+        self._tags = self._tags[:-1]
+        self._views = {}
+
+    def remove(self, df, pos):
+        """Удалена строка pos (df — уже без неё): позиции после неё сдвигаются на одну"""
+        keep = self._positions != pos
+        positions = self._positions[keep]
+        self._positions = positions - (positions > pos)
+        self._times = self._times[keep]
+        self._tags = np.delete(self._tags, pos)
+        self._views = {}
+
+    def retag(self, pos, tag):
+        """У строки pos сменился тэг (datetime не меняется — порядок тот же)"""
+        self._tags[pos] = tag
+        self._views = {}
+
+    def refresh_tags(self, df):
+        """Тэги строк переименованы или перенесены массово; порядок по datetime тот же"""
+        self._tags = df['tag'].to_numpy(dtype=object) if not df.empty else np.empty(0, dtype=object)
+        self._views = {}
+
+    def _sorted(self, tag=None):
+        """(позиции, метки времени) по возрастанию — все строки или только тэга tag"""
+        if tag is None:
+            return self._positions, self._times
+        if tag not in self._views:
+            keep = self._tags[self._positions] == tag
+            self._views[tag] = (self._positions[keep], self._times[keep])
+        return self._views[tag]
+
+    def find(self, sid):
+        """Позиция сессии с id sid или None (при совпадении — последняя): двоичный поиск"""
+        i = int(np.searchsorted(self._times, sid, 'right'))
+        if i and self._times[i - 1] == sid:
+            return int(self._positions[i - 1])
+        return None
+
+    def view(self, tag=None):
+        return self._sorted(tag)[0][::-1]
+
+    def bounds(self, start=None, end=None, tag=None):
+        """Границы [i, j) строк с start <= datetime < end в возрастающем индексе"""
+        times = self._sorted(tag)[1]
+        i = 0 if start is None else int(np.searchsorted(times, session_id(start), 'left'))
+        j = len(times) if end is None else int(np.searchsorted(times, session_id(end), 'left'))
+        return i, max(i, j)
+
+    def range(self, start=None, end=None, tag=None, newest_first=True):
+        """Позиции сессий с start <= datetime < end (None — без границы); срез без копии"""
+        i, j = self.bounds(start, end, tag)
+        positions = self._sorted(tag)[0][i:j]
+        return positions[::-1] if newest_first else positions
+
+
+class RecentRing:
+    """Кольцевой буфер последних size сессий (новые первыми) для панели Recent Logs"""
+
+    def __init__(self, size=5):
+        self.size = size
+        self.items = deque(maxlen=size)
+
+    def rebuild(self, df, order):
+        """Заполнение из предсортированного индекса: O(size), без сортировки истории"""
+        rows = df.iloc[order[:self.size]]
+        self.items = deque(zip(rows['datetime'], rows['tag'], rows['task'], rows['duration']), maxlen=self.size)
+
+    def push(self, row):
+        self.items.appendleft((row['datetime'], row['tag'], row['task'], row['duration']))
@@ -0,0 +1,173 @@
+"""Слияние историй с нескольких машин в одну: потоковый k-way merge по datetime.
+
+Входы читаются потоково (read_legacy — любой формат, включая текущий). Отсортированный
+файл сливается напрямую, несортированный сначала режется на отсортированные прогоны по RUN
+записей во временные JSONL. heapq.merge держит по одной записи на прогон, дедупликация —
+только в пределах одной метки времени, поэтому память не зависит от размера входов.
+
+Дубликат — совпадение хэша содержимого (datetime, tag, task, duration, см. session_key).
+Конфликты (обе записи сохраняются или побеждает первый вход, но попадают в отчёт):
+    note    — одна и та же сессия с разными заметками (остаётся заметка первого входа);
+    content — в одну и ту же миллисекунду на разных машинах записаны разные сессии.
+"""
+import heapq
+import json
+import os
+import tempfile
+
+from logwatch_import import read_legacy, session_key
+from logwatch_writer import atomic_write
+
+RUN = 100_000
+MAX_CONFLICT_SAMPLES = 1000
+
+
+def _records(path, meta=None):
+    """Записи файла; meta (формат, число записей) заполняется по исчерпании"""
+    reader = read_legacy(path)
+    count = 0
+    while True:
+        try:
+            rec = next(reader)
+        except StopIteration as stop:
+            if meta is not None:
+                meta.update(stop.value, read=count)
+            return
+        count += 1
+        yield rec
+
+
+def _scan(path):
+    """Первый проход: формат, число записей и отсортирован ли файл по datetime"""
+    meta = {}
+    prev, ordered = "", True
+    for rec in _records(path, meta):
+        if rec["datetime"] < prev:
+            ordered = False
+        prev = rec["datetime"]
+    return meta, ordered
+
+
+def _sorted_runs(path, tmp, index):
+    """Несортированный файл -> отсортированные JSONL-прогоны по RUN записей"""
+    runs, chunk = [], []
+
+    def flush():
+        chunk.sort(key=lambda rec: rec["datetime"])
+        run = os.path.join(tmp, f"{index}-{len(runs)}.jsonl")
+        with open(run, "w", encoding="utf-8") as f:
+            for rec in chunk:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        runs.append(run)
+        chunk.clear()
+
+    for rec in _records(path):
+        chunk.append(rec)
+        if len(chunk) >= RUN:
+            flush()
+    if chunk:
+        flush()
+    return runs
+
+
+def _read_run(run):
+    with open(run, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _keyed(records, source):
+    for rec in records:
+        yield rec["datetime"], source, rec
+
+
+def _dedupe(merged, report):
+    """Группы записей одной метки времени -> записи без дубликатов; конфликты — в отчёт"""
+    def resolve(group):
+        kept = {}
+        for source, rec in group:
+            key = session_key(rec["datetime"], rec["tag"], rec["task"], rec["duration"])
+            if key not in kept:
+                kept[key] = (source, rec)
+                continue
+            report["duplicates"] += 1
+            first_source, first = kept[key]
+            if rec["note"] != first["note"] and rec["note"]:
+                if not first["note"]:
+                    # Пустая заметка — не конфликт: берём непустую
+                    kept[key] = (first_source, dict(first, note=rec["note"]))
+                else:
+                    conflict("note", [(first_source, first), (source, rec)])
+        if len({source for source, _ in kept.values()}) > 1:
+            conflict("content", list(kept.values()))
+        return [rec for _, rec in kept.values()]
+
+    def conflict(kind, entries):
+        report["conflicts"] += 1
+        if len(report["conflict_samples"]) < MAX_CONFLICT_SAMPLES:
+            report["conflict_samples"].append({
+                "kind": kind,
+                "datetime": entries[0][1]["datetime"],
+                "entries": [dict(source=report["sources"][source], **{k: rec[k] for k in
+                                 ("tag", "task", "duration", "note")}) for source, rec in entries],
+            })
+
+    current, group = None, []
+    for dt, source, rec in merged:
+        if rec["duration"] <= 0:
+            # Пустые круги старых версий не переносятся (как и при импорте)
+            continue
+        if dt != current and group:
+            yield from resolve(group)
+            group = []
+        current = dt
+        group.append((source, rec))
+    if group:
+        yield from resolve(group)
+
+
+def _write(tmp, records, report):
+    """JSON-массив записей в формате файла истории (как disk_frame(...).to_json)"""
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[")
+        for rec in records:
+            if report["written"]:
+                f.write(",")
+            f.write(json.dumps({
+                "datetime": rec["datetime"],
+                "date_str": rec["datetime"][:10],
+                "tag": rec["tag"],
+                "task": rec["task"],
+                "duration": rec["duration"],
+                "note": rec["note"],
+            }, ensure_ascii=False, separators=(",", ":")))
+            report["written"] += 1
+        f.write("]")
+
+
+def merge_files(paths, output):
+    """Слияние историй paths в один отсортированный файл output (может совпадать с одним из входов).
+
+    Порядок paths — приоритет при конфликтах заметок. Возвращает отчёт:
+    {"inputs": {path: {"format", "read", "sorted", "runs"}}, "written", "duplicates",
+     "conflicts", "conflict_samples": [...первые MAX_CONFLICT_SAMPLES...]}
+    """
+    report = {"inputs": {}, "sources": list(paths), "written": 0, "duplicates": 0,
+              "conflicts": 0, "conflict_samples": []}
+    with tempfile.TemporaryDirectory(prefix="logwatch_merge_") as tmp:
+        streams = []
+        for index, path in enumerate(paths):
+            meta, ordered = _scan(path)
+            if ordered:
+                runs = [_records(path)]
+            else:
+                runs = [_read_run(run) for run in _sorted_runs(path, tmp, index)]
+            streams += [_keyed(run, index) for run in runs]
+            report["inputs"][path] = {"format": meta["format"], "read": meta["read"],
+                                      "sorted": ordered, "runs": len(runs)}
+
+        # heapq.merge устойчив: при равных datetime раньше идут записи более ранних входов
+        merged = heapq.merge(*streams, key=lambda item: item[0])
+        atomic_write(output, lambda t: _write(t, _dedupe(merged, report), report))
+    del report["sources"]
+    return report
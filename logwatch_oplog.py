@@ -0,0 +1,65 @@
+"""Журнал операций для многоуровневого undo/redo.
+
+Операция хранит только затронутую сессию (до и после), поэтому каждый шаг занимает
+O(1) памяти; сессии находятся по стабильному id (см. logwatch_table.session_id).
+    log    — before None, after новая сессия
+    delete — before удалённая сессия, after None
+    edit   — before и after: старые и новые значения той же сессии
+Отмена операции — переход after -> before, повтор — before -> after.
+"""
+from collections import namedtuple
+
+Operation = namedtuple("Operation", ["kind", "before", "after"])
+
+
+def describe(op):
+    """Короткое описание операции для подтверждений и подсказок"""
+    row = op.after if op.after is not None else op.before
+    verb = {"log": "log of", "delete": "deletion of", "edit": "edit of"}[op.kind]
+    return f"{verb} '{row['task']}' ({row['tag']}, {row['datetime']:%Y-%m-%d %H:%M})"
+
+
+class OperationLog:
+    """Два стека: выполненные (done) и отменённые (undone) операции. Без ограничения глубины."""
+
+    def __init__(self):
+        self.done = []
+        self.undone = []
+
+    def record(self, op):
+        # Новая операция делает повтор отменённых невозможным
+        self.done.append(op)
+        self.undone.clear()
+
+    def clear(self):
+        self.done.clear()
+        self.undone.clear()
+
+    def retag(self, mapping):
+        """Тэги переименованы или слиты ({старое имя: новое}): строки операций — в новые имена"""
+        for op in (*self.done, *self.undone):
+            for row in (op.before, op.after):
+                if row is not None and row["tag"] in mapping:
+                    row["tag"] = mapping[row["tag"]]
+
+    def peek_undo(self, fallback=None):
+        """Операция, которую отменит undo(); fallback() — если журнал пуст"""
+        if self.done:
+            return self.done[-1]
+        return fallback() if fallback is not None else None
+
+    def peek_redo(self):
+        return self.undone[-1] if self.undone else None
+
+    def undo(self, fallback=None):
+        op = self.done.pop() if self.done else (fallback() if fallback is not None else None)
+        if op is not None:
+            self.undone.append(op)
+        return op
+
+    def redo(self):
+        if not self.undone:
+            return None
+        op = self.undone.pop()
+        self.done.append(op)
+        return op
@@ -0,0 +1,193 @@
+"""Опциональная инструментовка горячих путей: скользящие гистограммы задержек Tk-колбэков,
+обработчиков, вызовов хранилища и лага цикла событий; экспорт в JSON и дамп cProfile.
+
+Выключена по умолчанию (LOGWATCH_PERF=1 или скрытая панель, Ctrl+Shift+P). Пока она выключена,
+ничего не оборачивается: в горячих путях остаётся одна проверка флага enabled.
+"""
+import cProfile
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+
+import numpy as np
+
+WINDOW = 2000
+# Верхние границы корзин гистограммы, мс (последняя корзина — всё, что дольше)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 16, 25, 50, 100, 250, 500, 1000, 2500)
+LAG = "loop:lag"
+
+
+class LatencyHistogram:
+    """Последние WINDOW замеров (скользящее окно) + счётчики за всё время"""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        ms = np.array(list(self.samples)) * 1000
+        if not len(ms):
+            return {"count": self.count, "total_ms": 0.0}
+        buckets = np.bincount(np.searchsorted(BUCKETS_MS, ms), minlength=len(BUCKETS_MS) + 1)
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(ms.max()), 3),
+            "buckets": buckets.tolist(),
+        }
+
+
+class _Timer:
+    __slots__ = ("monitor", "name", "start")
+
+    def __init__(self, monitor, name):
+        self.monitor = monitor
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.monitor.record(self.name, time.perf_counter() - self.start)
+
+
+class PerfMonitor:
+    """Сборщик замеров. Пишется из Tk-потока и фоновых потоков (рендер, writer)."""
+
+    def __init__(self, enabled=False):
+        self.enabled = False
+        self.histograms = {}
+        self.profiler = None
+        self._wrapped = []
+        self._lock = threading.Lock()
+        self.started = datetime.now()
+        if enabled:
+            self.enable()
+
+    # --- ON / OFF ---
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            install_tk_hooks(self)
+
+    def disable(self):
+        """Выключение: обёртки методов снимаются, Tk-хук остаётся, но только проверяет флаг"""
+        self.enabled = False
+        for obj, name in self._wrapped:
+            obj.__dict__.pop(name, None)
+        self._wrapped = []
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+        self.started = datetime.now()
+
+    # --- RECORDING ---
+    def record(self, name, seconds):
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, LatencyHistogram())
+        hist.add(seconds)
+
+    def timed(self, name):
+        """with monitor.timed("chart:render"): ... — пустой контекст, пока инструментовка выключена"""
+        return _Timer(self, name) if self.enabled else nullcontext()
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        return timed
+
+    def instrument(self, obj, names, prefix):
+        """Обёртки на методы экземпляра obj (класс не меняется); снимаются в disable()"""
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is None or name in vars(obj):
+                continue
+            setattr(obj, name, self.wrap(f"{prefix}:{name}", method))
+            self._wrapped.append((obj, name))
+
+    # --- REPORT ---
+    def snapshot(self):
+        with self._lock:
+            items = list(self.histograms.items())
+        return {name: hist.summary() for name, hist in sorted(items)}
+
+    def export_json(self, path):
+        report = {
+            "started": self.started.isoformat(timespec="seconds"),
+            "exported": datetime.now().isoformat(timespec="seconds"),
+            "window": WINDOW,
+            "buckets_ms": list(BUCKETS_MS),
+            "timings": self.snapshot(),
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    # --- CPROFILE ---
+    def start_profile(self):
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop_profile(self, path=None):
+        """Останавливает профилировщик и пишет дамп в path (читается pstats / snakeviz); без path — сброс"""
+        if self.profiler is None:
+            return False
+        self.profiler.disable()
+        if path:
+            self.profiler.dump_stats(path)
+        self.profiler = None
+        return True
+
+
+def _callback_name(func):
+    # Misc.after регистрирует обёртку callit с __name__ исходной функции
+    qualname = getattr(func, "__qualname__", "")
+    if qualname.endswith("after.<locals>.callit"):
+        return f"after:{func.__name__}"
+    return f"tk:{qualname or type(func).__name__}"
+
+
+def install_tk_hooks(monitor):
+    """Все Python-колбэки Tk (after, bind, command) проходят через tkinter.CallWrapper —
+    подменяем его подклассом с замером. Действует на колбэки, зарегистрированные после вызова."""
+    import tkinter
+
+    if getattr(tkinter.CallWrapper, "monitor", None) is monitor:
+        return
+
+    class TimedCallWrapper(tkinter.CallWrapper):
+        def __call__(self, *args):
+            if not monitor.enabled:
+                return super().__call__(*args)
+            start = time.perf_counter()
+            try:
+                return super().__call__(*args)
+            finally:
+                monitor.record(_callback_name(self.func), time.perf_counter() - start)
+
+    TimedCallWrapper.monitor = monitor
+    tkinter.CallWrapper = TimedCallWrapper
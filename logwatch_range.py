@@ -0,0 +1,117 @@
+"""Выбор диапазона дат для History и Analytics: готовые периоды или свои даты From / To.
+
+Диапазон — полуинтервал [start, end) из pd.Timestamp (None — без границы); To включительно,
+поэтому end — полночь следующего дня. Ответ по нему — срез SessionIndex.range.
+"""
+from datetime import date
+
+import customtkinter as ctk
+import pandas as pd
+
+# Дней назад, включая сегодня (None — всё время)
+RANGE_PRESETS = {"All Time": None, "Today": 1, "Last 7 Days": 7, "Last 4 Weeks": 28,
+                 "Last Quarter": 91, "Last Year": 365, "Last 5 Years": 1826}
+CUSTOM = "Custom"
+INVALID_COLOR = "#ff5f5f"
+
+
+def preset_range(days_back, today=None):
+    """(start, end) периода из days_back дней, заканчивающегося сегодня"""
+    if days_back is None:
+        return None, None
+    end = pd.Timestamp(today or date.today()).normalize() + pd.Timedelta(days=1)
+    return end - pd.Timedelta(days=days_back), end
+
+
+def parse_day(text):
+    """'YYYY-MM-DD' -> pd.Timestamp (полночь); пустая строка -> None; ValueError при ошибке"""
+    text = text.strip()
+    if not text:
+        return None
+    return pd.Timestamp(date.fromisoformat(text))
+
+
+class DateRangePicker(ctk.CTkFrame):
+    """Период из списка + поля From / To. Изменение поля (Enter или уход фокуса) переключает
+    на Custom; command() вызывается при каждом новом корректном диапазоне."""
+
+    def __init__(self, parent, presets=RANGE_PRESETS, default="All Time", command=None):
+        super().__init__(parent, fg_color="transparent")
+        self.presets = presets
+        self.command = command
+        self._custom = (None, None)
+
+        self.preset_menu = ctk.CTkOptionMenu(self, values=[*presets, CUSTOM], width=130,
+                                             command=self._on_preset)
+        self.preset_menu.pack(side="left", padx=5)
+        self.entries = []
+        for text in ("From", "To"):
+            ctk.CTkLabel(self, text=text).pack(side="left", padx=(5, 2))
+            entry = ctk.CTkEntry(self, placeholder_text="YYYY-MM-DD", width=100)
+            entry.pack(side="left", padx=2)
+            entry.bind("<Return>", lambda e: self._on_entry())
+            entry.bind("<FocusOut>", lambda e: self._on_entry())
+            self.entries.append(entry)
+        self._border = self.entries[0].cget("border_color")
+
+        self.set(default)
+
+    def set(self, preset):
+        """Выбор готового периода без вызова command"""
+        self.preset_menu.set(preset)
+        self._fill(*preset_range(self.presets[preset]))
+
+    def get(self):
+        """(start, end): для готовых периодов — относительно сегодняшнего дня"""
+        preset = self.preset_menu.get()
+        if preset == CUSTOM:
+            return self._custom
+        return preset_range(self.presets[preset])
+
+    def label(self):
+        preset = self.preset_menu.get()
+        if preset != CUSTOM:
+            return preset
+        start, end = self._custom
+        first = f"{start:%Y-%m-%d}" if start is not None else "…"
+        last = f"{end - pd.Timedelta(days=1):%Y-%m-%d}" if end is not None else "…"
+        return f"{first} – {last}"
+
+    def _fill(self, start, end):
+        days = (start, None if end is None else end - pd.Timedelta(days=1))
+        for entry, day in zip(self.entries, days):
+            entry.delete(0, "end")
+            if day is not None:
+                entry.insert(0, f"{day:%Y-%m-%d}")
+            entry.configure(border_color=self._border)
+
+    def _on_preset(self, preset):
+        if preset == CUSTOM:
+            self._custom = self._read() or self._custom
+        else:
+            self.set(preset)
+        if self.command is not None:
+            self.command()
+
+    def _read(self):
+        """Диапазон из полей или None, если он некорректен (поля подсвечиваются)"""
+        try:
+            start, last = (parse_day(entry.get()) for entry in self.entries)
+            valid = start is None or last is None or start <= last
+        except ValueError:
+            valid = False
+        for entry in self.entries:
+            entry.configure(border_color=self._border if valid else INVALID_COLOR)
+        if not valid:
+            return None
+        return start, None if last is None else last + pd.Timedelta(days=1)
+
+    def _on_entry(self):
+        current = self.get()
+        value = self._read()
+        if value is None or value == current:
+            return
+        self._custom = value
+        self.preset_menu.set(CUSTOM)
+        if self.command is not None:
+            self.command()
@@ -0,0 +1,268 @@
+"""Офлайн-отчёты: недельные и месячные PNG + самодостаточный HTML на каждый файл истории.
+
+Графики — те же, что на вкладке Analytics (prepare_chart_data + AnalyticsFigure через Agg):
+14 дней до конца периода, тэги, тепловая карта, тренды. Раскладка на диске:
+    <out>/<имя истории>/<ключ>.png, <ключ>.html   (ключ — '2026-W41' или '2026-10')
+    <out>/<имя истории>/index.html, reports.json
+reports.json хранит хэш содержимого каждого периода (сессии, попавшие в графики, дневная
+цель, последний день столбцов): период с тем же хэшем не перерисовывается.
+
+Истории загружаются по очереди в этом процессе (движок сам пишет настройки и роллапы —
+параллельные загрузки одной истории гонялись бы за эти файлы), рендер изменившихся
+периодов всех историй идёт в ProcessPoolExecutor — по задаче на период.
+"""
+import base64
+import hashlib
+import html
+import json
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from logwatch_charts import COLORS, DAYS_BACK
+from logwatch_engine import LogWatchEngine, format_time
+from logwatch_shards import parallel_map
+from logwatch_table import day_keys
+from logwatch_writer import atomic_write, write_text
+
+VERSION = 1
+MANIFEST = "reports.json"
+KINDS = ("week", "month")
+# По умолчанию — текущий период и предыдущий (завершённый)
+DEFAULT_LAST = 2
+WIDTH_PX = 1400
+TOP_TASKS = 10
+
+Period = namedtuple("Period", ["kind", "key", "label", "start", "end"])
+
+
+# --- PERIODS ---
+def _period(kind, day):
+    """Период kind, в который попадает день day"""
+    if kind == "week":
+        start = day - timedelta(days=day.weekday())
+        year, week, _ = start.isocalendar()
+        return Period(kind, f"{year}-W{week:02d}", f"Week of {start:%Y-%m-%d}", start, start + timedelta(weeks=1))
+    start = day.replace(day=1)
+    return Period(kind, f"{start:%Y-%m}", f"{start:%B %Y}", start, (start + timedelta(days=32)).replace(day=1))
+
+
+def report_periods(kind, first_day, today, last=None):
+    """Периоды kind от первого дня истории по текущий включительно; last — только последние"""
+    periods = []
+    if first_day is not None:
+        period = _period(kind, first_day)
+        while period.start <= today:
+            periods.append(period)
+            period = _period(kind, period.end)
+    return periods[-last:] if last else periods
+
+
+# --- CONTENT ---
+def period_hash(df, goal, last_day, label):
+    """Хэш всего, от чего зависят PNG и HTML периода (df — сессии столбцов и периода)"""
+    h = hashlib.sha1(f"{VERSION}|{goal}|{last_day}|{label}".encode())
+    h.update(df['datetime'].to_numpy(dtype='datetime64[ms]').view(np.int64).tobytes())
+    h.update(df['duration'].to_numpy(dtype=np.float32).tobytes())
+    for col in ("tag", "task"):
+        h.update("\x1f".join(df[col].astype(str)).encode())
+    return h.hexdigest()
+
+
+def summarize_period(df, goal):
+    """Итоги периода для HTML: простые типы, чтобы задача пересылалась в процесс пула дёшево"""
+    days = df['duration'].groupby(day_keys(df), observed=True).sum()
+    tags = df.groupby('tag', observed=True)['duration'].agg(sessions='count', total='sum')
+    tasks = df.groupby('task', observed=True)['duration'].sum().nlargest(TOP_TASKS)
+    return {
+        "sessions": len(df),
+        "total": float(df['duration'].sum()),
+        "days": len(days),
+        "goal_days": int((days >= goal * 3600).sum()),
+        "tags": [(str(tag), int(r.sessions), float(r.total))
+                 for tag, r in tags.sort_values('total', ascending=False).iterrows()],
+        "tasks": [(str(task), float(total)) for task, total in tasks.items()],
+    }
+
+
+# --- RENDER ---
+_figure = None
+
+
+def render_report(job):
+    """PNG и HTML одного периода — выполняется в процессе пула"""
+    global _figure
+    if _figure is None:
+        # Фигура создаётся один раз на процесс, дальше меняются только данные артистов
+        from logwatch_figure import AnalyticsFigure
+        _figure = AnalyticsFigure(COLORS)
+    _figure.update(job["data"], job["goal"])
+    png = _figure.png(WIDTH_PX)
+    atomic_write(job["png"], lambda tmp: _write_bytes(tmp, png))
+    write_text(job["html"], report_html(job, png))
+    return job["period"].key
+
+
+def _write_bytes(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+STYLE = f"""
+body {{ background: {COLORS['bg']}; color: #ddd; font-family: Arial, sans-serif; margin: 24px; }}
+h1 {{ margin: 0; }} h2 {{ color: gray; font-weight: normal; margin: 4px 0 16px; }}
+.cards {{ display: flex; gap: 10px; margin-bottom: 16px; }}
+.card {{ background: {COLORS['card']}; padding: 10px 16px; border-radius: 6px; flex: 1; }}
+.card b {{ display: block; font-size: 22px; color: {COLORS['success']}; }}
+.card span {{ color: gray; font-size: 11px; }}
+img {{ max-width: 100%; border-radius: 6px; }}
+table {{ border-collapse: collapse; margin: 8px 0 20px; min-width: 420px; }}
+th, td {{ padding: 4px 12px; text-align: left; border-bottom: 1px solid #444; }}
+td.n {{ text-align: right; font-family: monospace; }}
+a {{ color: {COLORS['accent']}; }}
+"""
+
+
+def _page(title, body):
+    return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+            f"<style>{STYLE}</style></head><body>\n{body}\n</body></html>\n")
+
+
+def _rows(rows):
+    """Строки таблицы из ячеек (html, числовая ли); текст экранирует вызывающий"""
+    return "\n".join("<tr>" + "".join(f"<td class=\"n\">{cell}</td>" if numeric else f"<td>{cell}</td>"
+                                      for cell, numeric in row) + "</tr>" for row in rows)
+
+
+def report_html(job, png):
+    """Страница периода; график встроен как data: URI, внешних файлов нет"""
+    period, summary = job["period"], job["summary"]
+    total = summary["total"]
+    cards = [
+        ("Total", format_time(total, short=True)),
+        ("Sessions", str(summary["sessions"])),
+        ("Active days", str(summary["days"])),
+        ("Avg / active day", format_time(total / max(summary["days"], 1), short=True)),
+        (f"Days at goal ({job['goal']}h)", f"{summary['goal_days']} of {summary['days']}"),
+    ]
+    tags = _rows([(html.escape(tag), False), (str(sessions), True), (format_time(seconds, short=True), True),
+                  (f"{seconds / total:.1%}" if total else "-", True)]
+                 for tag, sessions, seconds in summary["tags"])
+    tasks = _rows([(html.escape(task or "(no task)"), False), (format_time(seconds, short=True), True)]
+                  for task, seconds in summary["tasks"])
+    last = period.end - timedelta(days=1)
+    body = f"""<h1>{html.escape(job['name'])}: {html.escape(period.label)}</h1>
+<h2>{period.start:%Y-%m-%d} – {last:%Y-%m-%d}</h2>
+<div class="cards">{''.join(f'<div class="card"><b>{v}</b><span>{html.escape(t)}</span></div>' for t, v in cards)}</div>
+<img alt="charts" src="data:image/png;base64,{base64.b64encode(png).decode('ascii')}">
+<h3>Tags</h3>
+<table><tr><th>Tag</th><th>Sessions</th><th>Time</th><th>Share</th></tr>
+{tags}
+</table>
+<h3>Top tasks</h3>
+<table><tr><th>Task</th><th>Time</th></tr>
+{tasks}
+</table>
+<p style="color: gray">Generated {datetime.now():%Y-%m-%d %H:%M} by LogWatch</p>"""
+    return _page(f"{job['name']} – {period.label}", body)
+
+
+def index_html(name, entries):
+    """Список отчётов истории, новые первыми"""
+    rows = _rows([(f"<a href=\"{html.escape(key)}.html\">{html.escape(e['label'])}</a>", False),
+                  (e["kind"], False), (str(e["sessions"]), True), (format_time(e["total"], short=True), True)]
+                 for key, e in sorted(entries.items(), key=lambda item: item[1]["start"], reverse=True))
+    body = f"""<h1>{html.escape(name)}</h1>
+<table><tr><th>Period</th><th>Kind</th><th>Sessions</th><th>Time</th></tr>
+{rows}
+</table>"""
+    return _page(f"{name} – LogWatch reports", body)
+
+
+# --- MANIFEST ---
+def read_manifest(root):
+    """{ключ периода: запись}; пустой словарь, если манифеста нет или он другой версии"""
+    try:
+        with open(os.path.join(root, MANIFEST), encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("reports", {}) if data.get("version") == VERSION else {}
+
+
+def write_manifest(root, entries):
+    write_text(os.path.join(root, MANIFEST),
+               json.dumps({"version": VERSION, "reports": dict(sorted(entries.items()))}, indent=1))
+
+
+# --- PLANNING ---
+def plan_reports(engine, name, root, kinds=KINDS, today=None, last=DEFAULT_LAST, force=False):
+    """Задачи рендера для изменившихся периодов одной истории.
+
+    Возвращает (задачи, манифест с новыми хэшами, {"unchanged": [...], "empty": [...]}).
+    Манифест стоит сохранять только после успешного рендера задач."""
+    today = pd.Timestamp(today or date.today()).date()
+    goal = engine.settings["goals"]["daily"]
+    entries = read_manifest(root)
+    jobs, skipped = [], {"unchanged": [], "empty": []}
+    for kind in kinds:
+        for period in report_periods(kind, engine.stats.first_day(), today, last):
+            last_day = min(period.end - timedelta(days=1), today)
+            # Столбцы «14 дней» могут начинаться раньше периода — их сессии тоже в хэше
+            first = min(period.start, last_day - timedelta(days=DAYS_BACK - 1))
+            df = engine.db.iloc[engine.sessions_between(pd.Timestamp(first), pd.Timestamp(period.end))]
+            in_period = df[(df['datetime'] >= pd.Timestamp(period.start)).to_numpy()]
+            if in_period.empty:
+                skipped["empty"].append(period.key)
+                continue
+            digest = period_hash(df, goal, last_day, period.label)
+            png, page = (os.path.join(root, f"{period.key}{ext}") for ext in (".png", ".html"))
+            known = entries.get(period.key)
+            if (not force and known is not None and known["hash"] == digest
+                    and os.path.exists(png) and os.path.exists(page)):
+                skipped["unchanged"].append(period.key)
+                continue
+            summary = summarize_period(in_period, goal)
+            jobs.append({
+                "name": name, "period": period, "goal": goal, "png": png, "html": page,
+                "data": engine.chart_data(pd.Timestamp(last_day), period.label, period.start, period.end),
+                "summary": summary,
+            })
+            entries[period.key] = {"hash": digest, "kind": kind, "label": period.label,
+                                   "start": f"{period.start:%Y-%m-%d}", "sessions": summary["sessions"],
+                                   "total": summary["total"]}
+    return jobs, entries, skipped
+
+
+def generate_reports(histories, out_dir, kinds=KINDS, last=DEFAULT_LAST, today=None,
+                     storage=None, workers=None, force=False):
+    """Отчёты для histories — [(файл истории, файл настроек)]. Каталог отчётов истории —
+    <out_dir>/<имя файла без расширения>.
+
+    Возвращает {файл истории: {"dir", "rendered", "unchanged", "empty"} или {"error"}}."""
+    results, plans, jobs = {}, [], []
+    for data_path, settings_path in histories:
+        name = os.path.splitext(os.path.basename(data_path))[0]
+        root = os.path.join(out_dir, name)
+        engine = LogWatchEngine(data_path, settings_path, storage=storage)
+        try:
+            engine.load()
+            history_jobs, entries, skipped = plan_reports(engine, name, root, kinds, today, last, force)
+        except Exception as e:
+            results[data_path] = {"error": str(e)}
+            continue
+        finally:
+            engine.storage.close()
+        os.makedirs(root, exist_ok=True)
+        results[data_path] = {"dir": root, "rendered": [job["period"].key for job in history_jobs], **skipped}
+        plans.append((name, root, entries))
+        jobs += history_jobs
+
+    parallel_map(render_report, jobs, workers, parallel=True)
+    for name, root, entries in plans:
+        write_manifest(root, entries)
+        write_text(os.path.join(root, "index.html"), index_html(name, entries))
+    return results
@@ -0,0 +1,211 @@
+import bisect
+import os
+import re
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from logwatch_table import frame_signature
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def search_path(data_path):
+    """Индекс хранится рядом со своей историей (как роллапы), а не в текущем каталоге"""
+    return os.path.splitext(data_path)[0] + ".search.npz"
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """Инвертированный индекс по task и note: токен -> id сессий (позиции в self.db).
+    Подстроки ищутся через триграммы словаря, короткие запросы — по префиксу."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.loaded = False
+        self.dirty = False
+        self.count = 0
+        self.postings = {}
+        self.grams = {}
+        self.vocab = []
+        self._vocab_sorted = True
+
+    # --- BUILD ---
+    def ensure(self, df):
+        """Загрузить индекс с диска (дочитав новые строки) или построить заново"""
+        if not self.loaded:
+            if not self._load(df):
+                self._reset()
+            self.loaded = True
+        # Строки, добавленные в обход add() (импорт), дочитываются одной пачкой
+        if self.count < len(df):
+            self._bulk_add(df, self.count)
+
+    def _bulk_add(self, df, start):
+        """Индексация строк df[start:]: токенизируются только уникальные тексты"""
+        found = {}
+        for col in ('task', 'note'):
+            codes, uniques = pd.factorize(df[col].iloc[start:].fillna('').astype(str))
+            # Позиции, сгруппированные по тексту (внутри группы — по возрастанию)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            for code, text in enumerate(uniques):
+                group = order[bounds[code]:bounds[code + 1]] + start
+                for token in set(tokenize(text)):
+                    found.setdefault(token, []).append(group)
+
+        for token, groups in found.items():
+            ids = groups[0] if len(groups) == 1 else np.unique(np.concatenate(groups))
+            existing = self.postings.get(token)
+            if existing is None:
+                self._register(token)
+                self.postings[token] = ids.astype(np.int64)
+            else:
+                self.postings[token] = np.concatenate([np.asarray(existing, dtype=np.int64), ids])
+        self.count = len(df)
+        self.dirty = True
+
+    def invalidate(self):
+        """Позиции сессий сдвинулись (удаление не с конца) или сменился текст: индекс пересоберётся
+        в ensure(). Файл на диске удаляется сразу, даже если индекс не загружен: подпись проверяет
+        только datetime, и после выхода без save() старый файл прошёл бы проверку."""
+        self._reset()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _reset(self):
+        self.count = 0
+        self.postings = {}
+        self.grams = {}
+        self.vocab = []
+        self.dirty = True
+
+    def add(self, doc_id, task, note):
+        for token in set(tokenize(task)) | set(tokenize(note)):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array('q')
+                self._register(token)
+            elif isinstance(posting, np.ndarray):
+                # Список, прочитанный с диска, становится изменяемым при первой записи
+                posting = self.postings[token] = array('q', posting.tobytes())
+            posting.append(doc_id)
+        self.count = doc_id + 1
+        self.dirty = True
+
+    def remove_last(self, task, note):
+        """Удаление последней сессии (id = count - 1): id всегда в конце списков"""
+        doc_id = self.count - 1
+        for token in set(tokenize(task)) | set(tokenize(note)):
+            posting = self.postings.get(token)
+            if posting is None or not len(posting) or posting[-1] != doc_id:
+                continue
+            if isinstance(posting, array):
+                posting.pop()
+            else:
+                self.postings[token] = posting[:-1]
+        self.count = doc_id
+        self.dirty = True
+
+    def _register(self, token):
+        self.vocab.append(token)
+        self._vocab_sorted = False
+        for gram in trigrams(token):
+            self.grams.setdefault(gram, set()).add(token)
+
+    # --- QUERY ---
+    def matching_tokens(self, term):
+        if len(term) >= 3:
+            candidates = None
+            for gram in trigrams(term):
+                tokens = self.grams.get(gram, set())
+                candidates = tokens if candidates is None else candidates & tokens
+                if not candidates:
+                    return []
+            return [t for t in candidates if term in t]
+
+        # Короткий терм — префиксный поиск по отсортированному словарю
+        if not self._vocab_sorted:
+            self.vocab.sort()
+            self._vocab_sorted = True
+        lo = bisect.bisect_left(self.vocab, term)
+        result = []
+        for token in self.vocab[lo:]:
+            if not token.startswith(term):
+                break
+            result.append(token)
+        return result
+
+    def _posting(self, token):
+        posting = self.postings[token]
+        return np.frombuffer(posting, dtype=np.int64) if isinstance(posting, array) else posting
+
+    def query(self, text):
+        """id сессий, где каждый терм встречается в task или note (по возрастанию)"""
+        per_term = []
+        for term in tokenize(text):
+            lists = [self._posting(t) for t in self.matching_tokens(term)]
+            if not lists:
+                return np.empty(0, dtype=np.int64)
+            per_term.append(lists[0] if len(lists) == 1 else np.unique(np.concatenate(lists)))
+        if not per_term:
+            return np.empty(0, dtype=np.int64)
+
+        # Пересечение от самого короткого списка: бинарный поиск в остальных
+        per_term.sort(key=len)
+        result = per_term[0]
+        for ids in per_term[1:]:
+            if not len(result):
+                break
+            idx = np.searchsorted(ids, result)
+            hit = idx < len(ids)
+            hit[hit] = ids[idx[hit]] == result[hit]
+            result = result[hit]
+        return result
+
+    # --- PERSISTENCE ---
+    def save(self, df):
+        if self.path is None or not self.loaded or not self.dirty:
+            return
+        tokens = [t for t, p in self.postings.items() if len(p)]
+        lists = [np.asarray(self.postings[t], dtype=np.int64) for t in tokens]
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in lists])
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp,
+                 meta=np.array([self.count, frame_signature(df, self.count, ordered=True)], dtype=np.int64),
+                 tokens=np.array(tokens, dtype=str),
+                 offsets=offsets,
+                 ids=np.concatenate(lists) if lists else np.empty(0, dtype=np.int64))
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def _load(self, df):
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                count, signature = (int(x) for x in data['meta'])
+                if count > len(df) or frame_signature(df, count, ordered=True) != signature:
+                    return False
+                tokens = data['tokens'].tolist()
+                offsets = data['offsets']
+                ids = data['ids']
+        except (OSError, ValueError, KeyError):
+            return False
+
+        self._reset()
+        for i, token in enumerate(tokens):
+            self.postings[token] = ids[offsets[i]:offsets[i + 1]]
+            self._register(token)
+        self.count = count
+        self.dirty = False
+        return True
@@ -0,0 +1,192 @@
+"""Помесячные шарды истории: <stem>_shards/YYYY-MM.json + manifest.json.
+
+Шард — JSON в формате файла истории (как disk_frame(...).to_json), только сессии одного
+месяца, рядом — его бинарный снапшот (logwatch_snapshot) для быстрого чтения. Манифест хранит сводку по каждому шарду (сессии, секунды, дни, первая и последняя
+сессия, секунды по тэгам) и размер/mtime файла: по нему выбираются шарды для диапазона дат
+без их чтения и находятся шарды, изменённые в обход манифеста.
+
+Чтение и агрегация нескольких шардов идут в ProcessPoolExecutor — по задаче на шард,
+частичные результаты сливаются. На маленькой истории пул не запускается (PARALLEL_MIN).
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from logwatch_snapshot import read_snapshot, snapshot_path, write_snapshot
+from logwatch_table import compact_frame, concat_frames, day_keys, disk_frame
+from logwatch_writer import atomic_write, write_text
+
+VERSION = 1
+MANIFEST = "manifest.json"
+# Меньше сессий — шарды читаются в этом же процессе: запуск пула дороже разбора
+PARALLEL_MIN = 200_000
+STRING_DTYPES = {"date_str": str, "tag": str, "task": str, "note": str}
+
+
+def shards_dir(data_path):
+    return os.path.splitext(data_path)[0] + "_shards"
+
+
+def shard_key(dt):
+    """'YYYY-MM' — месяц сессии"""
+    return f"{pd.Timestamp(dt):%Y-%m}"
+
+
+def shard_keys(df):
+    """Месяц каждой строки (datetime64[M]); сравнивается с np.datetime64(key)"""
+    return df['datetime'].to_numpy(dtype='datetime64[M]')
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _iso(ts):
+    return pd.Timestamp(ts).isoformat(timespec='milliseconds')
+
+
+# --- FILES ---
+def read_shard(path):
+    df = read_snapshot(snapshot_path(path), path)
+    if df is None:
+        # Строковые столбцы не угадываются: тэг '007' остаётся строкой
+        df = compact_frame(pd.read_json(path, orient='records', dtype=STRING_DTYPES))
+        _write_binary(df, path)
+    return df
+
+
+def _write_binary(df, path):
+    try:
+        write_snapshot(df, snapshot_path(path), path)
+    except OSError:
+        pass
+
+
+def write_shard(root, key, df):
+    """Шард месяца key из строк df (только этого месяца); пустой шард удаляется.
+    Возвращает сводку для манифеста или None."""
+    path = os.path.join(root, f"{key}.json")
+    if df.empty:
+        for stale in (path, snapshot_path(path)):
+            if os.path.exists(stale):
+                os.remove(stale)
+        return None
+    os.makedirs(root, exist_ok=True)
+    atomic_write(path, lambda tmp: disk_frame(df).to_json(tmp, orient='records', date_format='iso'))
+    _write_binary(df, path)
+    return summarize(df, path)
+
+
+def summarize(df, path):
+    dts = df['datetime']
+    tags = df.groupby('tag', observed=True)['duration'].sum()
+    return {
+        "count": len(df),
+        "total": float(df['duration'].sum()),
+        "days": int(len(np.unique(dts.to_numpy(dtype='datetime64[D]')))),
+        "first": _iso(dts.min()),
+        "last": _iso(dts.max()),
+        "tags": {str(tag): float(v) for tag, v in tags.items()},
+        "file": _stamp(path),
+    }
+
+
+def read_manifest(root):
+    """{ключ месяца: сводка}; пустой словарь, если манифеста нет или он другой версии"""
+    try:
+        with open(os.path.join(root, MANIFEST), encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("shards", {}) if data.get("version") == VERSION else {}
+
+
+def write_manifest(root, shards):
+    os.makedirs(root, exist_ok=True)
+    write_text(os.path.join(root, MANIFEST),
+               json.dumps({"version": VERSION, "shards": dict(sorted(shards.items()))}, indent=1))
+
+
+def check_manifest(root, shards):
+    """Манифест, сверенный с файлами: новые и изменённые шарды пересчитываются, пропавшие
+    убираются. Возвращает (манифест, изменился ли он)."""
+    files = {name[:-5] for name in os.listdir(root) if name.endswith(".json") and name != MANIFEST} \
+        if os.path.isdir(root) else set()
+    checked = {}
+    for key in sorted(files):
+        path = os.path.join(root, f"{key}.json")
+        entry = shards.get(key)
+        if entry is None or entry["file"] != _stamp(path):
+            entry = summarize(read_shard(path), path)
+        checked[key] = entry
+    return checked, checked != shards
+
+
+def shards_between(shards, start=None, end=None):
+    """Ключи шардов, в которых есть сессии из [start, end) (по first/last манифеста)"""
+    lo = _iso(start) if start is not None else ""
+    hi = _iso(end) if end is not None else "9999"
+    return [key for key, entry in sorted(shards.items()) if entry["last"] >= lo and entry["first"] < hi]
+
+
+# --- PARALLEL ---
+def parallel_map(func, items, workers, parallel):
+    """map(func, items) в ProcessPoolExecutor; в этом же процессе — если parallel ложно,
+    задача одна или процессор один"""
+    if not parallel or len(items) < 2 or (workers or os.cpu_count() or 1) == 1:
+        return list(map(func, items))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+def load_shards(root, shards, keys, workers=None):
+    """Сессии шардов keys одной таблицей (по порядку месяцев)"""
+    paths = [os.path.join(root, f"{key}.json") for key in keys]
+    parallel = sum(shards[key]["count"] for key in keys) >= PARALLEL_MIN
+    return concat_frames(parallel_map(read_shard, paths, workers, parallel))
+
+
+def _between(df, start, end):
+    dts = df['datetime']
+    if start is not None:
+        df = df[(dts >= pd.Timestamp(start)).to_numpy()]
+        dts = df['datetime']
+    if end is not None:
+        df = df[(dts < pd.Timestamp(end)).to_numpy()]
+    return df
+
+
+def _aggregate_shard(task):
+    """Частичный агрегат одного шарда за [start, end) — выполняется в процессе пула"""
+    path, start, end = task
+    df = _between(read_shard(path), start, end)
+    weights = df['duration'].to_numpy(dtype=float)
+    cells = df['datetime'].dt.dayofweek.to_numpy() * 24 + df['datetime'].dt.hour.to_numpy()
+    return {
+        "count": len(df),
+        "total": float(weights.sum()),
+        "tags": {str(t): float(v) for t, v in df.groupby('tag', observed=True)['duration'].sum().items()},
+        "days": {str(d): float(v) for d, v in df['duration'].groupby(day_keys(df), observed=True).sum().items()},
+        "heatmap": np.bincount(cells, weights=weights, minlength=7 * 24).reshape(7, 24),
+    }
+
+
+def aggregate_shards(root, shards, start=None, end=None, workers=None):
+    """Сессии, секунды, секунды по тэгам, по дням и по (день недели, час) за [start, end):
+    по задаче на каждый нужный шард, частичные результаты складываются"""
+    keys = shards_between(shards, start, end)
+    tasks = [(os.path.join(root, f"{key}.json"), start, end) for key in keys]
+    parallel = sum(shards[key]["count"] for key in keys) >= PARALLEL_MIN
+    result = {"count": 0, "total": 0.0, "tags": {}, "days": {}, "heatmap": np.zeros((7, 24))}
+    for part in parallel_map(_aggregate_shard, tasks, workers, parallel):
+        result["count"] += part["count"]
+        result["total"] += part["total"]
+        result["heatmap"] += part["heatmap"]
+        for name in ("tags", "days"):
+            for k, v in part[name].items():
+                result[name][k] = result[name].get(k, 0.0) + v
+    return result
@@ -0,0 +1,109 @@
+"""Бинарный колоночный снапшот истории для быстрого старта.
+
+Формат файла:
+    MAGIC (8 байт) | длина заголовка (uint64 LE) | заголовок JSON | массивы (выровнены по 8 байт)
+
+Столбцы: ts (int64, мс от эпохи, локальное время), duration (float64),
+tag/task/note — int32-коды в словарь, словарь хранится как offsets (int64) + blob (utf-8).
+Заголовок хранит размер и mtime исходного JSON: если они не совпадают, снапшот устарел.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"LWSNAP1\n"
+STRING_COLUMNS = ("tag", "task", "note")
+
+
+def snapshot_path(json_path):
+    return os.path.splitext(json_path)[0] + ".snap"
+
+
+def _source_stamp(source):
+    st = os.stat(source)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _encode_strings(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Таблица в памяти уже словарная — коды и словарь берутся как есть
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories.astype(str)
+    else:
+        codes, uniques = pd.factorize(values.fillna('').astype(str), sort=False)
+    encoded = [s.encode('utf-8') for s in uniques]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return codes.astype(np.int32), offsets, blob
+
+
+def _decode_strings(codes, offsets, blob):
+    """Словарь снапшота напрямую становится category: строки не размножаются по строкам таблицы"""
+    raw = blob.tobytes()
+    words = [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+    if not words:
+        return pd.Categorical([''] * len(codes))
+    return pd.Categorical.from_codes(np.asarray(codes), categories=words)
+
+
+def write_snapshot(df, path, source):
+    """Атомарно пишет снапшот df; source — JSON, от которого он получен"""
+    arrays = {
+        "ts": df['datetime'].values.astype('datetime64[ms]').astype(np.int64),
+        "duration": df['duration'].to_numpy(dtype=np.float64),
+    }
+    for col in STRING_COLUMNS:
+        arrays[f"{col}_codes"], arrays[f"{col}_offsets"], arrays[f"{col}_blob"] = _encode_strings(df[col])
+
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = [arr.dtype.str, offset, len(arr)]
+        offset += -(-arr.nbytes // 8) * 8
+
+    header = json.dumps({"count": len(df), "source": _source_stamp(source), "arrays": layout}).encode()
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for arr in arrays.values():
+            data = arr.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(tmp, path)
+
+
+def read_snapshot(path, source):
+    """DataFrame из снапшота или None, если снапшота нет или JSON новее"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(header_len))
+    if not os.path.exists(source) or header["source"] != _source_stamp(source):
+        return None
+
+    base = len(MAGIC) + 8 + header_len
+    arrays = {}
+    for name, (dtype, offset, length) in header["arrays"].items():
+        if length:
+            arrays[name] = np.memmap(path, dtype=np.dtype(dtype), mode='r', offset=base + offset, shape=(length,))
+        else:
+            arrays[name] = np.zeros(0, dtype=np.dtype(dtype))
+
+    # Сразу в компактных типах таблицы (logwatch_table)
+    df = pd.DataFrame({
+        "datetime": np.array(arrays["ts"]).view('datetime64[ms]'),
+        "tag": _decode_strings(arrays["tag_codes"], arrays["tag_offsets"], arrays["tag_blob"]),
+        "task": _decode_strings(arrays["task_codes"], arrays["task_offsets"], arrays["task_blob"]),
+        "duration": np.asarray(arrays["duration"], dtype=np.float32),
+        "note": _decode_strings(arrays["note_codes"], arrays["note_offsets"], arrays["note_blob"]),
+    })
+    return df
@@ -0,0 +1,538 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from logwatch_shards import (aggregate_shards, check_manifest, load_shards, read_manifest, shard_key,
+                             shard_keys, shards_dir, write_manifest, write_shard)
+from logwatch_snapshot import read_snapshot, snapshot_path, write_snapshot
+from logwatch_table import FRAME_COLUMNS, append_rows, compact_frame, disk_frame
+from logwatch_writer import atomic_write
+
+FILE_DB = "logwatch_db.json"
+# Столбцы файла истории и экспорта; в памяти date_str не хранится (см. logwatch_table)
+COLUMNS = ["datetime", "date_str", "tag", "task", "duration", "note"]
+
+
+def empty_frame():
+    return compact_frame(pd.DataFrame(columns=FRAME_COLUMNS))
+
+
+def normalize_frame(df):
+    """Приведение типов после чтения с диска (имена тэгов сводит реестр, см. logwatch_tags)"""
+    if df.empty:
+        return empty_frame()
+    return compact_frame(df)
+
+
+def record_key(dt):
+    # Та же точность, что и у to_json(date_format='iso')
+    return pd.Timestamp(dt).isoformat(timespec='milliseconds')
+
+
+class StorageEngine:
+    """Интерфейс хранилища: загрузка и запись истории. Запросы к ней считает движок
+    (роллапы и индекс сессий в памяти), а не хранилище."""
+
+    def __init__(self, path=FILE_DB):
+        self.path = path
+        self.frame = empty_frame()
+        # BackgroundWriter: без него файловые движки пишут синхронно (CLI, скрипты)
+        self.writer = None
+        # Запросы CLI: load ничего не пишет (снапшот, миграция, манифест), изменений не будет
+        self.read_only = False
+
+    def load(self):
+        raise NotImplementedError
+
+    def append(self, row, db):
+        raise NotImplementedError
+
+    def remove(self, row, db):
+        raise NotImplementedError
+
+    def update(self, old, new, db):
+        """Правка сессии old -> new (datetime, то есть id сессии, не меняется)"""
+        raise NotImplementedError
+
+    def save(self, db):
+        raise NotImplementedError
+
+    def retag(self, db, positions):
+        """У строк db с позициями positions сменился тэг (массовый split); по умолчанию — save"""
+        self.save(db)
+
+    def close(self):
+        pass
+
+    def quarantine(self):
+        """Переименовать нечитаемый файл данных, чтобы пустая история его не перезаписала.
+        Возвращает новый путь или None."""
+        if not os.path.exists(self.path):
+            return None
+        backup = f"{self.path}.corrupt-{pd.Timestamp.now():%Y%m%d-%H%M%S}"
+        os.replace(self.path, backup)
+        return backup
+
+
+class JsonStorage(StorageEngine):
+    """Исходный формат: весь список сессий переписывается при каждом изменении"""
+
+    def __init__(self, path=FILE_DB):
+        super().__init__(path)
+        self.journal_dir = os.path.splitext(path)[0] + "_journal"
+        self.snap_path = snapshot_path(path)
+        self._dirty = False
+
+    def load(self):
+        df = self._read_snapshot()
+        # Хвост журнала мог остаться после работы в режиме journal
+        df, _ = self._replay_journal(df)
+        self.frame = df
+        return df
+
+    def append(self, row, db):
+        self.save(db)
+
+    def remove(self, row, db):
+        self.save(db)
+
+    def update(self, old, new, db):
+        self.save(db)
+
+    def save(self, db):
+        self.frame = db
+        self._dirty = True
+        self._submit()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.flush()
+        # Бинарный снапшот обновляется один раз при выходе, а не на каждый лог
+        if self._dirty:
+            self._write_binary(self.frame)
+            self._dirty = False
+
+    # --- SNAPSHOT ---
+    def _read_snapshot(self):
+        if not os.path.exists(self.path):
+            return empty_frame()
+        df = read_snapshot(self.snap_path, self.path)
+        if df is None:
+            # JSON новее бинарного снапшота — разбираем его и пересобираем снапшот
+            df = normalize_frame(pd.read_json(self.path, orient='records'))
+            self._write_binary(df)
+        return df
+
+    def _write_binary(self, df):
+        if self.read_only or df.empty or not os.path.exists(self.path):
+            return
+        try:
+            write_snapshot(df, self.snap_path, self.path)
+        except OSError:
+            pass
+
+    def _write_snapshot(self, db):
+        atomic_write(self.path, lambda tmp: disk_frame(db).to_json(tmp, orient='records', date_format='iso'))
+
+    def _submit(self, upto=None, binary=False):
+        """Запись снапшота через writer: серия изменений схлопывается в одну запись
+        последнего self.frame. Журнал после записи сокращается до сегмента upto."""
+        def flush():
+            snapshot = self.frame
+            self._write_snapshot(snapshot)
+            if binary:
+                self._write_binary(snapshot)
+            self._drop_segments(upto)
+
+        if self.writer is None:
+            flush()
+        else:
+            self.writer.submit(self.path, flush)
+
+    # --- JOURNAL ---
+    def _segments(self):
+        if not os.path.isdir(self.journal_dir):
+            return []
+        segments = []
+        for name in os.listdir(self.journal_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == ".jsonl" and stem.isdigit():
+                segments.append((int(stem), os.path.join(self.journal_dir, name)))
+        return sorted(segments)
+
+    def _drop_segments(self, upto=None):
+        for num, path in self._segments():
+            if upto is None or num <= upto:
+                os.remove(path)
+
+    def _replay_journal(self, df):
+        """Накатывает сегменты журнала на снапшот. Повторный накат безопасен:
+        записи, уже попавшие в снапшот, определяются по datetime. del + add с тем же
+        datetime (правка, redo удаления) заменяет строку снапшота."""
+        adds = {}
+        dropped = set()
+        count = 0
+        for _, path in self._segments():
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка после аварийного завершения
+                        continue
+                    count += 1
+                    key = rec.pop("datetime")
+                    if rec.pop("op", "add") == "del":
+                        adds.pop(key, None)
+                        dropped.add(key)
+                    else:
+                        adds[key] = rec
+
+        if not count:
+            return df, 0
+
+        if not df.empty and dropped:
+            keys = df['datetime'].dt.floor('ms')
+            df = df[~keys.isin(pd.to_datetime(list(dropped)))]
+
+        if adds:
+            new = pd.DataFrame([{"datetime": key, **rec} for key, rec in adds.items()])
+            new = normalize_frame(new)
+            if not df.empty:
+                new = new[~new['datetime'].isin(df['datetime'].dt.floor('ms'))]
+            df = append_rows(df, new)
+
+        return df.reset_index(drop=True), count
+
+
+class JournalStorage(JsonStorage):
+    """Append-only журнал (JSON lines): одна строка на сессию, undo — tombstone.
+    Снапшот (обычный logwatch_db.json) пересобирается writer'ом каждые COMPACT_EVERY записей."""
+
+    COMPACT_EVERY = 500
+
+    def __init__(self, path=FILE_DB):
+        super().__init__(path)
+        self._file = None
+        self._segment = 1
+        self._records = 0
+
+    def load(self):
+        df = self._read_snapshot()
+        df, self._records = self._replay_journal(df)
+        self.frame = df
+        segments = self._segments()
+        self._segment = segments[-1][0] if segments else 1
+        if self._records >= self.COMPACT_EVERY and not self.read_only:
+            self._compact()
+        return df
+
+    def append(self, row, db):
+        self.frame = db
+        self._write(self._add_record(row))
+        if self._records >= self.COMPACT_EVERY:
+            self._compact()
+
+    def remove(self, row, db):
+        self.frame = db
+        self._write({"op": "del", "datetime": record_key(row['datetime'])})
+        if self._records >= self.COMPACT_EVERY:
+            self._compact()
+
+    def update(self, old, new, db):
+        # Правка в журнале — tombstone старой записи и новая запись с тем же datetime
+        self.frame = db
+        self._write({"op": "del", "datetime": record_key(old['datetime'])})
+        self._write(self._add_record(new))
+        if self._records >= self.COMPACT_EVERY:
+            self._compact()
+
+    def save(self, db):
+        self.frame = db
+        self._dirty = True
+        self._compact()
+
+    def close(self):
+        self._close_segment()
+        super().close()
+
+    @staticmethod
+    def _add_record(row):
+        return {
+            "op": "add",
+            "datetime": record_key(row['datetime']),
+            "tag": row['tag'],
+            "task": row['task'],
+            "duration": float(row['duration']),
+            "note": row['note'],
+        }
+
+    def _write(self, rec):
+        if self._file is None:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            path = os.path.join(self.journal_dir, f"{self._segment:06d}.jsonl")
+            self._file = open(path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._records += 1
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _compact(self):
+        # Ротация: новые записи идут в следующий сегмент, запечатанные уходят в снапшот
+        self._close_segment()
+        sealed = self._segment
+        self._segment += 1
+        self._records = 0
+        self._submit(upto=sealed, binary=True)
+
+
+class SqliteStorage(StorageEngine):
+    """SQLite (WAL) с индексом по datetime (id сессии для DELETE/UPDATE). Запись — одна строка
+    на лог; запросы считает движок по роллапам, поэтому индексов по date_str и tag нет."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            datetime TEXT NOT NULL,
+            date_str TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            task TEXT NOT NULL,
+            duration REAL NOT NULL,
+            note TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_datetime ON sessions(datetime);
+        DROP INDEX IF EXISTS idx_sessions_date_str;
+        DROP INDEX IF EXISTS idx_sessions_tag;
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, path=FILE_DB):
+        super().__init__(path)
+        self.db_path = os.path.splitext(path)[0] + ".sqlite3"
+        self.conn = None
+
+    def connect(self):
+        # Загрузка может идти в фоновом потоке приложения; дальше соединением владеет UI-поток
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        if self.read_only:
+            self.conn.execute("PRAGMA query_only=ON")
+            return
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def load(self):
+        if self.read_only and not os.path.exists(self.db_path):
+            # Базы ещё нет: история читается из JSON, сама база не создаётся
+            self.frame = read_only_json(self.path)
+            return self.frame
+        self.connect()
+        if not self.read_only:
+            self.migrate_json()
+        df = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM sessions ORDER BY id", self.conn)
+        df = empty_frame() if df.empty else compact_frame(df)
+        self.frame = df
+        return df
+
+    def migrate_json(self):
+        """Одноразовый перенос logwatch_db.json (и хвоста журнала) в базу"""
+        if self.conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone():
+            return 0
+        df = JsonStorage(self.path).load() if os.path.exists(self.path) else empty_frame()
+        with self.conn:
+            self._insert(df)
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('migrated', ?)", (self.path,))
+        return len(df)
+
+    def append(self, row, db):
+        self.frame = db
+        with self.conn:
+            self._insert(pd.DataFrame([row]))
+
+    def remove(self, row, db):
+        self.frame = db
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM sessions WHERE id = "
+                "(SELECT id FROM sessions WHERE datetime = ? ORDER BY id DESC LIMIT 1)",
+                (record_key(row['datetime']),))
+
+    def update(self, old, new, db):
+        self.frame = db
+        with self.conn:
+            self.conn.execute(
+                "UPDATE sessions SET tag = ?, task = ?, duration = ?, note = ? WHERE id = "
+                "(SELECT id FROM sessions WHERE datetime = ? ORDER BY id DESC LIMIT 1)",
+                (new['tag'], new['task'], float(new['duration']), new['note'], record_key(old['datetime'])))
+
+    def save(self, db):
+        self.frame = db
+        with self.conn:
+            self.conn.execute("DELETE FROM sessions")
+            self._insert(db)
+
+    def retag(self, db, positions):
+        self.frame = db
+        rows = db.iloc[positions]
+        keys = rows['datetime'].dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3]
+        with self.conn:
+            self.conn.executemany("UPDATE sessions SET tag = ? WHERE datetime = ?",
+                                  zip(rows['tag'].astype(str), keys))
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def quarantine(self):
+        # Запись транзакционная: недописанной базы не бывает, файл остаётся на месте
+        return None
+
+    def _insert(self, df):
+        if df.empty:
+            return
+        df = disk_frame(df)
+        rows = zip(df['datetime'].dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3],
+                   df['date_str'], df['tag'], df['task'], df['duration'], df['note'])
+        self.conn.executemany(
+            "INSERT INTO sessions (datetime, date_str, tag, task, duration, note) VALUES (?, ?, ?, ?, ?, ?)",
+            rows)
+
+
+class ShardedStorage(StorageEngine):
+    """Помесячные шарды с манифестом (см. logwatch_shards). Изменение переписывает только
+    шард своего месяца и манифест; первый запуск режет logwatch_db.json (с хвостом журнала)
+    на шарды. Приложение загружает все шарды при старте (запросы отвечают роллапы и индекс
+    сессий движка); только aggregate (logwatch shards) читает лишь нужные шарды, по процессу на шард."""
+
+    def __init__(self, path=FILE_DB):
+        super().__init__(path)
+        self.root = shards_dir(path)
+        self.manifest = {}
+        self.workers = None
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self.read_only and not os.path.isdir(self.root):
+            # Шардов ещё нет: история читается из JSON, нарезка ждёт обычного запуска
+            self.frame = read_only_json(self.path)
+            return self.frame
+        if not self.read_only:
+            self.migrate_json()
+        self.load_manifest()
+        self.frame = load_shards(self.root, self.manifest, sorted(self.manifest), self.workers)
+        return self.frame
+
+    def migrate_json(self):
+        """Одноразовая нарезка logwatch_db.json на шарды (файл остаётся на месте)"""
+        if os.path.isdir(self.root):
+            return 0
+        df = JsonStorage(self.path).load() if os.path.exists(self.path) else empty_frame()
+        self._write(df, set(map(shard_key, np.unique(shard_keys(df)))))
+        return len(df)
+
+    def append(self, row, db):
+        self._mark(db, {shard_key(row['datetime'])})
+
+    def remove(self, row, db):
+        self._mark(db, {shard_key(row['datetime'])})
+
+    def update(self, old, new, db):
+        self._mark(db, {shard_key(old['datetime'])})
+
+    def retag(self, db, positions):
+        # Переписываются только месяцы перенесённых сессий
+        months = np.unique(shard_keys(db)[positions])
+        self._mark(db, {str(m) for m in months})
+
+    def save(self, db):
+        self._mark(db, set(self.manifest) | set(map(shard_key, np.unique(shard_keys(db)))))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    def quarantine(self):
+        # Откладываются шарды; пустой манифест не даёт заново нарезать старый logwatch_db.json
+        if not os.path.isdir(self.root):
+            return None
+        backup = f"{self.root}.corrupt-{pd.Timestamp.now():%Y%m%d-%H%M%S}"
+        os.replace(self.root, backup)
+        write_manifest(self.root, {})
+        self.manifest = {}
+        return backup
+
+    def load_manifest(self):
+        """Манифест, сверенный с файлами шардов (сами шарды не загружаются)"""
+        manifest, changed = check_manifest(self.root, read_manifest(self.root))
+        if changed and not self.read_only:
+            write_manifest(self.root, manifest)
+        self.manifest = manifest
+
+    def _mark(self, db, keys):
+        with self._lock:
+            self.frame = db
+            self._dirty |= keys
+
+        def flush():
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                df = self.frame
+            self._write(df, dirty)
+
+        if self.writer is None:
+            flush()
+        else:
+            self.writer.submit(self.root, flush)
+
+    def _write(self, df, keys):
+        """Переписать шарды месяцев keys из df и манифест"""
+        months = shard_keys(df)
+        manifest = dict(self.manifest)
+        for key in sorted(keys):
+            entry = write_shard(self.root, key, df[months == np.datetime64(key)])
+            if entry is None:
+                manifest.pop(key, None)
+            else:
+                manifest[key] = entry
+        write_manifest(self.root, manifest)
+        self.manifest = manifest
+
+    # --- QUERIES ---
+    def aggregate(self, start=None, end=None):
+        """Сессии, секунды, секунды по тэгам, по дням и по (день недели, час) за [start, end)
+        по шардам, без self.frame (logwatch shards)"""
+        return aggregate_shards(self.root, self.manifest, start, end, self.workers)
+
+
+STORAGE_ENGINES = {
+    "json": JsonStorage,
+    "journal": JournalStorage,
+    "sqlite": SqliteStorage,
+    "sharded": ShardedStorage,
+}
+
+
+def make_storage(kind, path=FILE_DB, writer=None, read_only=False):
+    storage = STORAGE_ENGINES.get(kind, JsonStorage)(path)
+    storage.writer = writer
+    storage.read_only = read_only
+    return storage
+
+
+def read_only_json(path):
+    """logwatch_db.json (с хвостом журнала) без записи бинарного снапшота"""
+    if not os.path.exists(path):
+        return empty_frame()
+    storage = JsonStorage(path)
+    storage.read_only = True
+    return storage.load()
@@ -0,0 +1,114 @@
+"""Компактная таблица сессий в памяти (self.db).
+
+datetime — datetime64[ms] (int64, мс от эпохи, локальное время), duration — float32,
+tag/task/note — category (целые коды в словарь строк). Производные ключи (день, неделя,
+час, день недели) не хранятся и считаются по datetime по запросу; date_str появляется
+только в файлах и экспорте (см. disk_frame).
+"""
+import numpy as np
+import pandas as pd
+
+FRAME_COLUMNS = ["datetime", "tag", "task", "duration", "note"]
+CATEGORY_COLUMNS = ("tag", "task", "note")
+
+
+def _category(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.array
+    return pd.Categorical(values.fillna('').astype(str))
+
+
+def compact_frame(df):
+    """Типизированная копия таблицы; лишние столбцы (date_str, weekday, hour) отбрасываются"""
+    note = df['note'] if 'note' in df else pd.Series('', index=df.index)
+    return pd.DataFrame({
+        "datetime": pd.to_datetime(df['datetime']).to_numpy(dtype='datetime64[ms]'),
+        "tag": _category(df['tag']),
+        "task": _category(df['task']),
+        "duration": df['duration'].to_numpy(dtype=np.float32),
+        "note": _category(note),
+    })
+
+
+def append_rows(df, new):
+    """df + new с сохранением типов: словари категорий объединяются, df не меняется"""
+    new = compact_frame(new)
+    if df.empty:
+        return new
+    data = {
+        "datetime": np.concatenate([df['datetime'].to_numpy(), new['datetime'].to_numpy()]),
+        "duration": np.concatenate([df['duration'].to_numpy(), new['duration'].to_numpy()]),
+    }
+    for col in CATEGORY_COLUMNS:
+        data[col] = pd.api.types.union_categoricals([df[col].array, new[col].array])
+    return pd.DataFrame(data)[FRAME_COLUMNS]
+
+
+def replace_row(df, pos, values):
+    """Копия df, где в строке pos заменены значения {столбец: значение}; типы сохраняются"""
+    data = {col: df[col].array for col in FRAME_COLUMNS}
+    for col, value in values.items():
+        if col in CATEGORY_COLUMNS:
+            column = data[col]
+            column = column.add_categories([value]) if value not in column.categories else column.copy()
+        else:
+            column = df[col].to_numpy().copy()
+        column[pos] = value
+        data[col] = column
+    return pd.DataFrame(data)[FRAME_COLUMNS]
+
+
+def session_id(dt):
+    """Стабильный id сессии: время начала в мс от эпохи (как datetime64[ms] в таблице)"""
+    return pd.Timestamp(dt).floor('ms').value // 1_000_000
+
+
+def session_ids(df):
+    return df['datetime'].to_numpy(dtype='datetime64[ms]').view(np.int64)
+
+
+def day_keys(df):
+    """'YYYY-MM-DD' для каждой строки как category: строки форматируются только для уникальных дней"""
+    days, inverse = np.unique(df['datetime'].to_numpy(dtype='datetime64[D]'), return_inverse=True)
+    names = np.datetime_as_string(days, unit='D').astype(object)
+    return pd.Series(pd.Categorical.from_codes(inverse.ravel(), categories=names), index=df.index)
+
+
+def frame_signature(df, count=None, ordered=False):
+    """Контрольная сумма первых count строк: по ней проверяются сохранённые индексы и роллапы.
+    ordered=True учитывает и порядок строк (для индексов, хранящих позиции)."""
+    count = len(df) if count is None else count
+    if not count:
+        return 0
+    ts = df['datetime'].iloc[:count].to_numpy().astype('datetime64[ms]').view(np.int64)
+    if ordered:
+        # Переполнение int64 детерминировано (по модулю 2**64) — для контрольной суммы это не важно
+        with np.errstate(over='ignore'):
+            return int((ts * np.arange(1, count + 1, dtype=np.int64)).sum())
+    return int(ts.sum())
+
+
+def concat_frames(frames):
+    """Склейка компактных таблиц по порядку: словари категорий объединяются один раз"""
+    frames = [df for df in frames if not df.empty]
+    if len(frames) <= 1:
+        return frames[0] if frames else compact_frame(pd.DataFrame(columns=FRAME_COLUMNS))
+    data = {
+        "datetime": np.concatenate([df['datetime'].to_numpy() for df in frames]),
+        "duration": np.concatenate([df['duration'].to_numpy() for df in frames]),
+    }
+    for col in CATEGORY_COLUMNS:
+        data[col] = pd.api.types.union_categoricals([df[col].array for df in frames])
+    return pd.DataFrame(data)[FRAME_COLUMNS]
+
+
+def disk_frame(df):
+    """Таблица в формате файла истории и экспорта: с date_str, duration — float64"""
+    return pd.DataFrame({
+        "datetime": df['datetime'].to_numpy(),
+        "date_str": day_keys(df).astype(str).to_numpy(),
+        "tag": df['tag'].astype(str).to_numpy(),
+        "task": df['task'].astype(str).to_numpy(),
+        "duration": df['duration'].to_numpy(dtype=np.float64),
+        "note": df['note'].astype(str).to_numpy() if 'note' in df else '',
+    })
@@ -0,0 +1,178 @@
+"""Реестр тэгов: целый id -> каноническое имя, алиасы, цвет.
+
+Имена сравниваются по tag_key (регистр и лишние пробелы не важны): 'riddim', 'riddim ' и
+'Riddim' — один тэг. Файлы истории хранят имя, под которым сессия была записана; при
+загрузке и после правок реестра столбец tag переводится в канонические имена одним векторным
+проходом по кодам категорий (remap_tags). Поэтому rename и merge меняют только реестр в
+настройках, а не файлы истории; split переносит выбранные сессии маской.
+"""
+import numpy as np
+import pandas as pd
+
+
+def clean_tag(name):
+    return " ".join(str(name).split())
+
+
+def tag_key(name):
+    return clean_tag(name).casefold()
+
+
+def remap_tags(values, targets):
+    """Категориальный столбец, где категория i заменена на targets[i]: один take по кодам"""
+    categories = pd.Index(targets).unique()
+    # Последний элемент -1: коды пропусков (-1) остаются пропусками
+    lut = np.append(categories.get_indexer(targets), -1)
+    return pd.Categorical.from_codes(lut[np.asarray(values.codes)], categories=categories)
+
+
+class TagRegistry:
+    """Тэги по id. hidden — убран из списков выбора, но сессии с ним остаются и находятся."""
+
+    def __init__(self):
+        self.names = {}     # id -> каноническое имя
+        self.aliases = {}   # id -> [прежние имена]
+        self.colors = {}    # id -> '#rrggbb'
+        self.hidden = set()
+        self.next_id = 1
+        self.dirty = False
+        self._ids = {}      # tag_key имени или алиаса -> id
+
+    # --- SETTINGS ---
+    @classmethod
+    def from_settings(cls, settings):
+        """Реестр из настроек; старые настройки (список tags и tag_colors) переносятся"""
+        registry = cls()
+        data = settings.get("tag_registry")
+        if data:
+            for entry in data["tags"]:
+                tid = entry["id"]
+                registry.names[tid] = entry["name"]
+                registry.aliases[tid] = list(entry.get("aliases", []))
+                if entry.get("color"):
+                    registry.colors[tid] = entry["color"]
+                if entry.get("hidden"):
+                    registry.hidden.add(tid)
+                for name in (entry["name"], *registry.aliases[tid]):
+                    registry._ids[tag_key(name)] = tid
+            registry.next_id = data["next_id"]
+            return registry
+        for name in settings.get("tags", []):
+            registry.ensure(name)
+        for name, color in settings.get("tag_colors", {}).items():
+            registry.colors[registry.ensure(name, hidden=True)] = color
+        return registry
+
+    def to_settings(self):
+        return {
+            "next_id": self.next_id,
+            "tags": [{"id": tid, "name": name, "aliases": self.aliases.get(tid, []),
+                      "color": self.colors.get(tid), "hidden": tid in self.hidden}
+                     for tid, name in sorted(self.names.items())],
+        }
+
+    def visible(self):
+        """Имена для списков выбора, в порядке добавления"""
+        return [name for tid, name in sorted(self.names.items()) if tid not in self.hidden]
+
+    # --- LOOKUP ---
+    def resolve(self, name):
+        """id тэга с таким именем или алиасом либо None"""
+        return self._ids.get(tag_key(name))
+
+    def ensure(self, name, hidden=False):
+        """id тэга; неизвестное имя становится новым тэгом"""
+        tid = self.resolve(name)
+        if tid is not None:
+            return tid
+        name = clean_tag(name)
+        if not name:
+            raise ValueError("tag name cannot be empty")
+        tid = self.next_id
+        self.next_id += 1
+        self.names[tid] = name
+        self.aliases[tid] = []
+        self._ids[tag_key(name)] = tid
+        if hidden:
+            self.hidden.add(tid)
+        self.dirty = True
+        return tid
+
+    def canonical(self, name):
+        return self.names[self.ensure(name)]
+
+    def lookup(self, name):
+        """Каноническое имя без создания тэга (неизвестное имя — как есть, без лишних пробелов)"""
+        tid = self.resolve(name)
+        return self.names[tid] if tid is not None else clean_tag(name)
+
+    def color(self, name):
+        tid = self.resolve(name)
+        return self.colors.get(tid) if tid is not None else None
+
+    def _existing(self, name):
+        tid = self.resolve(name)
+        if tid is None:
+            raise ValueError(f"unknown tag: {name!r}")
+        return tid
+
+    # --- CHANGES --- (возвращают {старое имя: новое} для remap_tags)
+    def add(self, name):
+        """Тэг в списке выбора; False — он там уже был"""
+        tid = self.resolve(name)
+        if tid is not None and tid not in self.hidden:
+            return False
+        self.hidden.discard(self.ensure(name))
+        self.dirty = True
+        return True
+
+    def hide(self, name):
+        self.hidden.add(self._existing(name))
+        self.dirty = True
+
+    def set_color(self, name, color):
+        self.colors[self.ensure(name, hidden=True)] = color
+        self.dirty = True
+
+    def rename(self, name, new_name):
+        """Новое каноническое имя; старое остаётся алиасом"""
+        tid = self._existing(name)
+        new_name = clean_tag(new_name)
+        owner = self.resolve(new_name)
+        if not new_name or (owner is not None and owner != tid):
+            raise ValueError(f"tag {new_name!r} already exists (use merge)")
+        old = self.names[tid]
+        if old == new_name:
+            return {}
+        if tag_key(old) != tag_key(new_name):
+            self.aliases[tid].append(old)
+        self.aliases[tid] = [a for a in self.aliases[tid] if tag_key(a) != tag_key(new_name)]
+        self.names[tid] = new_name
+        self._ids[tag_key(new_name)] = tid
+        self.dirty = True
+        return {old: new_name}
+
+    def merge(self, sources, target):
+        """Тэги sources становятся алиасами target (id источников удаляются)"""
+        tid = self._existing(target)
+        mapping = {}
+        for name in sources:
+            sid = self._existing(name)
+            if sid == tid:
+                continue
+            old = self.names.pop(sid)
+            moved = [old, *self.aliases.pop(sid, [])]
+            self.aliases[tid].extend(moved)
+            for alias in moved:
+                self._ids[tag_key(alias)] = tid
+            if tid not in self.colors and sid in self.colors:
+                self.colors[tid] = self.colors[sid]
+            self.colors.pop(sid, None)
+            self.hidden.discard(sid)
+            mapping[old] = self.names[tid]
+        self.dirty = self.dirty or bool(mapping)
+        return mapping
+
+    def targets(self, categories):
+        """Каноническое имя для каждой категории столбца tag (неизвестные — новые скрытые тэги)"""
+        return [self.names[self.ensure(name, hidden=True)] if clean_tag(name) else name for name in categories]
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+import traceback
+
+
+def _fsync_dir(path):
+    # Переименование переживает сбой питания только после fsync каталога (POSIX)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, write):
+    """write(tmp_path) пишет во временный файл рядом с path; затем fsync и атомарный rename.
+    Файл на диске всегда либо старый, либо новый целиком."""
+    tmp = path + ".tmp"
+    write(tmp)
+    with open(tmp, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def write_text(path, text):
+    def write(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+    atomic_write(path, write)
+
+
+class BackgroundWriter:
+    """Поток записи на диск. Задачи с одним ключом схлопываются: пачка изменений
+    пишется один раз через DEBOUNCE секунд тишины (но не позже MAX_DELAY)."""
+
+    DEBOUNCE = 0.3
+    MAX_DELAY = 2.0
+
+    def __init__(self, debounce=DEBOUNCE, max_delay=MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.last_error = None
+        self._jobs = {}
+        self._due = None
+        self._deadline = None
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="logwatch-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, job):
+        """Поставить job() в очередь; ранее поставленная задача с тем же ключом заменяется"""
+        with self._cond:
+            now = time.monotonic()
+            if not self._jobs:
+                self._deadline = now + self.max_delay
+            self._jobs[key] = job
+            self._due = min(now + self.debounce, self._deadline)
+            self._cond.notify()
+
+    def flush(self):
+        """Записать всё поставленное сейчас и дождаться окончания записи"""
+        with self._cond:
+            self._due = 0
+            self._cond.notify()
+            self._cond.wait_for(lambda: not self._jobs and not self._busy)
+
+    def take_error(self):
+        """Ошибка последней неудачной записи (и сброс её) или None"""
+        with self._cond:
+            error, self.last_error = self.last_error, None
+        return error
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._jobs:
+                        delay = self._due - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if not self._jobs:
+                    return
+                jobs, self._jobs = self._jobs, {}
+                self._busy = True
+
+            for job in jobs.values():
+                try:
+                    job()
+                except Exception as e:
+                    # Ошибка одной записи не должна останавливать поток; её забирает take_error()
+                    with self._cond:
+                        self.last_error = e
+                    traceback.print_exc()
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()